@@ -0,0 +1,822 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for hooks/tree/get_context_tree.py
+
+Each benchmark builds its own synthetic input, so results are comparable
+between machines and between revisions of the tree generator.
+
+Usage:
+    python3 benchmarks/bench_get_context_tree.py scan [--entries 100000]
+    python3 benchmarks/bench_get_context_tree.py format [--entries 50000]
+    python3 benchmarks/bench_get_context_tree.py cache [--entries 100000]
+    python3 benchmarks/bench_get_context_tree.py gitindex [--entries 100000]
+    python3 benchmarks/bench_get_context_tree.py ignore [--entries 100000]
+    python3 benchmarks/bench_get_context_tree.py parallel [--entries 20000] [--latency-ms 2]
+    python3 benchmarks/bench_get_context_tree.py strategy [--entries 100000]
+    python3 benchmarks/bench_get_context_tree.py collapse [--entries 100000] [--threshold 200]
+    python3 benchmarks/bench_get_context_tree.py stream [--entries 100000]
+    python3 benchmarks/bench_get_context_tree.py store [--entries 1000000]
+    python3 benchmarks/bench_get_context_tree.py tokens [--entries 20000] [--max-tokens 8000]
+    python3 benchmarks/bench_get_context_tree.py diff [--entries 20000] [--changes 12]
+    python3 benchmarks/bench_get_context_tree.py exclude [--entries 200000]
+    python3 benchmarks/bench_get_context_tree.py annotate [--entries 5000]
+    python3 benchmarks/bench_get_context_tree.py auto [--sizes 1000,20000,100000]
+    python3 benchmarks/bench_get_context_tree.py inprocess [--entries 2000]
+    python3 benchmarks/bench_get_context_tree.py daemon [--sizes 2000,20000]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+TREE_DIR = Path(__file__).resolve().parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(TREE_DIR))
+
+from get_context_tree import TreeGenerator  # noqa: E402
+from token_budget import estimate_tokens  # noqa: E402
+from tree_store import TreeStore  # noqa: E402
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def build_synthetic_tree(root: Path, entries: int, fanout: int = 100) -> None:
+    """Create `entries` files spread over directories of `fanout` files each."""
+    dirs_needed = max(1, entries // fanout)
+    for d in range(dirs_needed):
+        sub = root / f"pkg_{d // 100:03d}" / f"mod_{d:05d}"
+        sub.mkdir(parents=True, exist_ok=True)
+        for f in range(fanout):
+            (sub / f"file_{f:03d}.py").touch()
+
+
+class StatCounter:
+    """Counts os.stat/os.lstat calls made while active."""
+
+    def __init__(self):
+        self.calls = 0
+        self._stat = os.stat
+        self._lstat = os.lstat
+
+    def __enter__(self):
+        def counted(fn):
+            def wrapper(*args, **kwargs):
+                self.calls += 1
+                return fn(*args, **kwargs)
+            return wrapper
+        os.stat = counted(self._stat)
+        os.lstat = counted(self._lstat)
+        return self
+
+    def __exit__(self, *exc):
+        os.stat = self._stat
+        os.lstat = self._lstat
+
+
+def timed(fn, repeat: int = 3):
+    """Return the best wall time of `repeat` runs and the last result."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+# ============================================================================
+# SCAN: pathlib iterdir (before) vs os.scandir (after)
+# ============================================================================
+
+def legacy_scan(generator: TreeGenerator, dir_path: Path, depth: int = 0) -> list:
+    """The original Path.iterdir() scanner, kept here as the baseline."""
+    if depth >= generator.max_depth:
+        return []
+    tree = []
+    dirs, files = [], []
+    for entry in dir_path.iterdir():
+        is_dir = entry.is_dir()
+        if entry.is_symlink():
+            continue
+        if generator.should_exclude(entry, entry.name, is_dir):
+            continue
+        (dirs if is_dir else files).append((entry.name, entry))
+    dirs.sort(key=lambda x: x[0].lower())
+    files.sort(key=lambda x: x[0].lower())
+    for name, entry in dirs:
+        tree.append((depth, name, True, entry))
+        tree.extend(legacy_scan(generator, entry, depth + 1))
+    for name, entry in files:
+        tree.append((depth, name, False, entry))
+    return tree
+
+
+def bench_scan(args) -> None:
+    root = Path(tempfile.mkdtemp(prefix='bench-tree-'))
+    try:
+        print(f"Building synthetic tree with {args.entries} files in {root} ...")
+        build_synthetic_tree(root, args.entries)
+
+        def make():
+            return TreeGenerator(str(root), max_depth=50, max_files=10 ** 9)
+
+        with StatCounter() as before_stats:
+            before, before_tree = timed(lambda: legacy_scan(make(), root), args.repeat)
+        with StatCounter() as after_stats:
+            after, after_tree = timed(lambda: make().scan_directory(root), args.repeat)
+
+        assert [e[:3] for e in before_tree] == [e[:3] for e in after_tree], \
+            "scanner output differs from baseline"
+
+        print(f"entries scanned:      {len(after_tree)}")
+        print(f"before (iterdir):     {before * 1000:9.1f} ms  "
+              f"{before_stats.calls // args.repeat} stat calls")
+        print(f"after  (scandir):     {after * 1000:9.1f} ms  "
+              f"{after_stats.calls // args.repeat} stat calls")
+        print(f"speedup:              {before / after:9.2f}x")
+    finally:
+        shutil.rmtree(str(root), ignore_errors=True)
+
+
+# ============================================================================
+# FORMAT: quadratic is_last lookahead (before) vs single pass (after)
+# ============================================================================
+
+def legacy_format(tree: list) -> str:
+    """The original formatter that scans forward for every entry's is_last."""
+    lines = ["root/"]
+    depth_continues = {}
+    for i, (depth, name, is_dir, _) in enumerate(tree):
+        is_last = True
+        for j in range(i + 1, len(tree)):
+            if tree[j][0] < depth:
+                break
+            if tree[j][0] == depth:
+                is_last = False
+                break
+        prefix = ""
+        for d in range(depth):
+            prefix += "|   " if depth_continues.get(d, False) else "    "
+        prefix += "+-- " if is_last else "|-- "
+        depth_continues[depth] = not is_last
+        lines.append(prefix + name + ("/" if is_dir else ""))
+    return "\n".join(lines)
+
+
+def synthetic_entries(entries: int, flat: bool) -> list:
+    """In-memory tree: one flat directory, or 3 levels of 50-wide fan-out."""
+    if flat:
+        return [(0, "flat", True, None)] + \
+            [(1, f"file_{i:06d}.py", False, None) for i in range(entries - 1)]
+    tree = []
+    while len(tree) < entries:
+        a = len(tree)
+        tree.append((0, f"pkg_{a}", True, None))
+        for b in range(50):
+            tree.append((1, f"mod_{b}", True, None))
+            tree.extend((2, f"file_{c}.py", False, None) for c in range(50))
+    return tree[:entries]
+
+
+def bench_format(args) -> None:
+    generator = TreeGenerator('.')
+    sizes = [args.entries // 4, args.entries // 2, args.entries]
+
+    for flat in (True, False):
+        print(f"\n{'flat directory' if flat else 'nested (50-wide)'}")
+        print(f"{'entries':>10} {'after ms':>10} {'ms/1k':>8} {'before ms':>11}")
+        for size in sizes:
+            tree = synthetic_entries(size, flat)
+            after, _ = timed(lambda: generator.format_tree_ascii(tree), args.repeat)
+            before = ''
+            if size <= args.legacy_max:
+                t, _ = timed(lambda: legacy_format(tree), 1)
+                before = f"{t * 1000:11.1f}"
+            print(f"{size:>10} {after * 1000:10.1f} {after * 1e6 / size:8.3f} {before:>11}")
+
+
+# ============================================================================
+# CACHE: cold scan vs warm scan of an unchanged tree
+# ============================================================================
+
+def bench_cache(args) -> None:
+    root = Path(tempfile.mkdtemp(prefix='bench-tree-'))
+    cache_dir = Path(tempfile.mkdtemp(prefix='bench-cache-'))
+    try:
+        print(f"Building synthetic tree with {args.entries} files in {root} ...")
+        build_synthetic_tree(root, args.entries)
+        # Move mtimes out of the racy window so listings are cacheable
+        past = time.time() - 60
+        for dirpath, _, _ in os.walk(str(root)):
+            os.utime(dirpath, (past, past))
+
+        for max_files in (1000, 10 ** 9):
+            def run():
+                return TreeGenerator(str(root), max_depth=50, max_files=max_files,
+                                     cache_dir=str(cache_dir)).generate()
+
+            shutil.rmtree(str(cache_dir), ignore_errors=True)
+            cold, _ = timed(run, 1)
+            warm, _ = timed(run, args.repeat)
+            label = 'all' if max_files > args.entries else str(max_files)
+            print(f"max_files={label:>6}  cold {cold * 1000:9.1f} ms   warm {warm * 1000:9.1f} ms")
+    finally:
+        shutil.rmtree(str(root), ignore_errors=True)
+        shutil.rmtree(str(cache_dir), ignore_errors=True)
+
+
+# ============================================================================
+# GITINDEX: directory walk vs .git/index listing
+# ============================================================================
+
+def bench_gitindex(args) -> None:
+    root = Path(tempfile.mkdtemp(prefix='bench-tree-'))
+    try:
+        print(f"Building synthetic git repo with {args.entries} files in {root} ...")
+        build_synthetic_tree(root, args.entries)
+        subprocess.run(['git', 'init', '-q'], cwd=str(root), check=True)
+        subprocess.run(['git', 'add', '-A'], cwd=str(root), check=True)
+
+        for max_files in (1000, 10 ** 9):
+            def run(use_git_index):
+                return TreeGenerator(str(root), max_depth=50, max_files=max_files,
+                                     use_git_index=use_git_index).generate()
+
+            walk, walk_out = timed(lambda: run(False), args.repeat)
+            index, index_out = timed(lambda: run(True), args.repeat)
+            assert walk_out == index_out, "index listing differs from directory walk"
+            label = 'all' if max_files > args.entries else str(max_files)
+            print(f"max_files={label:>6}  walk {walk * 1000:9.1f} ms   "
+                  f"index {index * 1000:9.1f} ms")
+    finally:
+        shutil.rmtree(str(root), ignore_errors=True)
+
+
+# ============================================================================
+# IGNORE: per-pattern Python loop (before) vs compiled rule stack (after)
+# ============================================================================
+
+IGNORE_PATTERNS = [
+    '*.log', '*.tmp', '*.swp', '*.bak', '*.orig', '*.egg-info/', 'dist/', 'build/',
+    '.env', '.env.local', 'coverage/', '*.cover', '.cache/', '*.sqlite3', 'npm-debug.log',
+    'yarn-error.log', '*.min.js', '*.map', 'tmp/', 'logs/', '*.pid', '*.seed',
+    '.terraform/', '*.tfstate', 'secrets.json', '*.pem', '*.key', 'out/', '*.iml', '.idea/',
+]
+
+
+def legacy_gitignore_loop(patterns, name: str, is_dir: bool) -> bool:
+    """The original simplified gitignore check: one Python test per pattern."""
+    for pattern in patterns:
+        if pattern.endswith('/') and is_dir and name == pattern[:-1]:
+            return True
+        elif pattern.startswith('*') and name.endswith(pattern[1:]):
+            return True
+        elif pattern == name:
+            return True
+        elif '/' not in pattern and name == pattern:
+            return True
+    return False
+
+
+def bench_ignore(args) -> None:
+    from ignore_rules import IgnoreMatcher, parse_rule
+
+    names = [(f"src/pkg_{i % 97}/module_{i}.py", False) for i in range(args.entries)]
+    matcher = IgnoreMatcher().extend(
+        [parse_rule(p, '', f'bench:{i}') for i, p in enumerate(IGNORE_PATTERNS)], 'bench')
+
+    before, _ = timed(lambda: [legacy_gitignore_loop(IGNORE_PATTERNS, p.rpartition('/')[2], d)
+                               for p, d in names], args.repeat)
+    after, _ = timed(lambda: [matcher.is_ignored(p, d) for p, d in names], args.repeat)
+
+    print(f"{len(IGNORE_PATTERNS)} patterns, {args.entries} paths")
+    print(f"before (pattern loop):   {before * 1000:9.1f} ms  "
+          f"{args.entries / before / 1e6:6.2f} M paths/s")
+    print(f"after  (compiled stack): {after * 1000:9.1f} ms  "
+          f"{args.entries / after / 1e6:6.2f} M paths/s")
+
+
+def legacy_exclude_loop(dirs, patterns, name: str, is_dir: bool) -> bool:
+    """The per-entry loop over every default pattern that ExclusionRules replaced."""
+    if is_dir and name in dirs:
+        return True
+    if not is_dir:
+        for pattern in patterns:
+            if pattern.startswith('*') and name.endswith(pattern[1:]):
+                return True
+            elif name == pattern:
+                return True
+    return False
+
+
+def bench_exclude(args) -> None:
+    from exclude_profiles import PROFILES, load_exclusions
+
+    extensions = ('.py', '.ts', '.go', '.rs', '.java', '.md', '.json', '.pyc')
+    names = [(f"module_{i}{extensions[i % len(extensions)]}", i % 10 == 0) for i in range(args.entries)]
+    root = tempfile.mkdtemp(prefix='bench-tree-')
+    try:
+        rules, _ = load_exclusions(root, sorted(PROFILES))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    # The same rules the compiled matcher holds, as the old dir set and pattern loop
+    dirs = set(rules.dir_names)
+    patterns = sorted(set(rules.file_names) | {'*' + ext for ext in rules.extensions}
+                      | {'*' + suffix for suffix in rules.suffixes})
+
+    before, _ = timed(lambda: [legacy_exclude_loop(dirs, patterns, n, d) for n, d in names], args.repeat)
+    after, _ = timed(lambda: [rules.excludes(n, d) for n, d in names], args.repeat)
+
+    print(f"{len(patterns)} file patterns, {len(dirs)} directory names, {args.entries} names")
+    print(f"before (pattern loop):    {before * 1000:9.1f} ms  "
+          f"{args.entries / before / 1e6:6.2f} M names/s")
+    print(f"after  (compiled rules):  {after * 1000:9.1f} ms  "
+          f"{args.entries / after / 1e6:6.2f} M names/s")
+
+
+# ============================================================================
+# PARALLEL: sequential vs threaded listing on a high-latency filesystem
+# ============================================================================
+
+class ThrottledScandir:
+    """Adds a fixed delay to every os.scandir call, like an NFS round trip."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self._scandir = os.scandir
+
+    def __enter__(self):
+        def slow(path='.'):
+            time.sleep(self.latency)
+            return self._scandir(path)
+        os.scandir = slow
+        return self
+
+    def __exit__(self, *exc):
+        os.scandir = self._scandir
+
+
+def bench_parallel(args) -> None:
+    root = Path(tempfile.mkdtemp(prefix='bench-tree-'))
+    try:
+        print(f"Building synthetic tree with {args.entries} files in {root} ...")
+        build_synthetic_tree(root, args.entries, fanout=20)
+        print(f"scandir latency {args.latency_ms} ms, max_files {args.max_files}")
+
+        baseline = None
+        sequential = None
+        with ThrottledScandir(args.latency_ms / 1000.0):
+            for workers in (1, 2, 4, 8, 16, 32):
+                def run():
+                    return TreeGenerator(str(root), max_depth=50, max_files=args.max_files,
+                                         workers=workers).generate()
+
+                elapsed, output = timed(run, args.repeat)
+                if baseline is None:
+                    baseline, sequential = output, elapsed
+                assert output == baseline, f"workers={workers} output differs from sequential"
+                print(f"workers={workers:>3}  {elapsed * 1000:9.1f} ms  "
+                      f"{sequential / elapsed:6.2f}x")
+    finally:
+        shutil.rmtree(str(root), ignore_errors=True)
+
+
+# ============================================================================
+# STRATEGY: depth-first vs breadth-first budgeted scan
+# ============================================================================
+
+def bench_strategy(args) -> None:
+    root = Path(tempfile.mkdtemp(prefix='bench-tree-'))
+    try:
+        print(f"Building synthetic tree with {args.entries} files in {root} ...")
+        build_synthetic_tree(root, args.entries)
+        top_level = len(os.listdir(str(root)))
+
+        for strategy in ('depth', 'breadth'):
+            listed = []
+
+            def run():
+                generator = TreeGenerator(str(root), max_depth=50, max_files=args.max_files)
+                list_entries = generator.list_entries
+
+                def counted(dir_path):
+                    listed.append(dir_path)
+                    return list_entries(dir_path)
+                generator.list_entries = counted
+                if strategy == 'breadth':
+                    return generator.scan_breadth_first()
+                return generator.scan_directory(root)
+
+            elapsed, tree = timed(run, 1)
+            with_files = {path.relative_to(root).parts[0]
+                          for _, _, is_dir, path in tree if not is_dir and path.parent != root}
+            files = sum(1 for entry in tree if not entry[2])
+            print(f"{strategy:>8}: {elapsed * 1000:8.1f} ms  {len(listed):6} dirs listed  "
+                  f"{files} files  {len(with_files)}/{top_level} top-level dirs with files shown")
+    finally:
+        shutil.rmtree(str(root), ignore_errors=True)
+
+
+# ============================================================================
+# COLLAPSE: full listing vs summary lines for large, uniform directories
+# ============================================================================
+
+def bench_collapse(args) -> None:
+    root = Path(tempfile.mkdtemp(prefix='bench-tree-'))
+    try:
+        print(f"Building synthetic tree with {args.entries} files in {root} ...")
+        build_synthetic_tree(root, args.entries, fanout=args.fanout)
+
+        for threshold in (0, args.threshold):
+            def run():
+                return TreeGenerator(str(root), max_depth=50, max_files=args.max_files,
+                                     collapse_threshold=threshold).generate()
+
+            elapsed, output = timed(run, args.repeat)
+            print(f"collapse={threshold:<5} {elapsed * 1000:8.1f} ms  "
+                  f"{len(output.encode('utf-8')):9} bytes  {output.count(chr(10)) + 1:7} lines")
+    finally:
+        shutil.rmtree(str(root), ignore_errors=True)
+
+
+# ============================================================================
+# STREAM: generate() then print vs stream() line by line
+# ============================================================================
+
+class FirstWriteClock:
+    """Text sink that discards output and remembers when it was first written."""
+
+    def __init__(self):
+        self.first = None
+        self.bytes = 0
+
+    def write(self, text):
+        if self.first is None:
+            self.first = time.perf_counter()
+        self.bytes += len(text)
+
+
+def bench_stream(args) -> None:
+    root = Path(tempfile.mkdtemp(prefix='bench-tree-'))
+    try:
+        print(f"Building synthetic tree with {args.entries} files in {root} ...")
+        build_synthetic_tree(root, args.entries)
+
+        def batch(sink):
+            sink.write(TreeGenerator(str(root), max_depth=50, max_files=args.max_files).generate())
+
+        def streamed(sink):
+            TreeGenerator(str(root), max_depth=50, max_files=args.max_files).stream(sink)
+
+        for label, run in (('generate', batch), ('stream', streamed)):
+            sink = FirstWriteClock()
+            tracemalloc.start()
+            start = time.perf_counter()
+            run(sink)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{label:>8}: {elapsed * 1000:8.1f} ms total  "
+                  f"{(sink.first - start) * 1000:8.1f} ms to first byte  "
+                  f"{peak / 1024:8.0f} KiB peak  {sink.bytes} chars")
+    finally:
+        shutil.rmtree(str(root), ignore_errors=True)
+
+
+# ============================================================================
+# STORE: (depth, name, is_dir, Path) tuples vs compact TreeStore
+# ============================================================================
+
+def synthetic_tree_entries(root: Path, entries: int, fanout: int = 100):
+    """Yield (depth, name, is_dir, parent Path) in the layout of build_synthetic_tree()."""
+    dirs_needed = max(1, entries // fanout)
+    names = [f"file_{f:03d}.py" for f in range(fanout)]
+    for d in range(dirs_needed):
+        if d % 100 == 0:
+            pkg = root / f"pkg_{d // 100:03d}"
+            yield 0, pkg.name, True, root
+        mod = pkg / f"mod_{d:05d}"
+        yield 1, mod.name, True, pkg
+        for name in names:
+            yield 2, name, False, mod
+
+
+def traced(build):
+    """Return what `build()` returns and the memory it still holds, in bytes."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, held
+
+
+def bench_store(args) -> None:
+    root = Path('/synthetic/project')
+
+    def as_tuples():
+        return [(depth, name, is_dir, parent / name)
+                for depth, name, is_dir, parent in synthetic_tree_entries(root, args.entries)]
+
+    def as_store():
+        store = TreeStore()
+        for depth, name, is_dir, _ in synthetic_tree_entries(root, args.entries):
+            store.append(depth, name, is_dir)
+        return store
+
+    for label, build in (('tuples', as_tuples), ('store', as_store)):
+        start = time.perf_counter()
+        result, held = traced(build)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>6}: {len(result):8} entries  {held / len(result):7.1f} bytes/entry  "
+              f"{held / 2 ** 20:7.1f} MiB  ({elapsed:.1f} s traced)")
+        del result
+
+
+# ============================================================================
+# TOKENS: 50KB byte cap vs token-budgeted pruning
+# ============================================================================
+
+def bench_tokens(args) -> None:
+    root = Path(tempfile.mkdtemp(prefix='bench-tree-'))
+    try:
+        print(f"Building synthetic tree with {args.entries} files in {root} ...")
+        build_synthetic_tree(root, args.entries, fanout=args.fanout)
+
+        for max_tokens in (0, args.max_tokens):
+            def run():
+                return TreeGenerator(str(root), max_depth=50, max_files=args.entries,
+                                     max_tokens=max_tokens).generate()
+
+            elapsed, output = timed(run, args.repeat)
+            label = f"max_tokens={max_tokens}" if max_tokens else "50KB byte cap"
+            print(f"{label:<18} {elapsed * 1000:8.1f} ms  {len(output.encode('utf-8')):8} bytes  "
+                  f"~{estimate_tokens(output):7} tokens  {output.count(chr(10)) + 1:6} lines")
+    finally:
+        shutil.rmtree(str(root), ignore_errors=True)
+
+
+def bench_diff(args) -> None:
+    root = Path(tempfile.mkdtemp(prefix='bench-tree-'))
+    try:
+        print(f"Building synthetic tree with {args.entries} files in {root} ...")
+        build_synthetic_tree(root, args.entries)
+        snapshot = str(root.parent / (root.name + '.snap.gz'))
+
+        elapsed, full = timed(lambda: TreeGenerator(str(root), max_depth=50, max_files=args.entries,
+                                                    snapshot_path=snapshot).generate(), 1)
+        paths = sum(len(str(p.relative_to(root))) + 1 for p in root.rglob('*'))
+        print(f"full tree  {elapsed * 1000:8.1f} ms  {len(full.encode('utf-8')):8} bytes  "
+              f"~{estimate_tokens(full):7} tokens")
+        print(f"snapshot   {os.path.getsize(snapshot):8} bytes  (plain path list {paths} bytes)")
+
+        new_dir = root / 'pkg_000' / 'feature'
+        new_dir.mkdir()
+        for i in range(args.changes):
+            (new_dir / f"new_{i:03d}.py").touch()
+
+        elapsed, diff = timed(lambda: TreeGenerator(str(root), max_depth=50, max_files=args.entries,
+                                                    diff_since=snapshot).generate(), args.repeat)
+        print(f"diff       {elapsed * 1000:8.1f} ms  {len(diff.encode('utf-8')):8} bytes  "
+              f"~{estimate_tokens(diff):7} tokens  {diff.count(chr(10)) + 1:6} lines")
+        os.remove(snapshot)
+    finally:
+        shutil.rmtree(str(root), ignore_errors=True)
+
+
+def bench_annotate(args) -> None:
+    root = Path(tempfile.mkdtemp(prefix='bench-tree-'))
+    cache_dir = Path(tempfile.mkdtemp(prefix='bench-cache-'))
+    try:
+        print(f"Building synthetic tree with {args.entries} files of {args.lines} lines in {root} ...")
+        build_synthetic_tree(root, args.entries)
+        text = "value = 1\n" * args.lines
+        # Move mtimes out of the racy window so line counts are cacheable
+        past = time.time() - 60
+        for path in root.rglob('*.py'):
+            path.write_text(text)
+            os.utime(str(path), (past, past))
+
+        def run(annotate):
+            generator = TreeGenerator(str(root), max_depth=50, max_files=args.entries,
+                                      cache_dir=str(cache_dir), annotate=annotate)
+            generator.generate()
+            return generator
+
+        for label, annotate in (('plain', False), ('cold', True), ('warm', True)):
+            if label == 'cold':
+                for name in os.listdir(str(cache_dir)):
+                    if name.endswith('.annotations.json'):
+                        os.remove(str(cache_dir / name))
+            elapsed, generator = timed(lambda: run(annotate), 1 if label == 'cold' else args.repeat)
+            annotator = generator.annotator
+            read = f"{annotator.files_read:6} files read  {annotator.bytes_read:10} bytes" if annotator else ""
+            print(f"{label:6} {elapsed * 1000:9.1f} ms  {read}")
+    finally:
+        shutil.rmtree(str(root), ignore_errors=True)
+        shutil.rmtree(str(cache_dir), ignore_errors=True)
+
+
+def bench_auto(args) -> None:
+    print(f"{'files':>8} {'fixed ms':>9} {'auto ms':>9} {'auto output':>11}  limits")
+    for entries in (int(n) for n in args.sizes.split(',')):
+        root = Path(tempfile.mkdtemp(prefix='bench-tree-'))
+        try:
+            build_synthetic_tree(root, entries)
+            fixed, _ = timed(lambda: TreeGenerator(str(root), max_depth=10, max_files=1000,
+                                                   collapse_threshold=200).generate(), args.repeat)
+            auto, _ = timed(lambda: TreeGenerator(str(root), auto=True).generate(), args.repeat)
+            planned = TreeGenerator(str(root), auto=True)
+            output = planned.generate()
+            print(f"{entries:8} {fixed * 1000:9.1f} {auto * 1000:9.1f} {len(output):11}  "
+                  f"depth {planned.plan.max_depth}, {planned.plan.max_files} files, "
+                  f"{planned.plan.strategy}, {planned.plan.workers} workers")
+        finally:
+            shutil.rmtree(str(root), ignore_errors=True)
+
+
+def bench_inprocess(args) -> None:
+    from tree_api import clear_memo, generate_tree
+
+    root = Path(tempfile.mkdtemp(prefix='bench-tree-'))
+    try:
+        print(f"Building synthetic tree with {args.entries} files in {root} ...")
+        build_synthetic_tree(root, args.entries)
+        past = time.time() - 60
+        for dir_path, _, _ in os.walk(str(root)):
+            os.utime(dir_path, (past, past))
+        options = ['--max-files', '1000', '--collapse', '200', '--stack']
+        script = str(TREE_DIR / 'get_context_tree.py')
+
+        elapsed, _ = timed(lambda: subprocess.run([sys.executable, script, str(root)] + options,
+                                                  capture_output=True, check=True), args.repeat)
+        print(f"{'subprocess':12} {elapsed * 1000:9.1f} ms")
+
+        def cold():
+            clear_memo()
+            return generate_tree(str(root), options)
+
+        elapsed, _ = timed(cold, args.repeat)
+        print(f"{'in-process':12} {elapsed * 1000:9.1f} ms")
+        elapsed, result = timed(lambda: generate_tree(str(root), options), args.repeat)
+        print(f"{'memoized':12} {elapsed * 1000:9.1f} ms  (memoized: {result.memoized})")
+    finally:
+        shutil.rmtree(str(root), ignore_errors=True)
+
+
+# ============================================================================
+# DAEMON: kept trees vs the per-request trees the hooks ask for
+# ============================================================================
+
+def bench_daemon(args) -> None:
+    import tree_daemon
+
+    if not sys.platform.startswith('linux'):
+        print("The tree daemon runs on Linux only")
+        return
+    hook_args = ['--auto', '--cache', '--stack', '--max-tokens', '8000', '--workspace']
+    focus = '--focus=add retry handling to mod_00007'
+    print(f"{'files':>8} {'kept':>9} {'focused':>9} {'diff':>9}")
+    for entries in (int(n) for n in args.sizes.split(',')):
+        root = Path(tempfile.mkdtemp(prefix='bench-tree-'))
+        daemon_dir = tempfile.mkdtemp(prefix='bench-daemon-')
+        server = None
+        try:
+            build_synthetic_tree(root, entries)
+            server = subprocess.Popen([sys.executable, str(TREE_DIR / 'tree_daemon.py'), 'serve',
+                                       str(root), '--daemon-dir', daemon_dir])
+            while tree_daemon.query_daemon(str(root), ['--max-files', '1'], daemon_dir) is None:
+                time.sleep(0.05)
+            snapshot = os.path.join(daemon_dir, 'tree.snap.gz')
+            row = []
+            # What the hooks send: a prompt, and within a session a snapshot to diff against
+            for request in (hook_args, hook_args + [focus],
+                            hook_args + [focus, '--snapshot', snapshot, '--diff-since', snapshot]):
+                query = lambda: tree_daemon.query_daemon(str(root), request, daemon_dir, timeout=60)
+                query()
+                elapsed, _ = timed(query, args.repeat)
+                row.append(elapsed * 1000)
+            print(f"{entries:8} " + " ".join(f"{ms:6.1f} ms" for ms in row))
+        finally:
+            if server is not None:
+                tree_daemon.stop_daemon(str(root), daemon_dir)
+                server.wait()
+            shutil.rmtree(str(root), ignore_errors=True)
+            shutil.rmtree(daemon_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='get_context_tree.py benchmarks')
+    sub = parser.add_subparsers(dest='bench')
+
+    scan = sub.add_parser('scan', help='Directory scanner: iterdir vs scandir')
+    scan.add_argument('--entries', type=int, default=100000)
+    scan.add_argument('--repeat', type=int, default=3)
+    scan.set_defaults(func=bench_scan)
+
+    fmt = sub.add_parser('format', help='ASCII formatter scaling')
+    fmt.add_argument('--entries', type=int, default=50000)
+    fmt.add_argument('--repeat', type=int, default=3)
+    fmt.add_argument('--legacy-max', type=int, default=50000,
+                     help='Largest size to run the quadratic baseline on')
+    fmt.set_defaults(func=bench_format)
+
+    cache = sub.add_parser('cache', help='Listing cache: cold vs warm scan')
+    cache.add_argument('--entries', type=int, default=100000)
+    cache.add_argument('--repeat', type=int, default=3)
+    cache.set_defaults(func=bench_cache)
+
+    gitindex = sub.add_parser('gitindex', help='Directory walk vs git index listing')
+    gitindex.add_argument('--entries', type=int, default=100000)
+    gitindex.add_argument('--repeat', type=int, default=3)
+    gitindex.set_defaults(func=bench_gitindex)
+
+    ignore = sub.add_parser('ignore', help='Ignore-rule matching throughput')
+    ignore.add_argument('--entries', type=int, default=100000)
+    ignore.add_argument('--repeat', type=int, default=3)
+    ignore.set_defaults(func=bench_ignore)
+
+    parallel = sub.add_parser('parallel', help='Threaded listing on a throttled filesystem')
+    parallel.add_argument('--entries', type=int, default=20000)
+    parallel.add_argument('--max-files', type=int, default=10 ** 9)
+    parallel.add_argument('--latency-ms', type=float, default=2.0)
+    parallel.add_argument('--repeat', type=int, default=1)
+    parallel.set_defaults(func=bench_parallel)
+
+    strategy = sub.add_parser('strategy', help='Depth-first vs breadth-first budgeted scan')
+    strategy.add_argument('--entries', type=int, default=100000)
+    strategy.add_argument('--max-files', type=int, default=1000)
+    strategy.set_defaults(func=bench_strategy)
+
+    collapse = sub.add_parser('collapse', help='Full listing vs collapsed summary lines')
+    collapse.add_argument('--entries', type=int, default=100000)
+    collapse.add_argument('--fanout', type=int, default=500)
+    collapse.add_argument('--threshold', type=int, default=200)
+    collapse.add_argument('--max-files', type=int, default=10 ** 9)
+    collapse.add_argument('--repeat', type=int, default=3)
+    collapse.set_defaults(func=bench_collapse)
+
+    stream = sub.add_parser('stream', help='Batch vs streaming output: latency and peak memory')
+    stream.add_argument('--entries', type=int, default=100000)
+    stream.add_argument('--max-files', type=int, default=10 ** 9)
+    stream.set_defaults(func=bench_stream)
+
+    store = sub.add_parser('store', help='Memory per entry: tuples vs TreeStore (tracemalloc)')
+    store.add_argument('--entries', type=int, default=1000000)
+    store.set_defaults(func=bench_store)
+
+    tokens = sub.add_parser('tokens', help='Byte-capped vs token-budgeted output size')
+    tokens.add_argument('--entries', type=int, default=20000)
+    tokens.add_argument('--fanout', type=int, default=50)
+    tokens.add_argument('--max-tokens', type=int, default=8000)
+    tokens.add_argument('--repeat', type=int, default=3)
+    tokens.set_defaults(func=bench_tokens)
+
+    diff = sub.add_parser('diff', help='Full tree vs --diff-since output; snapshot size')
+    diff.add_argument('--entries', type=int, default=20000)
+    diff.add_argument('--changes', type=int, default=12)
+    diff.add_argument('--repeat', type=int, default=3)
+    diff.set_defaults(func=bench_diff)
+
+    exclude = sub.add_parser('exclude', help='Exclusion check: pattern loop vs compiled rules')
+    exclude.add_argument('--entries', type=int, default=200000)
+    exclude.add_argument('--repeat', type=int, default=3)
+    exclude.set_defaults(func=bench_exclude)
+
+    annotate = sub.add_parser('annotate', help='--annotate: plain vs cold vs warm line-count cache')
+    annotate.add_argument('--entries', type=int, default=5000)
+    annotate.add_argument('--lines', type=int, default=40)
+    annotate.add_argument('--repeat', type=int, default=3)
+    annotate.set_defaults(func=bench_annotate)
+
+    auto = sub.add_parser('auto', help='--auto vs the hooks\' former fixed limits by tree size')
+    auto.add_argument('--sizes', default='1000,20000,100000')
+    auto.add_argument('--repeat', type=int, default=3)
+    auto.set_defaults(func=bench_auto)
+
+    inprocess = sub.add_parser('inprocess', help='generate_tree() vs a get_context_tree.py subprocess')
+    inprocess.add_argument('--entries', type=int, default=2000)
+    inprocess.add_argument('--repeat', type=int, default=5)
+    inprocess.set_defaults(func=bench_inprocess)
+
+    daemon = sub.add_parser('daemon', help='Tree daemon: kept vs focused and diff (hook) queries')
+    daemon.add_argument('--sizes', default='2000,20000')
+    daemon.add_argument('--repeat', type=int, default=5)
+    daemon.set_defaults(func=bench_daemon)
+
+    args = parser.parse_args()
+    if not getattr(args, 'func', None):
+        parser.print_help()
+        sys.exit(1)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -20,7 +20,6 @@ The injected context helps Claude understand:
 import json
 import sys
 import os
-import subprocess
 import re
 from pathlib import Path
 
@@ -94,33 +93,25 @@ def main():
     # Check if Python script exists
     if not os.path.isfile(python_script):
         sys.exit(0)
+    sys.path.insert(0, os.path.dirname(python_script))
 
     # Generate project tree
     try:
-        # Try python3 first, fallback to python
-        python_cmd = 'python3'
-        try:
-            result = subprocess.run(
-                [python_cmd, python_script, cwd, '--max-depth', '10', '--max-files', '1000'],
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
-        except FileNotFoundError:
-            # Fallback to 'python'
-            python_cmd = 'python'
-            result = subprocess.run(
-                [python_cmd, python_script, cwd, '--max-depth', '10', '--max-files', '1000'],
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
-
-        if result.returncode != 0:
+        tree_args = ['--auto', '--cache',
+                     '--stack', '--max-tokens', '8000', '--workspace',
+                     '--focus=' + query[:4000]]
+
+        # Ask a resident tree daemon first, then fall back to a direct scan
+        # (abandoned after injection_tree.SCAN_TIMEOUT_SECONDS)
+        from injection_tree import project_tree
+        tree_output = project_tree(cwd, tree_args)
+        if tree_output is None:
             # Tree generation failed, pass through
             sys.exit(0)
 
-        tree_output = result.stdout.strip()
+        tree_output = tree_output.strip()
+        if tree_output.startswith('[ERROR'):
+            sys.exit(0)
 
         # Check if tree is empty
         if not tree_output or tree_output.startswith('<<PROJECT_EMPTY'):
@@ -141,7 +132,7 @@ Project structure will be analyzed for context-aware transformation:
 
 This project context will help the complete-process pipeline:
 - Make intelligent decisions about file placement
-- Understand the technology stack
+- Understand the technology stack (see the [STACK] line)
 - Apply consistent patterns with existing code
 - Generate implementation-ready pseudo-code
 
@@ -149,10 +140,6 @@ Proceeding with complete-process pipeline...
 """)
         sys.exit(0)
 
-    except subprocess.TimeoutExpired:
-        # Tree generation timed out, pass through
-        sys.exit(0)
-
     except Exception as e:
         # Any other error, pass through silently
         sys.stderr.write(f"Tree injection error: {e}\n")
@@ -6,17 +6,65 @@ Purpose: Inject project structure context for architecture-aware suggestions
 
 This hook:
 1. Detects implementation keywords (implement, create, add, refactor, etc.)
-2. Executes Python script to generate project tree structure
+2. Gets the project tree from a tree daemon or an in-process scan
+   (hooks/tree/injection_tree.py)
 3. Injects tree context into Claude's prompt for better file placement decisions
+   (later prompts of a session get only the entries that changed, or a short
+   stub when nothing did)
 4. Activates context-aware transformation mode
 """
 
 import json
 import sys
 import os
-import subprocess
 import re
 
+
+def session_snapshot(session_id, cwd):
+    """
+    Find the tree snapshot of this session and working directory.
+
+    Returns:
+        (snapshot file, fingerprint last injected if the snapshot exists),
+        or (None, None) without a session id
+    """
+    if not session_id:
+        return None, None
+    try:
+        import tree_fingerprint
+    except Exception:
+        return None, None
+
+    snapshot = tree_fingerprint.snapshot_file(session_id, cwd)
+    if not os.path.isfile(snapshot):
+        return snapshot, None
+    return snapshot, tree_fingerprint.last_injected(session_id, cwd)
+
+
+def unchanged_fingerprint(session_id, cwd, tree_output):
+    """
+    Check whether this session already received the same tree for cwd.
+
+    Records the tree's fingerprint when it is new.
+
+    Returns:
+        The fingerprint if the tree is unchanged since the last injection,
+        otherwise None
+    """
+    if not session_id:
+        return None
+    try:
+        import tree_fingerprint
+    except Exception:
+        return None
+
+    current = tree_fingerprint.fingerprint(tree_output)
+    if tree_fingerprint.last_injected(session_id, cwd) == current:
+        return current
+    tree_fingerprint.record_injection(session_id, cwd, current)
+    return None
+
+
 def main():
     # Read hook input from stdin (JSON format)
     try:
@@ -48,29 +96,27 @@ def main():
     # Check if Python script exists
     if not os.path.isfile(python_script):
         sys.exit(0)
-
-    # Detect Python command (try python3 first, fallback to python)
-    python_cmd = 'python3'
-    try:
-        subprocess.run([python_cmd, '--version'], capture_output=True, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        python_cmd = 'python'
-        try:
-            subprocess.run([python_cmd, '--version'], capture_output=True, check=True)
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            sys.exit(0)
-
-    # Execute Python script with timeout (15 seconds)
+    sys.path.insert(0, os.path.dirname(python_script))
+
+    tree_args = ['--auto', '--cache',
+                 '--stack', '--max-tokens', '8000', '--workspace',
+                 '--focus=' + prompt[:4000]]
+
+    # Within a session, list only what changed since the last injected tree
+    session_id = data.get('session_id')
+    snapshot, injected_fingerprint = session_snapshot(session_id, cwd)
+    if snapshot:
+        tree_args += ['--snapshot', snapshot]
+        if injected_fingerprint:
+            tree_args += ['--diff-since', snapshot]
+
+    # Ask a resident tree daemon first, then fall back to a direct scan
+    # (abandoned after injection_tree.SCAN_TIMEOUT_SECONDS)
     try:
-        result = subprocess.run(
-            [python_cmd, python_script, cwd, '--max-depth', '10', '--max-files', '1000'],
-            capture_output=True,
-            text=True,
-            timeout=15
-        )
-        tree_output = result.stdout
-    except (subprocess.TimeoutExpired, subprocess.CalledProcessError, Exception):
+        from injection_tree import project_tree
+    except Exception:
         sys.exit(0)
+    tree_output = project_tree(cwd, tree_args)
 
     # Check if tree generation failed or returned error
     if not tree_output or '[ERROR:' in tree_output or tree_output.strip() == '[TREE_ERROR]':
@@ -106,6 +152,32 @@ Auto-reset will occur on next command START (project-specific preferences preser
 
 """
 
+    # Same tree as last time in this session: point back to it instead
+    if tree_output.startswith('[DIFF] No changes'):
+        fingerprint = injected_fingerprint
+    else:
+        fingerprint = unchanged_fingerprint(session_id, cwd, tree_output)
+    if fingerprint:
+        print(f"""{project_context_warning}[CONTEXT-AWARE MODE ACTIVATED]
+
+Project structure unchanged since the last injection (fingerprint {fingerprint}).
+
+Use the Project Structure shown earlier in this session as context for the request: "{prompt}"
+""")
+        sys.exit(0)
+
+    if tree_output.startswith('[DIFF]'):
+        print(f"""{project_context_warning}[CONTEXT-AWARE MODE ACTIVATED]
+
+Project structure changes since the last injection (+ added, - removed, ~ renamed, * listed for the first time):
+```
+{tree_output}
+```
+
+Apply these changes to the Project Structure shown earlier in this session and use it as context for the request: "{prompt}"
+""")
+        sys.exit(0)
+
     # Inject tree context into prompt
     print(f"""{project_context_warning}[CONTEXT-AWARE MODE ACTIVATED]
 
@@ -120,7 +192,7 @@ When responding:
 1. Reference existing files and directories from the structure above
 2. Suggest modifications that align with the current architecture
 3. Identify where new files should be placed based on existing patterns
-4. Detect the technology stack from visible files (package.json, requirements.txt, go.mod, etc.)
+4. Take the technology stack from the [STACK] line; if it is missing, infer it from visible files (package.json, requirements.txt, go.mod, etc.)
 
 If the project is empty (`<<PROJECT_EMPTY_NO_STRUCTURE>>`), use the `/context-aware-transform` command to create a virtual skeleton based on stack detection.
 """)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Deadline-Bounded Directory Listing for get_context_tree.py
+
+A directory listing on a stale NFS or FUSE mount can block inside readdir()
+or stat() indefinitely, and no flag checked between directories can
+interrupt it. ListingWatchdog runs each listing on a daemon worker thread
+while the scan waits for the result only until a monotonic deadline. A call
+still running at the deadline is abandoned: the scan carries on with what
+it has and the stuck thread is left behind. As a daemon thread it does not
+keep the interpreter alive.
+
+Listings are handed over one at a time, so a single worker thread is
+enough. Once a call has been abandoned the deadline has passed and no
+further listings are requested.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a listing does not finish before the deadline."""
+    pass
+
+
+class _Call:
+    """One listing handed to the worker thread."""
+
+    __slots__ = ('path', 'done', 'result', 'error')
+
+    def __init__(self, path: Any):
+        self.path = path
+        self.done = threading.Event()
+        self.result = None
+        self.error = None  # type: Optional[BaseException]
+
+
+class ListingWatchdog:
+    """Runs directory listings on a worker thread, giving up at a deadline."""
+
+    def __init__(self, list_fn: Callable[[Any], Any], deadline: float):
+        """
+        Initialize watchdog.
+
+        Args:
+            list_fn: Lists one directory; called from the worker thread
+            deadline: time.monotonic() value after which listings are abandoned
+        """
+        self.list_fn = list_fn
+        self.deadline = deadline
+        self.abandoned = False
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self._work, name='tree-listing-watchdog',
+                                       daemon=True)
+        self.thread.start()
+
+    def get(self, path: Any) -> Any:
+        """
+        List a directory, waiting no longer than the deadline.
+
+        Args:
+            path: Directory to list
+
+        Returns:
+            Whatever list_fn returns for `path`
+
+        Raises:
+            DeadlineExceeded: If the deadline passes before the listing returns
+        """
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0 or self.abandoned:
+            raise DeadlineExceeded(path)
+
+        call = _Call(path)
+        self.requests.put(call)
+        if not call.done.wait(remaining):
+            self.abandoned = True
+            raise DeadlineExceeded(path)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _work(self) -> None:
+        """Worker loop: run queued listings until close() sends None."""
+        while True:
+            call = self.requests.get()
+            if call is None:
+                return
+            try:
+                call.result = self.list_fn(call.path)
+            except BaseException as e:
+                call.error = e
+            call.done.set()
+
+    def close(self) -> None:
+        """Stop the worker thread once it is idle; a stuck thread is left behind."""
+        self.requests.put(None)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Exclusion Profiles for get_context_tree.py
+
+The default exclusions (node_modules, *.pyc, ...) fit most projects, but
+every stack has its own generated directories (.terraform, bazel-out,
+*.egg-info) that are better skipped before the scan enters them. A project
+can name its own in a .pseudocodeignore file at the scan root:
+
+    # Built-in profiles to add to those detected from root manifests
+    # ('none' turns detection off)
+    profile: terraform
+    # Names to exclude; a trailing '/' restricts the rule to directories
+    generated/
+    *.snap
+    # '!' keeps a name that a default or profile excludes
+    !build/
+
+Rules match entry names, not paths (path rules belong in .gitignore).
+The profiles of the manifests found in the root (package.json,
+pyproject.toml, pom.xml, Cargo.toml, go.mod, ...) apply unless the config
+says 'profile: none'.
+
+All rules are compiled once into exact-name sets, a set of extensions
+('*.pyc'), a tuple of other suffixes for one str.endswith() call and one
+combined regex for the remaining globs, so the cost per entry no longer
+grows with the number of patterns.
+"""
+
+import fnmatch
+import hashlib
+import os
+import re
+from typing import Iterable, List, Optional, Set, Tuple
+
+CONFIG_FILE = '.pseudocodeignore'
+
+# Excluded in every project
+DEFAULT_EXCLUDE_DIRS = {
+    '.git', 'node_modules', 'dist', 'build', '__pycache__',
+    'venv', '.next', '.venv', 'target', 'out', '.idea',
+    '.vscode', 'coverage', '.pytest_cache', '.mypy_cache',
+    'vendor', 'bower_components', '.nuxt', '.gradle'
+}
+
+DEFAULT_EXCLUDE_PATTERNS = {
+    '*.pyc', '*.pyo', '*.so', '*.dll', '*.exe', '*.bin',
+    '*.o', '*.class', '*.log', '.DS_Store', 'Thumbs.db'
+}
+
+# Profile -> (directory rules, file rules)
+PROFILES = {
+    'node': (
+        {'.turbo', '.parcel-cache', '.svelte-kit', '.angular', '.expo', '.docusaurus',
+         '.output', '.vercel', '.yarn', 'storybook-static', 'jspm_packages'},
+        {'*.tsbuildinfo', 'npm-debug.log*', 'yarn-error.log*'},
+    ),
+    'python': (
+        {'.tox', '.nox', '.eggs', '*.egg-info', 'htmlcov', '.hypothesis', '.ruff_cache',
+         '.pytype', '__pypackages__', 'site-packages'},
+        {'*.pyd', '*.egg', '*.whl', '.coverage', '.coverage.*'},
+    ),
+    'jvm': (
+        {'.kotlin', '.mvn', '.gradle-cache'},
+        {'*.jar', '*.war', '*.ear', '*.hprof'},
+    ),
+    'rust': (
+        set(),
+        {'*.rlib', '*.rmeta', '*.pdb'},
+    ),
+    'go': (
+        set(),
+        {'*.test', '*.prof'},
+    ),
+    'terraform': (
+        {'.terraform', '.terragrunt-cache'},
+        {'*.tfstate', '*.tfstate.backup', '*.tfplan'},
+    ),
+    'bazel': (
+        {'bazel-*'},
+        set(),
+    ),
+}
+
+# Root files selecting a profile
+PROFILE_MARKERS = {
+    'package.json': 'node',
+    'pyproject.toml': 'python', 'setup.py': 'python', 'requirements.txt': 'python',
+    'pom.xml': 'jvm', 'build.gradle': 'jvm', 'build.gradle.kts': 'jvm',
+    'Cargo.toml': 'rust',
+    'go.mod': 'go',
+    'WORKSPACE': 'bazel', 'WORKSPACE.bazel': 'bazel', 'MODULE.bazel': 'bazel',
+}
+
+_GLOB_CHARS = re.compile(r'[*?\[]')
+
+
+def _combined_regex(globs: Iterable[str]):
+    globs = sorted(globs)
+    if not globs:
+        return None
+    return re.compile('|'.join(fnmatch.translate(glob) for glob in globs))
+
+
+class ExclusionRules:
+    """Name-based exclusions compiled into sets, a suffix tuple and one regex."""
+
+    def __init__(self, dir_rules: Iterable[str], file_rules: Iterable[str],
+                 kept: Iterable[str] = (), profiles: Tuple[str, ...] = ()):
+        """
+        Args:
+            dir_rules: Names or globs excluded as directories
+            file_rules: Names or globs excluded as files
+            kept: Exact names ('name/' for directories only) never excluded
+            profiles: Names of the profiles the rules came from
+        """
+        kept = set(kept)
+        kept_dirs = {name.rstrip('/') for name in kept}
+        kept_files = {name for name in kept if not name.endswith('/')}
+        dir_rules = set(dir_rules) - kept_dirs
+        file_rules = set(file_rules) - kept_files
+        self.profiles = profiles
+
+        self.dir_names = frozenset(rule for rule in dir_rules if not _GLOB_CHARS.search(rule))
+        self.dir_globs = sorted(dir_rules - self.dir_names)
+        self.dir_regex = _combined_regex(self.dir_globs)
+
+        self.file_names = frozenset(rule for rule in file_rules if not _GLOB_CHARS.search(rule))
+        extensions = set()  # type: Set[str]
+        suffixes = set()  # type: Set[str]
+        globs = set()  # type: Set[str]
+        for rule in file_rules - self.file_names:
+            rest = rule[1:]
+            if rule.startswith('*') and not _GLOB_CHARS.search(rest):
+                if rest.startswith('.') and rest.count('.') == 1:
+                    extensions.add(rest)
+                else:
+                    suffixes.add(rest)
+            else:
+                globs.add(rule)
+        self.extensions = frozenset(extensions)
+        self.suffixes = tuple(sorted(suffixes))
+        self.file_globs = sorted(globs)
+        self.file_regex = _combined_regex(self.file_globs)
+
+        source = "dirs={};files={}".format(",".join(sorted(dir_rules)), ",".join(sorted(file_rules)))
+        self.signature = hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+
+    def excludes(self, name: str, is_dir: bool) -> bool:
+        """Check whether an entry name is excluded."""
+        if is_dir:
+            if name in self.dir_names:
+                return True
+            return self.dir_regex is not None and self.dir_regex.match(name) is not None
+        if name in self.file_names:
+            return True
+        dot = name.rfind('.')
+        if dot >= 0 and name[dot:] in self.extensions:
+            return True
+        if self.suffixes and name.endswith(self.suffixes):
+            return True
+        return self.file_regex is not None and self.file_regex.match(name) is not None
+
+    def match(self, name: str, is_dir: bool) -> Optional[str]:
+        """
+        Find the rule that excludes an entry name (slower than excludes()).
+
+        Returns:
+            The rule as written, with a trailing '/' for directory rules,
+            or None if the name is not excluded
+        """
+        if is_dir:
+            if name in self.dir_names:
+                return name + '/'
+            for glob in self.dir_globs:
+                if fnmatch.fnmatchcase(name, glob):
+                    return glob + '/'
+            return None
+        if name in self.file_names:
+            return name
+        dot = name.rfind('.')
+        if dot >= 0 and name[dot:] in self.extensions:
+            return '*' + name[dot:]
+        for suffix in self.suffixes:
+            if name.endswith(suffix):
+                return '*' + suffix
+        for glob in self.file_globs:
+            if fnmatch.fnmatchcase(name, glob):
+                return glob
+        return None
+
+    def __contains__(self, name: str) -> bool:
+        """Directory-name membership, so the rules can stand in for an excluded-dirs set."""
+        return self.excludes(name, True)
+
+
+def parse_config(text: str) -> Tuple[List[str], Set[str], Set[str], Set[str]]:
+    """
+    Parse a .pseudocodeignore file.
+
+    Returns:
+        (profile names, directory rules, file rules, kept names)
+    """
+    profiles = []  # type: List[str]
+    dir_rules, file_rules, kept = set(), set(), set()  # type: Set[str], Set[str], Set[str]
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.lower().startswith('profile:'):
+            profiles.extend(name.lower() for name in re.split(r'[\s,]+', line.split(':', 1)[1]) if name)
+            continue
+        if line.startswith('!'):
+            kept.add(line[1:])
+            continue
+        name = line.rstrip('/')
+        if not name or '/' in name:
+            # Path rules belong in .gitignore
+            continue
+        dir_rules.add(name)
+        if not line.endswith('/'):
+            file_rules.add(name)
+    return profiles, dir_rules, file_rules, kept
+
+
+def detect_profiles(root: str) -> List[str]:
+    """Return the profiles of the manifests in a root directory."""
+    try:
+        names = set(os.listdir(root))
+    except OSError:
+        return []
+    return sorted({profile for marker, profile in PROFILE_MARKERS.items() if marker in names})
+
+
+def load_exclusions(root: Optional[str] = None,
+                    profiles: Iterable[str] = ()) -> Tuple[ExclusionRules, List[str]]:
+    """
+    Compile the defaults, the project's profiles and its .pseudocodeignore.
+
+    Args:
+        root: Scan root (None compiles the defaults only)
+        profiles: Profiles requested on the command line, added to those
+            named in the config and those detected from the root's
+            manifests ('none' skips detection)
+
+    Returns:
+        (compiled rules, unknown profile names)
+    """
+    dir_rules = set(DEFAULT_EXCLUDE_DIRS)
+    file_rules = set(DEFAULT_EXCLUDE_PATTERNS)
+    if root is None:
+        return ExclusionRules(dir_rules, file_rules), []
+
+    named = [profile.lower() for profile in profiles]
+    kept = set()  # type: Set[str]
+    try:
+        with open(os.path.join(root, CONFIG_FILE), 'r', encoding='utf-8', errors='replace') as f:
+            config_profiles, config_dirs, config_files, kept = parse_config(f.read())
+    except OSError:
+        pass
+    else:
+        named = config_profiles + named
+        dir_rules |= config_dirs
+        file_rules |= config_files
+
+    if 'none' not in named:
+        named += detect_profiles(root)
+    chosen = [name for name in dict.fromkeys(named) if name != 'none']
+    unknown = [name for name in chosen if name not in PROFILES]
+    chosen = [name for name in chosen if name in PROFILES]
+    for name in chosen:
+        dir_rules |= PROFILES[name][0]
+        file_rules |= PROFILES[name][1]
+    return ExclusionRules(dir_rules, file_rules, kept, tuple(chosen)), unknown
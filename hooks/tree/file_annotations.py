@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+File Size and Line-Count Annotations for get_context_tree.py
+
+A bare file name says nothing about whether routes/auth.py is 200 lines or
+models.py 2 MB of generated code. With --annotate every file line of the
+tree carries its size, and small text files their line count as well:
+
+    |-- auth.py (6.1 KB, 200 lines)
+    +-- models.py (2.0 MB)
+
+Annotations are added after the scan, to the files the scan kept, so the
+listings (and the listing cache) stay name-only. Sizes come from one stat()
+per file, at most STAT_BUDGET of them per run. Lines are counted only in
+files up to MAX_COUNT_BYTES that look like text (no known binary extension,
+no NUL byte in the first block), and all counting in a run reads at most
+READ_BUDGET bytes. Once a budget is spent, the remaining files are shown
+bare (stat budget) or with their size only (read budget).
+
+Line counts are cached by (inode, mtime, size), so an unchanged file is
+never read again: a repeated scan costs one stat() per file and no reads.
+The cache lives next to the listing cache, one JSON file per project root
+(<digest>.annotations.json); without a cache directory it lasts one run.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from tree_cache import RACY_WINDOW_SECONDS
+from tree_store import TreeStore
+
+ANNOTATION_CACHE_VERSION = 1
+
+# stat() calls per run
+STAT_BUDGET = 5000
+# Bytes read for line counting per run
+READ_BUDGET = 8 * 1024 * 1024
+# Larger files are never read
+MAX_COUNT_BYTES = 256 * 1024
+# Read size; the first block also decides whether a file is text
+BLOCK_SIZE = 64 * 1024
+
+# Extensions never read for line counting
+BINARY_EXTENSIONS = {
+    '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.webp', '.tiff', '.psd',
+    '.pdf', '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.tar', '.jar',
+    '.woff', '.woff2', '.ttf', '.otf', '.eot', '.mp3', '.mp4', '.wav', '.ogg',
+    '.mov', '.avi', '.webm', '.db', '.sqlite', '.sqlite3', '.wasm', '.dylib',
+    '.a', '.lib', '.pyc', '.so', '.dll', '.exe', '.bin', '.o', '.class',
+}
+
+# (size in bytes, line count or None if not counted)
+Annotation = Tuple[int, Optional[int]]
+
+# Cached line count of a file that is not text
+NOT_TEXT = -1
+
+
+def format_size(size: int) -> str:
+    """Render a byte count as "512 B", "6.1 KB", "2.0 MB"."""
+    if size < 1024:
+        return f"{size} B"
+    value = float(size)
+    for unit in ('KB', 'MB', 'GB'):
+        value /= 1024
+        if value < 1024 or unit == 'GB':
+            break
+    return f"{value:.1f} {unit}"
+
+
+def format_annotation(annotation: Annotation) -> str:
+    """Render an annotation as the text inside the parentheses after a file name."""
+    size, lines = annotation
+    if lines is None:
+        return format_size(size)
+    return f"{format_size(size)}, {lines:,} line{'' if lines == 1 else 's'}"
+
+
+def count_lines(path: str, limit: int) -> Tuple[Optional[int], int]:
+    """
+    Count the lines of a text file, reading at most `limit` bytes.
+
+    A last line without a trailing newline counts as a line.
+
+    Returns:
+        (line count, or NOT_TEXT for a file with a NUL byte in its first
+        block, or None if it is longer than `limit` or unreadable;
+        bytes read)
+    """
+    lines = 0
+    read = 0
+    last = b'\n'
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(min(BLOCK_SIZE, limit + 1 - read))
+                if not block:
+                    break
+                if not read and b'\0' in block:
+                    return NOT_TEXT, len(block)
+                read += len(block)
+                if read > limit:
+                    return None, read
+                lines += block.count(b'\n')
+                last = block[-1:]
+    except OSError:
+        return None, read
+    return lines + (last != b'\n'), read
+
+
+class FileAnnotator:
+    """Sizes and cached line counts of the files under one root, within per-run budgets."""
+
+    def __init__(self, root_path: str, cache_dir: Optional[str] = None,
+                 stat_budget: int = STAT_BUDGET, read_budget: int = READ_BUDGET):
+        """
+        Args:
+            root_path: Absolute project root; files are cached by their path below it
+            cache_dir: Directory for the line-count cache (None keeps nothing on disk)
+            stat_budget: Most files to stat() in this run
+            read_budget: Most bytes to read for line counting in this run
+        """
+        self.root_path = str(root_path)
+        self.cache_file = None  # type: Optional[str]
+        if cache_dir:
+            digest = hashlib.sha1(self.root_path.encode('utf-8')).hexdigest()[:16]
+            self.cache_file = os.path.join(cache_dir, f"{digest}.annotations.json")
+        self.stat_budget = stat_budget
+        self.read_budget = read_budget
+        # rel path -> [inode, mtime_ns, size, lines]
+        self.cached = {}  # type: Dict[str, list]
+        self.fresh = {}  # type: Dict[str, list]
+        self.stats = 0
+        self.bytes_read = 0
+        self.files_read = 0
+        self.hits = 0
+        self.stat_exhausted = False
+        self.read_exhausted = False
+        # Workspace packages share one annotator from several threads
+        self._lock = threading.Lock()
+        self._prefix_len = len(self.root_path) + 1
+
+    def load(self) -> None:
+        """Load cached line counts."""
+        if self.cache_file is None:
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if (isinstance(data, dict) and data.get('version') == ANNOTATION_CACHE_VERSION
+                and data.get('root') == self.root_path):
+            self.cached = data.get('files', {})
+
+    def annotate(self, path: str) -> Optional[Annotation]:
+        """
+        Return the size and, if counted, the line count of a file.
+
+        Args:
+            path: Absolute file path below the root
+
+        Returns:
+            (size, lines), or None if the file cannot be stat()ed or the
+            stat budget is spent
+        """
+        with self._lock:
+            if self.stats >= self.stat_budget:
+                self.stat_exhausted = True
+                return None
+            self.stats += 1
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+
+            size = st.st_size
+            rel_path = path[self._prefix_len:].replace(os.sep, '/')
+            cached = self.cached.get(rel_path)
+            if (cached is not None and cached[0] == st.st_ino and cached[1] == st.st_mtime_ns
+                    and cached[2] == size):
+                self.hits += 1
+                self.fresh[rel_path] = cached
+                lines = cached[3]
+                return size, (None if lines == NOT_TEXT else lines)
+
+            if size > MAX_COUNT_BYTES or os.path.splitext(path)[1].lower() in BINARY_EXTENSIONS:
+                return size, None
+            if self.bytes_read + size > self.read_budget:
+                self.read_exhausted = True
+                return size, None
+
+            lines, read = count_lines(path, MAX_COUNT_BYTES)
+            self.bytes_read += read
+            self.files_read += 1
+            if lines is None:
+                return size, None
+            # A write landing in the same mtime tick as our read would go unnoticed
+            if time.time() - st.st_mtime >= RACY_WINDOW_SECONDS:
+                self.fresh[rel_path] = [st.st_ino, st.st_mtime_ns, size, lines]
+            return size, (None if lines == NOT_TEXT else lines)
+
+    def annotate_store(self, store: TreeStore, root_path: str) -> None:
+        """
+        Annotate the files of a scanned tree, in tree order.
+
+        Args:
+            store: Scanned entries; annotations go to store.annotations
+            root_path: Absolute directory the store's paths are relative to
+        """
+        for index in range(len(store)):
+            if store.is_dir(index):
+                continue
+            annotation = self.annotate(os.path.join(root_path, store.rel_path(index)))
+            if annotation is not None:
+                store.annotations[index] = annotation
+            elif self.stat_exhausted:
+                return
+
+    def get(self, path) -> Optional[Annotation]:
+        """Lookup by absolute path, so the annotator can stand in for a store's annotations."""
+        return self.annotate(str(path))
+
+    def note(self) -> Optional[str]:
+        """Describe the budgets spent in this run, or None if none was."""
+        if self.stat_exhausted:
+            return f"first {self.stat_budget:,} files only (stat budget reached)"
+        if self.read_exhausted:
+            return f"line counts stopped after {format_size(self.bytes_read)} read (read budget reached)"
+        return None
+
+    def save(self, complete: bool = True) -> None:
+        """
+        Write line counts back if any file was read or a cached one went unseen.
+
+        Args:
+            complete: Whether every file of the project was annotated; files
+                not seen by an incomplete run keep their cached counts
+        """
+        if self.cache_file is None:
+            return
+        files = self.fresh
+        if not complete:
+            files = dict(self.cached)
+            files.update(self.fresh)
+        if not self.files_read and files.keys() == self.cached.keys():
+            return
+        data = {'version': ANNOTATION_CACHE_VERSION, 'root': self.root_path, 'files': files}
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
@@ -1,44 +1,69 @@
 #!/usr/bin/env python3
 """
 Context-Aware Tree Generator for Claude Code Plugin
-Generates ASCII tree structures for project directories with intelligent filtering.
+Generates ASCII tree structures for project directories with intelligent filtering,
+or the same tree as JSON/NDJSON for programs (see tree_json.py), or only
+what changed since an earlier snapshot (see tree_snapshot.py), optionally
+with file sizes and line counts (see file_annotations.py).
 
 Features:
 - Python 3.6+ compatible, stdlib only
 - Cross-platform support (Windows/Unix)
-- Intelligent filtering (.gitignore support, default exclusions)
-- Performance bounded (timeout, file limits, output size)
+- Intelligent filtering (.gitignore support, default exclusions, per-stack
+  exclusion profiles and .pseudocodeignore, see exclude_profiles.py)
+- Performance bounded (monotonic deadline, file limits, output size)
 - Graceful error handling
 """
 
 import os
 import sys
 import argparse
-import platform
-import signal
+import io
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Set, Optional
+from typing import Dict, List, Set, Tuple, Optional
+
+from deadline import DeadlineExceeded, ListingWatchdog
+from exclude_profiles import (CONFIG_FILE, DEFAULT_EXCLUDE_DIRS, DEFAULT_EXCLUDE_PATTERNS, PROFILES,
+                              ExclusionRules, load_exclusions)
+from file_annotations import FileAnnotator, format_annotation
+from git_index import GitIndexLister
+from ignore_rules import IgnoreMatcher, ignore_file_signature, load_base_matcher, parse_ignore_file
+from parallel_scan import ListingPrefetcher
+from relevance import SHALLOW_DEPTH, RelevanceScorer
+from scan_planner import AUTO_TARGET_MS, SAMPLE_SHARE, ScanPlan, choose_plan, load_plan, sample_repo, save_plan
+from stack_detect import StackDetector
+from tree_cache import TreeCache, DEFAULT_CACHE_DIR
+from tree_json import OUTPUT_FORMATS, format_error, iter_records, write_json, write_ndjson
+from token_budget import elision_footer, estimate_tokens, fit_store
+from tree_snapshot import Listings, Snapshot, by_depth, carry_over, diff_snapshots, format_diff
+from tree_store import MAX_STORE_DEPTH, TreeStore, last_sibling_flags
+from workspace import Workspace, detect_workspace
 
 # Constants
 DEFAULT_MAX_DEPTH = 10
 DEFAULT_MAX_FILES = 1000
 DEFAULT_TIMEOUT = 10
 MAX_OUTPUT_BYTES = 50 * 1024  # 50KB
+# With --git-index, directories shallower than this are still listed from
+# disk so that untracked (but not ignored) files near the root show up
+GIT_INDEX_WALK_DEPTH = 2
+# Scan strategies: depth-first until max_files (original behaviour), or
+# breadth-first with the file budget spread over levels and siblings
+SCAN_STRATEGIES = ('depth', 'breadth')
+# Breadth-first scans only list a directory if it can show this many files
+BREADTH_MIN_SHARE = 4
+# With --collapse N, a directory holding at least N/2 files is also collapsed
+# when this share of them has the same extension
+COLLAPSE_EXTENSION_SHARE = 0.9
+# Packages of a workspace scanned at the same time
+WORKSPACE_WORKERS = 4
+# Tokens set aside per line of the workspace overview under max_tokens
+WORKSPACE_LINE_TOKENS = 24
 EMPTY_FLAG = "<<PROJECT_EMPTY_NO_STRUCTURE>>"
 
-# Default exclusions
-DEFAULT_EXCLUDE_DIRS = {
-    '.git', 'node_modules', 'dist', 'build', '__pycache__',
-    'venv', '.next', '.venv', 'target', 'out', '.idea',
-    '.vscode', 'coverage', '.pytest_cache', '.mypy_cache',
-    'vendor', 'bower_components', '.nuxt', '.gradle'
-}
-
-DEFAULT_EXCLUDE_PATTERNS = {
-    '*.pyc', '*.pyo', '*.so', '*.dll', '*.exe', '*.bin',
-    '*.o', '*.class', '*.log', '.DS_Store', 'Thumbs.db'
-}
 
 
 class TimeoutError(Exception):
@@ -46,24 +71,144 @@ class TimeoutError(Exception):
     pass
 
 
+def allocate_budget(counts: List[int], budget: int) -> List[int]:
+    """
+    Split a file budget fairly across directories (water-filling).
+
+    Every directory gets an equal share; directories needing less than their
+    share pass the rest on to the others. Ties go to the directory that comes
+    first in scan order.
+
+    Args:
+        counts: Number of files available in each directory
+        budget: Total number of files that may be shown
+
+    Returns:
+        Number of files to show per directory, aligned with `counts`
+    """
+    quotas = [0] * len(counts)
+    left = budget
+    remaining = len(counts)
+    # Smallest first, so their unused share flows to the larger ones
+    for i in sorted(range(len(counts)), key=lambda i: (counts[i], -i)):
+        quota = min(counts[i], left // remaining)
+        quotas[i] = quota
+        left -= quota
+        remaining -= 1
+    return quotas
+
+
+def summarize_listing(dirs: List[str], files: List[str], threshold: int) -> Optional[str]:
+    """
+    Describe a directory that is too large or too uniform to list entry by entry.
+
+    A directory is collapsed when it has more than `threshold` entries, or at
+    least `threshold // 2` files of which COLLAPSE_EXTENSION_SHARE share one
+    extension. Only names are inspected, so no stat() call is made.
+
+    Args:
+        dirs: Directory names
+        files: File names
+        threshold: Fan-out above which a directory is collapsed (0 disables)
+
+    Returns:
+        Summary such as "1,842 files: *.sql x1,840", or None to list the directory
+    """
+    if threshold <= 0:
+        return None
+
+    fan_out = len(dirs) + len(files)
+    if fan_out <= threshold and len(files) < max(threshold // 2, 1):
+        return None
+
+    counts = {}  # type: Dict[str, int]
+    for name in files:
+        extension = os.path.splitext(name)[1]
+        counts[extension] = counts.get(extension, 0) + 1
+    extension, count = min(counts.items(), key=lambda item: (-item[1], item[0]),
+                            default=('', 0))
+    homogeneous = bool(extension) and count >= COLLAPSE_EXTENSION_SHARE * len(files)
+    if fan_out <= threshold and not homogeneous:
+        return None
+
+    parts = []
+    if files or not dirs:
+        summary = f"{len(files):,} files"
+        if homogeneous:
+            summary += f": *{extension} x{count:,}"
+        parts.append(summary)
+    if dirs:
+        parts.append(f"{len(dirs):,} dirs")
+    return ", ".join(parts)
+
+
 class TreeGenerator:
     """Generates ASCII tree structures from directory hierarchies."""
 
     def __init__(self, root_path: str, max_depth: int = DEFAULT_MAX_DEPTH,
                  max_files: int = DEFAULT_MAX_FILES, include_hidden: bool = False,
-                 timeout: int = DEFAULT_TIMEOUT):
+                 timeout: int = DEFAULT_TIMEOUT, cache_dir: Optional[str] = None,
+                 use_git_index: bool = False, workers: int = 1, strategy: str = 'depth',
+                 collapse_threshold: int = 0, detect_stack: bool = False,
+                 output_format: str = 'ascii', max_tokens: int = 0,
+                 focus: Optional[str] = None, workspace: bool = False,
+                 snapshot_path: Optional[str] = None, diff_since: Optional[str] = None,
+                 exclude_profiles: Tuple[str, ...] = (), annotate: bool = False,
+                 follow_symlinks: bool = False, auto: bool = False,
+                 target_ms: int = AUTO_TARGET_MS):
         """
         Initialize tree generator.
 
         Args:
             root_path: Root directory to scan
-            max_depth: Maximum recursion depth
+            max_depth: Maximum recursion depth (capped at MAX_STORE_DEPTH + 1)
             max_files: Maximum number of files to process
             include_hidden: Whether to include hidden files/dirs
-            timeout: Maximum execution time in seconds
+            timeout: Scan deadline in seconds, counted from the start of the
+                scan and enforced on each directory listing (0 disables it)
+            cache_dir: Directory for the persistent listing cache (None disables it)
+            use_git_index: List tracked directories from .git/index when the
+                root is inside a git work tree
+            workers: Number of threads listing directories ahead of the scan
+                (1 scans sequentially)
+            strategy: 'depth' fills max_files in depth-first order; 'breadth'
+                spreads it over levels and sibling directories
+            collapse_threshold: Replace the contents of directories below the
+                root that are larger or more uniform than this with a summary
+                line (0 lists everything)
+            detect_stack: Parse manifests found while scanning and add a
+                [STACK] header with languages, frameworks and test runners
+            output_format: 'ascii' for the tree drawing, 'json' or 'ndjson'
+                for structured records (see tree_json.py)
+            max_tokens: Prune the ASCII tree, deepest entries first, until it
+                fits this many estimated tokens; replaces the MAX_OUTPUT_BYTES
+                cap (0 keeps the byte cap)
+            focus: Prompt to rank the tree by: only directories whose path
+                matches its keywords are scanned to max_depth, the rest to
+                SHALLOW_DEPTH, and max_tokens prunes irrelevant entries first
+            workspace: If the root declares a monorepo workspace, scan each
+                member package on its own share of max_files (ASCII output)
+            snapshot_path: Write the directory listings read by the scan to
+                this snapshot file
+            diff_since: Snapshot file to compare against; if it matches this
+                root and these settings, the ASCII output lists only the
+                added, removed and renamed entries, and --focus is ignored
+            exclude_profiles: Exclusion profiles to apply on top of those named
+                in the root's .pseudocodeignore and those detected from the
+                root's manifests
+            annotate: Add the size, and for small text files the line count,
+                to every file shown, within the budgets of file_annotations.py
+            follow_symlinks: Show symlinks as "name -> target" and scan linked
+                directories like any other, on the same budget; a directory
+                already listed under the same (st_dev, st_ino) is shown but
+                not listed again
+            auto: Replace max_depth, max_files, strategy, collapse_threshold
+                and workers with limits chosen from a sample of the tree
+                (see scan_planner.py), remembered in cache_dir if set
+            target_ms: Latency the auto limits aim for
         """
         self.root_path = Path(root_path).resolve()
-        self.max_depth = max_depth
+        self.max_depth = min(max_depth, MAX_STORE_DEPTH + 1)
         self.max_files = max_files
         self.include_hidden = include_hidden
         self.timeout = timeout
@@ -71,45 +216,111 @@ class TreeGenerator:
         self.dir_count = 0
         self.skipped_count = 0
         self.errors = []
-        self.gitignore_patterns = set()
         self.timed_out = False
-
-    def load_gitignore_patterns(self) -> Set[str]:
+        self.deadline = None  # type: Optional[float]
+        self.watchdog = None  # type: Optional[ListingWatchdog]
+        self.listing_abandoned = False
+        self.base_matcher = IgnoreMatcher()
+        self.exclude_profiles = tuple(exclude_profiles)
+        # Directory whose .pseudocodeignore and manifests select the exclusions
+        self.exclusions_root = self.root_path
+        # Defaults until prepare() loads the project's profiles
+        self.exclusions = load_exclusions()[0]  # type: ExclusionRules
+        self.ignore_prefix = ''
+        self.ignore_matchers = {}  # type: Dict[str, IgnoreMatcher]
+        self.cache_dir = cache_dir
+        self.cache = None  # type: Optional[TreeCache]
+        self.use_git_index = use_git_index
+        self.git_index = None  # type: Optional[GitIndexLister]
+        self.workers = max(1, workers)
+        self.prefetcher = None  # type: Optional[ListingPrefetcher]
+        self.strategy = strategy
+        self.collapse_threshold = max(0, collapse_threshold)
+        self.summaries = {}  # type: Dict[Path, str]
+        self.collapsed_dirs = 0
+        self.collapsed_files = 0
+        self.detect_stack = detect_stack
+        self.stack = None  # type: Optional[StackDetector]
+        self.output_format = output_format
+        self.error = None  # type: Optional[str]
+        self.max_tokens = max(0, max_tokens)
+        self.elided = {}  # type: Dict[str, int]
+        self.focus = focus
+        self.relevance = None  # type: Optional[RelevanceScorer]
+        if focus:
+            self.relevance = RelevanceScorer(focus) or None
+        self.relevance_scores = {self.root_path: 0.0}  # type: Dict[Path, float]
+        # The focus of a diff, which is scanned unranked (see unfocused_listings())
+        self.diff_focus = None  # type: Optional[RelevanceScorer]
+        self.workspace_mode = workspace
+        self.workspace = None  # type: Optional[Workspace]
+        # Directories shown but not entered (workspace packages scanned separately)
+        self.skip_dirs = set()  # type: Set[Path]
+        self.snapshot_path = snapshot_path
+        self.diff_since = diff_since
+        self.baseline = None  # type: Optional[Snapshot]
+        # Listings read by the scan, recorded for a snapshot
+        self.listings = {} if snapshot_path or diff_since else None  # type: Optional[Listings]
+        self.annotate = annotate
+        self.annotator = None  # type: Optional[FileAnnotator]
+        self.follow_symlinks = follow_symlinks
+        # Entry path -> link target, for the symlinks listed
+        self.links = {}  # type: Dict[Path, str]
+        # Directories whose listing holds a symlink, never cached
+        self.linked_dirs = set()  # type: Set[str]
+        # (st_dev, st_ino) -> first path a directory was listed under
+        self.visited = {} if follow_symlinks else None  # type: Optional[Dict[Tuple[int, int], Path]]
+        self.auto = auto
+        self.target_ms = target_ms
+        self.plan = None  # type: Optional[ScanPlan]
+        self.started = None  # type: Optional[float]
+        # Guards counters and the cache when listings run on worker threads
+        self._lock = threading.Lock()
+        self._root_prefix_len = len(str(self.root_path)) + 1
+
+    def parent_matcher(self, rel_path: str) -> IgnoreMatcher:
+        """Return the matcher a directory inherits from its parent."""
+        if not rel_path:
+            return self.base_matcher
+        return self.ignore_matchers.get(rel_path.rpartition(os.sep)[0], self.base_matcher)
+
+    def load_ignore_matcher(self, rel_path: str, has_ignore_file: bool) -> IgnoreMatcher:
         """
-        Load and parse .gitignore patterns if available.
+        Resolve the compiled ignore rules that apply inside a directory.
 
-        Returns:
-            Set of gitignore patterns (simplified glob patterns)
-        """
-        gitignore_path = self.root_path / '.gitignore'
-        patterns = set()
+        A directory without its own .gitignore shares its parent's matcher;
+        one with a .gitignore gets the parent's rules plus its own, compiled
+        once and inherited by its children.
 
-        if not gitignore_path.exists():
-            return patterns
-
-        try:
-            with open(gitignore_path, 'r', encoding='utf-8', errors='replace') as f:
-                for line in f:
-                    line = line.strip()
-                    # Skip comments and empty lines
-                    if line and not line.startswith('#'):
-                        # Remove leading slash
-                        if line.startswith('/'):
-                            line = line[1:]
-                        patterns.add(line)
-        except Exception as e:
-            self.errors.append(f"Failed to parse .gitignore: {e}")
-
-        return patterns
+        Args:
+            rel_path: Directory relative to the scan root ('' for the root)
+            has_ignore_file: Whether the directory contains a .gitignore
 
-    def should_exclude(self, path: Path, name: str, is_dir: bool) -> bool:
+        Returns:
+            IgnoreMatcher for entries of the directory
+        """
+        parent = self.parent_matcher(rel_path)
+        matcher = parent
+        if has_ignore_file:
+            base = self.ignore_prefix + (rel_path.replace(os.sep, '/') + '/' if rel_path else '')
+            path = os.path.join(str(self.root_path), rel_path, '.gitignore')
+            matcher = parent.extend(parse_ignore_file(path, base, base + '.gitignore'),
+                                    ignore_file_signature(path))
+
+        self.ignore_matchers[rel_path] = matcher
+        return matcher
+
+    def should_exclude(self, rel_path: str, name: str, is_dir: bool,
+                       matcher: Optional[IgnoreMatcher] = None) -> bool:
         """
         Check if a path should be excluded from the tree.
 
         Args:
-            path: Full path to the file/directory
+            rel_path: Path relative to the scan root, '/'-separated
             name: Name of the file/directory
             is_dir: Whether this is a directory
+            matcher: Ignore rules of the containing directory (None skips
+                .gitignore matching, e.g. for tracked paths)
 
         Returns:
             True if should be excluded, False otherwise
@@ -118,127 +329,517 @@ class TreeGenerator:
         if not self.include_hidden and name.startswith('.') and name != '.':
             return True
 
-        # Exclude default directories
-        if is_dir and name in DEFAULT_EXCLUDE_DIRS:
+        # Exclude default, profile and .pseudocodeignore names
+        if self.exclusions.excludes(name, is_dir):
             return True
 
-        # Check default file patterns
-        if not is_dir:
-            for pattern in DEFAULT_EXCLUDE_PATTERNS:
-                if pattern.startswith('*') and name.endswith(pattern[1:]):
-                    return True
-                elif name == pattern:
-                    return True
-
-        # Check gitignore patterns (simplified matching)
-        for pattern in self.gitignore_patterns:
-            # Simple glob matching
-            if pattern.endswith('/') and is_dir and name == pattern[:-1]:
-                return True
-            elif pattern.startswith('*') and name.endswith(pattern[1:]):
-                return True
-            elif pattern == name:
-                return True
-            elif '/' not in pattern and name == pattern:
-                return True
-
-        return False
+        return matcher is not None and matcher.is_ignored(self.ignore_prefix + rel_path, is_dir)
 
-    def scan_directory(self, dir_path: Path, current_depth: int = 0) -> List[Tuple[int, str, bool, Path]]:
+    def cache_settings(self) -> str:
+        """Describe every setting that decides what a cached listing contains."""
+        return "hidden={};collapse={};exclusions={};symlinks={}".format(
+            self.include_hidden,
+            self.collapse_threshold,
+            self.exclusions.signature,
+            self.follow_symlinks,
+        )
+
+    def snapshot_settings(self) -> str:
+        """Describe the settings that decide what a snapshot's listings contain."""
+        return self.cache_settings() + f";git_index={self.use_git_index}"
+
+    def relative_path(self, path) -> str:
+        """Return `path` relative to the scan root ('' for the root itself)."""
+        return str(path)[self._root_prefix_len:]
+
+    def list_entries(self, dir_path) -> Tuple[List[str], List[str]]:
         """
-        Recursively scan directory and build tree structure.
+        List a single directory from the git index, the listing cache or disk.
 
         Args:
-            dir_path: Directory to scan
-            current_depth: Current recursion depth
+            dir_path: Directory to list
 
         Returns:
-            List of tuples: (depth, name, is_dir, full_path)
+            Tuple of (directory names, file names), each sorted case-insensitively
         """
-        if self.timed_out:
-            return []
+        rel_path = self.relative_path(dir_path)
 
-        if current_depth >= self.max_depth:
-            return []
-
-        if self.file_count >= self.max_files:
-            return []
+        if self.git_index is not None:
+            depth = rel_path.count(os.sep) + 1 if rel_path else 0
+            if depth >= GIT_INDEX_WALK_DEPTH:
+                tracked = self.git_index.list_directory(rel_path.replace(os.sep, '/'))
+                if tracked is not None:
+                    dirs, files = tracked
+                    # Untracked subdirectories still inherit this directory's rules
+                    self.load_ignore_matcher(rel_path, '.gitignore' in files)
+                    return self.filter_tracked(rel_path, dirs, files)
 
-        tree = []
+        if self.cache is None:
+            return self.read_directory(dir_path)
 
         try:
-            # Get directory contents
-            entries = []
-            try:
-                entries = list(dir_path.iterdir())
-            except PermissionError:
-                self.errors.append(f"Permission denied: {dir_path}")
-                self.skipped_count += 1
-                return tree
-            except Exception as e:
-                self.errors.append(f"Error reading {dir_path}: {e}")
-                return tree
+            st = os.stat(dir_path)
+        except OSError:
+            return self.read_directory(dir_path)
+
+        with self._lock:
+            cached = self.cache.lookup(
+                rel_path, st,
+                lambda has_ignore_file: self.load_ignore_matcher(rel_path, has_ignore_file).signature
+            )
+        if cached is not None:
+            return cached
+
+        dirs, files = self.read_directory(dir_path)
+        if self.linked_dirs and rel_path in self.linked_dirs:
+            # The cache keeps names only, not link targets
+            return dirs, files
+        signature = self.ignore_matchers[rel_path].signature
+        with self._lock:
+            self.cache.store(rel_path, st, dirs, files,
+                             signature != self.parent_matcher(rel_path).signature, signature)
+        return dirs, files
+
+    def filter_tracked(self, rel_path: str, dirs: List[str],
+                       files: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Apply default exclusions and sorting to a git index listing.
 
-            # Separate dirs and files, filter, and sort
-            dirs = []
-            files = []
+        .gitignore rules are not consulted: git never ignores a tracked path.
 
-            for entry in entries:
-                try:
+        Args:
+            rel_path: Directory relative to the scan root
+            dirs: Directory names
+            files: File names
+
+        Returns:
+            Tuple of (directory names, file names), each sorted case-insensitively
+        """
+        dirs = [name for name in dirs if not self.should_exclude(name, name, True)]
+        files = [name for name in files if not self.should_exclude(name, name, False)]
+        self.sort_listing(rel_path, dirs, files)
+        return dirs, files
+
+    def sort_listing(self, rel_path: str, dirs: List[str], files: List[str]) -> None:
+        """
+        Sort a listing in place, case-insensitively.
+
+        Listings below the root with more entries than collapse_threshold are
+        left unsorted: they are always collapsed into a summary line.
+        """
+        if rel_path and 0 < self.collapse_threshold < len(dirs) + len(files):
+            return
+        dirs.sort(key=str.lower)
+        files.sort(key=str.lower)
+
+    def read_directory(self, dir_path) -> Tuple[List[str], List[str]]:
+        """
+        List a single directory and split it into filtered, sorted names.
+
+        Uses os.scandir so that the file type comes from the cached d_type of
+        each DirEntry; no stat() call is issued unless the filesystem does
+        not report a type (DT_UNKNOWN), in which case DirEntry falls back to
+        lstat() on its own. A .gitignore found in the listing applies to the
+        directory's own entries, so filtering happens after the listing.
+        Symlinks are skipped, or with follow_symlinks listed as what they
+        point to (one stat() and one readlink() each); dangling ones are
+        skipped either way.
+
+        Args:
+            dir_path: Directory to list
+
+        Returns:
+            Tuple of (directory names, file names), each sorted case-insensitively
+        """
+        entries = []
+        links = {}  # type: Dict[str, str]
+        has_ignore_file = False
+
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
                     name = entry.name
-                    is_dir = entry.is_dir()
-                    is_symlink = entry.is_symlink()
+                    if name == '.gitignore':
+                        has_ignore_file = True
 
-                    # Skip symlinks to avoid cycles
-                    if is_symlink:
+                    # Hidden entries are rejected on the name alone, before
+                    # anything can touch the filesystem
+                    if not self.include_hidden and name.startswith('.'):
                         continue
 
-                    # Check exclusions
-                    if self.should_exclude(entry, name, is_dir):
+                    try:
+                        if entry.is_symlink():
+                            # Followed links are checked for cycles in fetch_entries()
+                            if not self.follow_symlinks:
+                                continue
+                            is_dir = entry.is_dir()
+                            if not is_dir and not entry.is_file():
+                                continue
+                            links[name] = os.readlink(entry.path)
+                            entries.append((name, is_dir))
+                            continue
+                        entries.append((name, entry.is_dir(follow_symlinks=False)))
+                    except OSError:
+                        with self._lock:
+                            self.skipped_count += 1
                         continue
+        except PermissionError:
+            self.errors.append(f"Permission denied: {dir_path}")
+            with self._lock:
+                self.skipped_count += 1
+            return [], []
+        except OSError as e:
+            self.errors.append(f"Error reading {dir_path}: {e}")
+            return [], []
+
+        rel_path = self.relative_path(dir_path)
+        matcher = self.load_ignore_matcher(rel_path, has_ignore_file)
+        prefix = rel_path.replace(os.sep, '/') + '/' if rel_path else ''
+
+        dirs = []
+        files = []
+        for name, is_dir in entries:
+            if self.should_exclude(prefix + name, name, is_dir, matcher):
+                continue
+            if is_dir:
+                dirs.append(name)
+            else:
+                files.append(name)
+
+        if links:
+            dir_path = Path(dir_path)
+            with self._lock:
+                self.linked_dirs.add(rel_path)
+                for name, target in links.items():
+                    self.links[dir_path / name] = target
+
+        # Sort alphabetically
+        self.sort_listing(rel_path, dirs, files)
+        return dirs, files
+
+    def expired(self) -> bool:
+        """Check the deadline, marking the scan as timed out once it has passed."""
+        if not self.timed_out and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.timed_out = True
+        return self.timed_out
+
+    def next_listing(self, dir_path: Path) -> Tuple[List[str], List[str]]:
+        """List a directory, through the prefetcher when one is running."""
+        if self.prefetcher is None:
+            return self.list_entries(dir_path)
+        return self.prefetcher.get(dir_path)
+
+    def fetch_entries(self, dir_path: Path) -> Tuple[List[str], List[str]]:
+        """
+        List a directory, through the watchdog when a deadline is set.
 
-                    if is_dir:
-                        dirs.append((name, entry))
-                    else:
-                        files.append((name, entry))
+        A listing still running at the deadline is abandoned: the scan is
+        marked as timed out and the directory is treated as empty.
+        Manifests in the listing are handed to the stack detector. With
+        follow_symlinks, a directory already listed under another path is
+        not listed again (see visit()).
+        """
+        if self.visited is not None:
+            seen = self.visit(dir_path)
+            if seen is not None:
+                self.summaries[dir_path] = seen
+                return [], []
+
+        if self.watchdog is None:
+            listing = self.next_listing(dir_path)
+        else:
+            try:
+                listing = self.watchdog.get(dir_path)
+            except DeadlineExceeded:
+                self.timed_out = True
+                if self.watchdog.abandoned and not self.listing_abandoned:
+                    self.listing_abandoned = True
+                    self.errors.append(f"Listing abandoned at deadline: {dir_path}")
+                return [], []
+
+        if self.stack is not None or self.listings is not None:
+            rel_dir = self.relative_path(dir_path).replace(os.sep, '/')
+            if self.stack is not None:
+                self.stack.observe(rel_dir, listing[1])
+            if self.listings is not None:
+                self.listings[rel_dir] = listing
+        return listing
+
+    def visit(self, dir_path: Path) -> Optional[str]:
+        """
+        Record a directory about to be listed under its (st_dev, st_ino).
 
-                except (PermissionError, OSError) as e:
-                    self.skipped_count += 1
-                    continue
+        Returns:
+            None if no directory with that identity was listed before,
+            otherwise a note naming the first path it was listed under
+            ("loops back to src" for an ancestor, "same as packages/ui"
+            for any other directory)
+        """
+        try:
+            st = os.stat(dir_path)
+        except OSError:
+            return None
+        first = self.visited.setdefault((st.st_dev, st.st_ino), dir_path)
+        if first == dir_path:
+            return None
+        rel_path = self.relative_path(first).replace(os.sep, '/') or '.'
+        if first in dir_path.parents:
+            return "loops back to " + rel_path
+        return "same as " + rel_path
+
+    def collapse(self, dir_path: Path, dirs: List[str], files: List[str]) -> bool:
+        """
+        Record a summary line for `dir_path` if its listing should be collapsed.
 
-            # Sort alphabetically
-            dirs.sort(key=lambda x: x[0].lower())
-            files.sort(key=lambda x: x[0].lower())
+        Returns:
+            True if the directory's entries must not be listed
+        """
+        summary = summarize_listing(dirs, files, self.collapse_threshold)
+        if summary is None:
+            return False
+        self.summaries[dir_path] = summary
+        self.collapsed_dirs += 1
+        self.collapsed_files += len(files)
+        return True
+
+    def directory_relevance(self, dir_path: Path) -> float:
+        """Return the summed relevance scores of the names on a directory's path."""
+        score = self.relevance_scores.get(dir_path)
+        if score is None:
+            score = self.directory_relevance(dir_path.parent) + self.relevance.name_score(dir_path.name)
+            self.relevance_scores[dir_path] = score
+        return score
+
+    def depth_limit(self, dir_path: Path) -> int:
+        """Return the depth below which a directory's entries are not listed."""
+        if self.skip_dirs and dir_path in self.skip_dirs:
+            return 0
+        if self.relevance is None or self.directory_relevance(dir_path) > 0:
+            return self.max_depth
+        return min(self.max_depth, SHALLOW_DEPTH)
+
+    def open_directory(self, dir_path: Path, depth: int) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        List a directory the scan is about to enter.
 
-            # Process directories first
-            for name, entry in dirs:
-                if self.file_count >= self.max_files or self.timed_out:
-                    break
+        Returns:
+            Its (directory names, file names), or None if it lies beyond
+            its depth limit, cannot be scanned, or is collapsed into a summary
+        """
+        if depth >= self.depth_limit(dir_path):
+            return None
+        try:
+            dirs, files = self.fetch_entries(dir_path)
+        except Exception as e:
+            self.errors.append(f"Unexpected error scanning {dir_path}: {e}")
+            return None
+        if depth > 0 and self.collapse(dir_path, dirs, files):
+            return None
+        return dirs, files
 
-                self.dir_count += 1
-                tree.append((current_depth, name, True, entry))
+    def scan_directory(self, dir_path: Path, current_depth: int = 0) -> List[Tuple[int, str, bool, Path]]:
+        """
+        Recursively scan directory and build tree structure.
 
-                # Recurse into subdirectory
-                subtree = self.scan_directory(entry, current_depth + 1)
-                tree.extend(subtree)
+        Args:
+            dir_path: Directory to scan
+            current_depth: Current recursion depth
 
-            # Then process files
-            for name, entry in files:
-                if self.file_count >= self.max_files or self.timed_out:
-                    break
+        Returns:
+            List of tuples: (depth, name, is_dir, full_path)
+        """
+        return self.with_full_paths(self.iter_directory(dir_path, current_depth))
 
-                self.file_count += 1
-                tree.append((current_depth, name, False, entry))
+    @staticmethod
+    def with_full_paths(entries) -> List[Tuple[int, str, bool, Path]]:
+        """Turn scan iterator entries into (depth, name, is_dir, full_path) tuples."""
+        return [(depth, name, is_dir, path if is_dir else path / name)
+                for depth, name, is_dir, path, _ in entries]
 
-        except Exception as e:
-            self.errors.append(f"Unexpected error scanning {dir_path}: {e}")
+    def iter_directory(self, dir_path: Path, current_depth: int = 0,
+                       listing: Optional[Tuple[List[str], List[str]]] = None):
+        """
+        Scan a directory depth-first, yielding entries as they are found.
+
+        A subdirectory is listed before its own entry is yielded, so a
+        collapsed directory already has its summary when it is formatted.
+
+        No Path is built for files: an entry carries the directory's own
+        path for a directory and the containing directory's path for a file.
+
+        The last-sibling flag is exact unless the scan stops early: a
+        directory is flagged from its parent's listing before its subtree is
+        scanned, so it cannot know that the file budget or the timeout will
+        cut off its later siblings.
+
+        Args:
+            dir_path: Directory to scan
+            current_depth: Current recursion depth
+            listing: The directory's (dirs, files) if already listed
+
+        Yields:
+            Tuples (depth, name, is_dir, path, is_last)
+        """
+        if listing is None:
+            if self.expired() or self.file_count >= self.max_files:
+                return
+            listing = self.open_directory(dir_path, current_depth)
+            if listing is None:
+                return
+
+        dirs, files = listing
+        if self.prefetcher is not None and current_depth + 1 < self.max_depth:
+            self.prefetcher.prefetch([dir_path / name for name in dirs])
+
+        # Process directories first
+        last_dir = len(dirs) - 1 if not files else -1
+        for i, name in enumerate(dirs):
+            if self.file_count >= self.max_files or self.expired():
+                return
+
+            entry = dir_path / name
+            child = self.open_directory(entry, current_depth + 1)
+            self.dir_count += 1
+            yield current_depth, name, True, entry, i == last_dir
+
+            # Recurse into subdirectory
+            if child is not None:
+                yield from self.iter_directory(entry, current_depth + 1, child)
+
+        # Then process files
+        last_file = len(files) - 1
+        for i, name in enumerate(files):
+            if self.file_count >= self.max_files or self.expired():
+                return
+
+            self.file_count += 1
+            yield (current_depth, name, False, dir_path,
+                   i == last_file or self.file_count >= self.max_files)
+
+    def scan_breadth_first(self) -> List[Tuple[int, str, bool, Path]]:
+        """
+        Scan level by level, spreading the file budget over levels and siblings.
 
-        return tree
+        Returns:
+            List of tuples (depth, name, is_dir, full_path) in the same
+            depth-first order as scan_directory()
+        """
+        return self.with_full_paths(self.iter_breadth_first())
+
+    def iter_breadth_first(self):
+        """
+        Plan a breadth-first scan, then yield its entries depth-first.
+
+        While deeper directories exist, each level may use at most half of the
+        remaining budget, split fairly between its directories with
+        allocate_budget(), so one huge early directory cannot starve its
+        siblings or the levels below. The next level only lists as many
+        directories as can still show BREADTH_MIN_SHARE files each, picked
+        fairly across their parents, and listing stops once the budget is
+        planned. Budget the deeper levels leave unused is handed back to
+        shallower levels that had to omit files.
+
+        All listing happens while planning, before the first entry is yielded.
+
+        Yields:
+            Tuples (depth, name, is_dir, path, is_last) as iter_directory()
+        """
+        listings = {}  # type: Dict[Path, Tuple[List[str], List[str]]]
+        quotas = {}  # type: Dict[Path, int]
+        levels = []  # type: List[List[Path]]
+        remaining = self.max_files
+        frontier = [self.root_path]
+
+        while frontier and remaining > 0 and not self.expired():
+            if self.prefetcher is not None:
+                self.prefetcher.prefetch(frontier)
+
+            listed = []
+            children = []
+            for dir_path in frontier:
+                if self.expired():
+                    break
+                try:
+                    dirs, files = self.fetch_entries(dir_path)
+                except Exception as e:
+                    self.errors.append(f"Unexpected error scanning {dir_path}: {e}")
+                    dirs, files = [], []
+                if levels and self.collapse(dir_path, dirs, files):
+                    dirs, files = [], []
+                listings[dir_path] = (dirs, files)
+                listed.append(dir_path)
+                children.append([name for name in dirs
+                                 if len(levels) + 1 < self.depth_limit(dir_path / name)])
+
+            deeper = any(children)
+            level_budget = max(remaining // 2, 1) if deeper else remaining
+            shares = allocate_budget([len(listings[d][1]) for d in listed], level_budget)
+            quotas.update(zip(listed, shares))
+            remaining -= sum(shares)
+            levels.append(listed)
+
+            expand = allocate_budget([len(names) for names in children],
+                                     max(remaining // BREADTH_MIN_SHARE, 1) if remaining else 0)
+            frontier = [dir_path / name
+                        for dir_path, names, count in zip(listed, children, expand)
+                        for name in names[:count]]
+
+        # Hand unused budget back to levels that had to leave files out
+        for listed in levels:
+            if remaining <= 0:
+                break
+            counts = [len(listings[d][1]) for d in listed]
+            used = sum(quotas[d] for d in listed)
+            if used < sum(counts):
+                shares = allocate_budget(counts, used + remaining)
+                quotas.update(zip(listed, shares))
+                remaining -= sum(shares) - used
+
+        if self.root_path in listings:
+            yield from self.iter_planned(self.root_path, 0, listings, quotas)
+
+    def iter_planned(self, dir_path: Path, depth: int,
+                     listings: Dict[Path, Tuple[List[str], List[str]]],
+                     quotas: Dict[Path, int]):
+        """Yield a planned directory's entries in depth-first order, with exact last-sibling flags."""
+        dirs, files = listings[dir_path]
+        files = files[:quotas[dir_path]]
+
+        last_dir = len(dirs) - 1 if not files else -1
+        for i, name in enumerate(dirs):
+            entry = dir_path / name
+            self.dir_count += 1
+            yield depth, name, True, entry, i == last_dir
+            if entry in listings:
+                yield from self.iter_planned(entry, depth + 1, listings, quotas)
+
+        last_file = len(files) - 1
+        for i, name in enumerate(files):
+            self.file_count += 1
+            yield depth, name, False, dir_path, i == last_file
+
+    @staticmethod
+    def last_sibling_flags(tree: List[Tuple[int, str, bool, Path]]) -> List[bool]:
+        """
+        Compute, for every entry, whether it is the last child of its parent.
+
+        Args:
+            tree: List of tuples (depth, name, is_dir, path) in scan order
+
+        Returns:
+            List of booleans aligned with `tree`
+        """
+        return last_sibling_flags([entry[0] for entry in tree])
 
     def format_tree_ascii(self, tree: List[Tuple[int, str, bool, Path]]) -> str:
         """
         Format tree structure as ASCII art.
 
+        Runs in linear time: last-sibling flags come from a single backward
+        pass, and each depth's prefix is derived from its parent's prefix
+        rather than rebuilt per line. Collapsed directories get their
+        summary appended.
+
         Args:
             tree: List of tuples (depth, name, is_dir, path)
 
@@ -248,45 +849,85 @@ class TreeGenerator:
         if not tree:
             return EMPTY_FLAG
 
-        lines = []
-        lines.append(self.root_path.name + "/")
+        lines = [self.root_path.name + "/"]
+        lines.extend(self.iter_tree_lines(
+            (depth, name, is_dir, path, is_last)
+            for (depth, name, is_dir, path), is_last in zip(tree, self.last_sibling_flags(tree))
+        ))
+        return "\n".join(lines)
+
+    def format_store(self, store: TreeStore) -> str:
+        """
+        Format a compact tree store as ASCII art, like format_tree_ascii().
 
-        # Track which depths need continuation lines
-        depth_continues = {}
+        Args:
+            store: Entries of a finished scan
 
-        for i, (depth, name, is_dir, _) in enumerate(tree):
-            # Check if there are more items at this depth level
-            is_last = True
-            for j in range(i + 1, len(tree)):
-                if tree[j][0] < depth:
-                    break
-                if tree[j][0] == depth:
-                    is_last = False
-                    break
+        Returns:
+            ASCII tree string
+        """
+        if not store:
+            return EMPTY_FLAG
+
+        lines = [self.root_path.name + "/"]
+        lines.extend(self.iter_tree_lines(store.entries(), store.summaries, store.annotations,
+                                          store.links))
+        return "\n".join(lines)
 
-            # Build prefix
-            prefix = ""
-            for d in range(depth):
-                if depth_continues.get(d, False):
-                    prefix += "|   "
-                else:
-                    prefix += "    "
+    def iter_tree_lines(self, entries, summaries: Optional[dict] = None, annotations=None,
+                        links: Optional[dict] = None):
+        """
+        Format entries as ASCII tree lines, one line per entry.
+
+        Args:
+            entries: Iterable of (depth, name, is_dir, key, is_last); with
+                annotations or links, a file's key must be its own
+            summaries: Collapsed-directory summaries by directory key
+                (default: the generator's summaries, keyed by path)
+            annotations: (size, lines) of files by key, anything with a
+                dict-like get()
+            links: Symlink targets by key (default: the generator's links,
+                keyed by path)
+
+        Yields:
+            One line per entry, without the root line or trailing newline
+        """
+        # prefixes[d] is the continuation prefix for entries at depth d
+        prefixes = [""]
+        if summaries is None:
+            summaries = self.summaries
+        if links is None:
+            links = self.links
+
+        for depth, name, is_dir, path, is_last in entries:
+            prefix = prefixes[depth]
 
-            # Add branch
             if is_last:
-                prefix += "+-- "
-                depth_continues[depth] = False
+                branch = "+-- "
+                child_prefix = prefix + "    "
             else:
-                prefix += "|-- "
-                depth_continues[depth] = True
+                branch = "|-- "
+                child_prefix = prefix + "|   "
 
             # Add name (with trailing slash for directories)
-            if is_dir:
-                lines.append(prefix + name + "/")
-            else:
-                lines.append(prefix + name)
-
-        return "\n".join(lines)
+            if not is_dir:
+                label = name
+                if links and path in links:
+                    label += " -> " + links[path]
+                annotation = annotations.get(path) if annotations else None
+                if annotation is not None:
+                    label += " (" + format_annotation(annotation) + ")"
+                yield prefix + branch + label
+                continue
+
+            label = name + "/"
+            if links and path in links:
+                label += " -> " + links[path]
+            if summaries and path in summaries:
+                label += " (" + summaries[path] + ")"
+            yield prefix + branch + label
+            del prefixes[depth + 1:]
+            prefixes.append(child_prefix)
 
     def truncate_output(self, tree_string: str) -> str:
         """
@@ -311,66 +952,682 @@ class TreeGenerator:
         except:
             truncated_string = tree_string[:int(MAX_OUTPUT_BYTES / 4)]  # Assume ~4 bytes per char
 
-        # Add truncation notice
-        footer = f"\n\n[TRUNCATED: Output exceeded {MAX_OUTPUT_BYTES} bytes]"
+        # The cut took the stats footer with it; keep the deadline marker
+        notice = self.truncation_notice()
+        if self.timed_out:
+            notice += "\n[PARTIAL: deadline reached]"
+        return truncated_string + notice
+
+    def fit_tokens(self, store: TreeStore, header: Optional[str]) -> TreeStore:
+        """
+        Prune a scanned tree to max_tokens, recording what was elided.
+
+        Args:
+            store: Scanned entries
+            header: Line printed above the tree, if any
+
+        Returns:
+            The entries to format
+        """
+        overhead = estimate_tokens(self.root_path.name + "/\n") + estimate_tokens(self.stats_footer())
+        if header is not None:
+            overhead += estimate_tokens(header + "\n\n")
+        score = self.relevance.name_score if self.relevance is not None else None
+        store, self.elided = fit_store(store, self.max_tokens, overhead,
+                                       lambda elided: elision_footer(elided, self.max_tokens), score)
+        return store
+
+    def truncation_notice(self) -> str:
+        """Describe output cut off at MAX_OUTPUT_BYTES, or at max_tokens when streaming."""
+        if self.max_tokens:
+            footer = f"\n\n[TRUNCATED: Output exceeded {self.max_tokens:,} tokens]"
+        else:
+            footer = f"\n\n[TRUNCATED: Output exceeded {MAX_OUTPUT_BYTES} bytes]"
         footer += f"\nShowing partial tree (scanned {self.file_count} files, {self.dir_count} directories)"
+        return footer
+
+    def stats(self) -> Dict[str, object]:
+        """Summarise the finished scan: totals, limits and collapsed directories."""
+        return {
+            'files': self.file_count,
+            'directories': self.dir_count,
+            'max_files': self.max_files,
+            'max_depth': self.max_depth,
+            'limited': self.file_count >= self.max_files,
+            'partial': self.timed_out,
+            'collapsed_directories': self.collapsed_dirs,
+            'collapsed_files': self.collapsed_files,
+            'skipped': self.skipped_count,
+        }
+
+    def stats_footer(self) -> str:
+        """Render stats() and the warnings as the footer of the ASCII tree."""
+        stats = self.stats()
+        footer = f"\n\nTotal: {stats['files']} files, {stats['directories']} directories"
+        if stats['limited']:
+            footer += f" (limited to {stats['max_files']} files)"
+        footer += f" (scanned to depth {stats['max_depth']})"
+
+        if stats['partial']:
+            footer += "\n[PARTIAL: deadline reached]"
+
+        if self.plan is not None:
+            footer += "\n" + self.plan.describe()
+
+        if stats['collapsed_directories']:
+            footer += (f"\nCollapsed: {stats['collapsed_directories']} directories "
+                       f"({stats['collapsed_files']:,} files) into summary lines")
+
+        if self.annotator is not None:
+            note = self.annotator.note()
+            if note is not None:
+                footer += f"\nAnnotations: {note}"
+
+        if stats['skipped'] > 0:
+            footer += f"\nSkipped: {stats['skipped']} items (permission denied or errors)"
 
-        return truncated_string + footer
+        if self.errors and len(self.errors) <= 3:
+            footer += "\n\nWarnings:"
+            for error in self.errors[:3]:
+                footer += f"\n- {error}"
 
-    def generate(self) -> str:
+        return footer
+
+    def load_base_ignore(self) -> None:
+        """Load .git/info/exclude and any .gitignore above the scan root."""
+        self.base_matcher, self.ignore_prefix = load_base_matcher(str(self.root_path))
+
+    def prepare(self) -> Optional[str]:
         """
-        Generate the complete tree structure.
+        Check the root and load ignore rules, git index and listing cache.
 
         Returns:
-            ASCII tree string or empty flag
+            Error message if the root cannot be scanned, None otherwise
         """
-        # Load gitignore patterns
-        self.gitignore_patterns = self.load_gitignore_patterns()
+        self.error = None
+        self.started = time.monotonic()
+        if self.timeout > 0:
+            self.deadline = self.started + self.timeout
 
         # Check if directory exists
         if not self.root_path.exists():
-            return f"[ERROR: Directory does not exist: {self.root_path}]"
+            self.error = f"Directory does not exist: {self.root_path}"
+            return self.error
 
         if not self.root_path.is_dir():
-            return f"[ERROR: Not a directory: {self.root_path}]"
+            self.error = f"Not a directory: {self.root_path}"
+            return self.error
+
+        self.load_base_ignore()
+
+        # Compile the defaults with the project's profiles and .pseudocodeignore
+        self.exclusions, unknown = load_exclusions(str(self.exclusions_root), self.exclude_profiles)
+        for name in unknown:
+            self.errors.append(f"Unknown exclusion profile: {name}")
+
+        if self.use_git_index:
+            self.git_index = GitIndexLister.for_root(str(self.root_path))
+
+        # Before the listing cache, whose settings include the collapse threshold
+        if self.auto:
+            self.plan_limits()
+
+        if self.cache_dir:
+            self.cache = TreeCache(self.root_path, self.cache_dir, self.cache_settings())
+            self.cache.load()
+
+        if self.detect_stack:
+            self.stack = StackDetector(str(self.root_path), self.cache_dir)
+            self.stack.load()
+
+        if self.diff_since and self.output_format == 'ascii':
+            baseline = Snapshot.read(self.diff_since)
+            if (baseline is not None and baseline.root == str(self.root_path)
+                    and baseline.settings == self.snapshot_settings()):
+                self.baseline = baseline
+                # A diff is not ranked, and a full-depth scan sees deep changes
+                self.diff_focus, self.relevance = self.relevance, None
+
+        if self.annotate and self.baseline is None:
+            self.annotator = FileAnnotator(str(self.root_path), self.cache_dir)
+            self.annotator.load()
+
+        return None
+
+    def plan_settings(self) -> str:
+        """Describe the settings a remembered plan was sampled with (not the limits it sets)."""
+        return "hidden={};exclusions={};git_index={};symlinks={};max_tokens={}".format(
+            self.include_hidden, self.exclusions.signature, self.use_git_index, self.follow_symlinks,
+            self.max_tokens)
+
+    def plan_limits(self) -> None:
+        """Apply the remembered plan for this root, or sample the tree and choose one."""
+        plan = None
+        if self.cache_dir:
+            plan = load_plan(self.cache_dir, str(self.root_path), self.target_ms, self.plan_settings())
+        if plan is None:
+            # Sampled listings are listed again by the scan; report their errors once
+            errors, skipped = len(self.errors), self.skipped_count
+            seconds = self.target_ms * SAMPLE_SHARE / 1000
+            # Like the scan's, sampling listings give up at the deadline, and
+            # also once the sampling share of the target is spent
+            sample_deadline = time.monotonic() + seconds
+            if self.deadline is not None:
+                sample_deadline = min(sample_deadline, self.deadline)
+            watchdog = ListingWatchdog(self.list_entries, sample_deadline)
+            try:
+                estimate = sample_repo(self.root_path, watchdog.get, seconds=seconds)
+            finally:
+                watchdog.close()
+            del self.errors[errors:]
+            self.skipped_count = skipped
+            if estimate is None:
+                self.errors.append("Auto limits: the root listing outlasted sampling; default limits used")
+                return
+            plan = choose_plan(estimate, self.target_ms, self.max_tokens)
+
+        self.plan = plan
+        self.max_depth = min(plan.max_depth, MAX_STORE_DEPTH + 1)
+        self.max_files = plan.max_files
+        self.strategy = plan.strategy
+        self.collapse_threshold = plan.collapse_threshold
+        self.workers = plan.workers
+
+    def remember_plan(self) -> None:
+        """Store the plan with the duration of this run, if auto limits and a cache directory are used."""
+        if self.plan is not None and self.cache_dir and self.started is not None:
+            save_plan(self.cache_dir, str(self.root_path), self.plan, self.plan_settings(),
+                      (time.monotonic() - self.started) * 1000)
+
+    def iter_entries(self):
+        """
+        Scan the root with the configured strategy.
+
+        Yields:
+            Tuples (depth, name, is_dir, path, is_last) as iter_directory()
+        """
+        if self.workers > 1:
+            self.prefetcher = ListingPrefetcher(self.list_entries, self.workers)
+        if self.deadline is not None:
+            self.watchdog = ListingWatchdog(self.next_listing, self.deadline)
+        try:
+            if self.strategy == 'breadth':
+                yield from self.iter_breadth_first()
+            else:
+                yield from self.iter_directory(self.root_path)
+        finally:
+            if self.watchdog is not None:
+                self.watchdog.close()
+                self.watchdog = None
+            if self.prefetcher is not None:
+                # Joining a worker stuck in the filesystem would hang the scan
+                self.prefetcher.close(wait=not self.listing_abandoned)
+                self.prefetcher = None
+
+    def scan_store(self) -> TreeStore:
+        """
+        Scan the root into a compact TreeStore, without a Path per file.
+
+        Returns:
+            The scanned entries, with collapsed-directory summaries, link
+            targets and, when annotating, file annotations
+        """
+        store = TreeStore()
+        append = store.append
+        summaries = self.summaries
+        links = self.links
+        for depth, name, is_dir, path, _ in self.iter_entries():
+            index = append(depth, name, is_dir)
+            if is_dir and summaries and path in summaries:
+                store.summaries[index] = summaries[path]
+            if links:
+                target = links.get(path if is_dir else path / name)
+                if target is not None:
+                    store.links[index] = target
+        if self.annotator is not None:
+            self.annotate_store(store)
+        return store
+
+    def annotate_store(self, store: TreeStore) -> None:
+        """Add the size and line count of every file kept by the scan."""
+        self.annotator.annotate_store(store, str(self.root_path))
+
+    def save_cache(self) -> None:
+        """Persist the listing cache, marking it complete if the scan was not cut short."""
+        # A focused scan leaves irrelevant subtrees unlisted
+        complete = self.file_count < self.max_files and not self.timed_out and self.relevance is None
+        if self.cache is not None:
+            self.cache.save(complete=complete)
+        if self.stack is not None:
+            self.stack.save()
+        # Workspace packages share the root's annotator, which saves it
+        if self.annotate and self.annotator is not None:
+            self.annotator.save(complete=complete and not self.annotator.stat_exhausted)
+        self.remember_plan()
+
+    def save_snapshot(self) -> Optional[Snapshot]:
+        """
+        Build the snapshot of this scan and write it to snapshot_path, if set.
+
+        Listings of the baseline that this scan did not read again are
+        carried over.
+
+        Returns:
+            The snapshot, or None if listings were not recorded
+        """
+        if self.listings is None:
+            return None
+        listings = self.listings
+        if self.baseline is not None:
+            listings = carry_over(self.baseline, listings)
+        snapshot = Snapshot(str(self.root_path), self.snapshot_settings(), listings, self.stack_header())
+        if self.snapshot_path:
+            snapshot.write(self.snapshot_path)
+        return snapshot
+
+    def stack_header(self) -> Optional[str]:
+        """Return the [STACK] line for the manifests seen, if stack detection is on."""
+        return self.stack.header() if self.stack is not None else None
+
+    def envelope(self) -> Dict[str, object]:
+        """Return the stats, errors and stack that follow JSON entries, and the auto limits."""
+        envelope = {
+            'stats': self.stats(),
+            'errors': list(self.errors),
+            'stack': self.stack.summary() if self.stack is not None else None,
+        }
+        if self.plan is not None:
+            envelope['plan'] = self.plan.summary()
+        return envelope
+
+    def write_records(self, out, entries, summaries: Optional[dict] = None, annotations=None,
+                      links: Optional[dict] = None) -> None:
+        """Write entries as JSON or NDJSON records, followed by the envelope."""
+        root = {'root': self.root_path.name, 'path': str(self.root_path)}
+        write = write_ndjson if self.output_format == 'ndjson' else write_json
+        write(out, root, iter_records(entries, summaries, annotations, links), self.envelope)
+
+    def generate(self) -> str:
+        """
+        Generate the complete tree structure.
+
+        Returns:
+            ASCII tree string or empty flag, or a JSON document / NDJSON
+            lines with output_format 'json' / 'ndjson'
+        """
+        error = self.prepare()
+        if error is not None:
+            return format_error(self.output_format, error)
+
+        if self.baseline is not None:
+            return self.generate_diff()
+
+        if self.workspace_mode and self.output_format == 'ascii':
+            self.workspace = self.find_workspace()
+            if self.workspace is not None:
+                return self.generate_workspace()
 
         # Scan directory
-        tree = self.scan_directory(self.root_path)
+        store = self.scan_store()
+        self.save_cache()
+        self.save_snapshot()
+
+        if self.output_format != 'ascii':
+            out = io.StringIO()
+            self.write_records(out, store.entries(), store.summaries, store.annotations, store.links)
+            return out.getvalue().rstrip('\n')
 
         # Check if empty
-        if not tree:
+        if not store:
+            return self.empty_output()
+
+        header = self.stack_header()
+        tree_string = self.render_tree(store, header)
+        if header is not None:
+            tree_string = header + "\n\n" + tree_string
+
+        # A token budget has already been met by pruning
+        if self.max_tokens:
+            return tree_string
+
+        # Truncate if needed
+        return self.truncate_output(tree_string)
+
+    def empty_output(self) -> str:
+        """
+        Render an ASCII scan that found no entries.
+
+        Returns:
+            EMPTY_FLAG, or the root line and stats footer (with its
+            [PARTIAL: deadline reached] marker) if the deadline cut the scan
+            short, so a slow root is not reported as an empty project
+        """
+        if not self.timed_out:
             return EMPTY_FLAG
+        return self.root_path.name + "/" + self.stats_footer()
 
-        # Format as ASCII
-        tree_string = self.format_tree_ascii(tree)
+    def generate_diff(self) -> str:
+        """
+        Scan the root and list what changed since the baseline snapshot.
 
-        # Add stats footer
-        footer = f"\n\nTotal: {self.file_count} files, {self.dir_count} directories"
-        if self.file_count >= self.max_files:
-            footer += f" (limited to {self.max_files} files)"
-        footer += f" (scanned to depth {self.max_depth})"
+        Returns:
+            format_diff() output, with a note if the scan was cut short
+        """
+        self.scan_store()
+        self.save_cache()
+        for rel_dir in self.unfocused_listings():
+            del self.listings[rel_dir]
+        diff = diff_snapshots(self.baseline, self.save_snapshot())
+        output = format_diff(diff)
+        stats = self.stats()
+        if stats['limited'] or stats['partial']:
+            reason = "deadline reached" if stats['partial'] else f"limited to {self.max_files} files"
+            output += f"\n[PARTIAL: {reason}; directories not listed again are not compared]"
+        return output
+
+    def unfocused_listings(self) -> List[str]:
+        """
+        Return the new listings a diff leaves for a later prompt.
+
+        The trees injected before were ranked by their own focus, so a diff
+        scan lists directories below the depth they reached (shown by
+        diff_snapshots() as listed for the first time). With a focus, those
+        beyond SHALLOW_DEPTH that it does not reach stay out of this diff
+        and out of the new snapshot, to be listed once a prompt is about
+        them.
+        """
+        if self.diff_focus is None:
+            return []
+        kept = set(self.baseline.listings)
+        dropped = []
+        for rel_dir in sorted(self.listings, key=by_depth):
+            if rel_dir in kept:
+                continue
+            parts = rel_dir.split('/')
+            if rel_dir.rpartition('/')[0] in kept and (
+                    len(parts) < SHALLOW_DEPTH or sum(map(self.diff_focus.name_score, parts)) > 0):
+                kept.add(rel_dir)
+            else:
+                dropped.append(rel_dir)
+        return dropped
 
-        if self.skipped_count > 0:
-            footer += f"\nSkipped: {self.skipped_count} items (permission denied or errors)"
+    def render_tree(self, store: TreeStore, header: Optional[str] = None) -> str:
+        """
+        Format a non-empty scanned tree as ASCII with its stats footer.
 
-        if self.errors and len(self.errors) <= 3:
-            footer += "\n\nWarnings:"
-            for error in self.errors[:3]:
-                footer += f"\n- {error}"
+        Args:
+            store: Scanned entries
+            header: Line that will head the tree; only counted against max_tokens
+
+        Returns:
+            Tree and footer, pruned to max_tokens if set
+        """
+        if self.max_tokens:
+            store = self.fit_tokens(store, header)
 
-        tree_string += footer
+        # Format as ASCII and add stats footer
+        tree_string = self.format_store(store) + self.stats_footer()
+        if self.elided:
+            tree_string += elision_footer(self.elided, self.max_tokens)
+        return tree_string
 
-        # Truncate if needed
+    def find_workspace(self) -> Optional[Workspace]:
+        """
+        Detect the workspace the root declares, listing member globs like the scan.
+
+        Listings go through list_entries(), so excluded, ignored and hidden
+        directories are never walked, and through a watchdog when a deadline
+        is set. If the deadline passes first, the root is scanned as one tree.
+        """
+        # The scans list these directories again; report their errors once
+        errors, skipped = len(self.errors), self.skipped_count
+        watchdog = None
+        if self.deadline is not None:
+            watchdog = ListingWatchdog(self.list_entries, self.deadline)
+        stuck = None
+        try:
+            workspace = detect_workspace(str(self.root_path), self.exclusions, self.cache_dir,
+                                         self.list_entries if watchdog is None else watchdog.get)
+        except DeadlineExceeded as e:
+            workspace = None
+            self.timed_out = True
+            if watchdog.abandoned:
+                stuck = e.args[0]
+        finally:
+            if watchdog is not None:
+                watchdog.close()
+        del self.errors[errors:]
+        self.skipped_count = skipped
+        if stuck is not None:
+            self.listing_abandoned = True
+            self.errors.append(f"Listing abandoned at deadline: {stuck}")
+        return workspace
+
+    def member_generator(self, root_path: Path, max_files: int, max_tokens: int) -> 'TreeGenerator':
+        """Create a generator for one part of a workspace, with this one's settings and deadline."""
+        timeout = 0 if self.deadline is None else max(self.deadline - time.monotonic(), 0.001)
+        generator = type(self)(
+            str(root_path), max_depth=self.max_depth, max_files=max_files,
+            include_hidden=self.include_hidden, timeout=timeout, cache_dir=self.cache_dir,
+            use_git_index=self.use_git_index, workers=self.workers, strategy=self.strategy,
+            collapse_threshold=self.collapse_threshold, max_tokens=max_tokens, focus=self.focus,
+            exclude_profiles=self.exclude_profiles, follow_symlinks=self.follow_symlinks
+        )
+        # Packages follow the workspace root's exclusions and share its budgets
+        generator.exclusions_root = self.exclusions_root
+        generator.annotator = self.annotator
+        if self.listings is not None:
+            # Merged into this generator's snapshot by generate_workspace()
+            generator.listings = {}
+        return generator
+
+    def scan_member(self, generator: 'TreeGenerator') -> str:
+        """Scan one part of a workspace and render it without header or truncation."""
+        error = generator.prepare()
+        if error is not None:
+            return f"[ERROR: {error}]"
+        store = generator.scan_store()
+        generator.save_cache()
+        return generator.render_tree(store) if store else "(empty)"
+
+    def generate_workspace(self) -> str:
+        """
+        Scan the root and each workspace package on its own share of the budget.
+
+        The root (with package directories as labelled leaves) and every
+        package are scanned concurrently, each on an equal share of
+        max_files and max_tokens. Budget left unused by small parts is then
+        split among the parts that were cut short, and those are scanned
+        again. The listing cache makes the second scan cheap.
+
+        Returns:
+            Workspace overview, root tree and one tree per package
+        """
+        members = self.workspace.members
+        roots = [self.root_path] + [self.root_path / member['path'] for member in members]
+        labels = {root: "package " + (member['name'] or member['path'].rpartition('/')[2])
+                  for root, member in zip(roots[1:], members)}
+        tokens = max(self.max_tokens - WORKSPACE_LINE_TOKENS * (len(members) + 2), 0)
+
+        shares = allocate_budget([self.max_files] * len(roots), self.max_files)
+        generators = [None] * len(roots)  # type: List[Optional[TreeGenerator]]
+        outputs = [''] * len(roots)
+
+        def scan(i: int) -> Tuple['TreeGenerator', str]:
+            generator = self.member_generator(roots[i], shares[i],
+                                              tokens * shares[i] // max(self.max_files, 1))
+            if i == 0:
+                generator.skip_dirs = set(labels)
+                generator.summaries.update(labels)
+                generator.stack = self.stack
+            return generator, self.scan_member(generator)
+
+        pending = list(range(len(roots)))
+        for rescan in (False, True):
+            with ThreadPoolExecutor(max_workers=min(len(pending), WORKSPACE_WORKERS)) as pool:
+                for i, (generator, output) in zip(pending, pool.map(scan, pending)):
+                    generators[i], outputs[i] = generator, output
+
+            limited = [i for i, g in enumerate(generators) if g.file_count >= shares[i]]
+            leftover = sum(shares[i] - g.file_count
+                           for i, g in enumerate(generators) if i not in limited)
+            if rescan or not limited or leftover < len(limited) or self.expired():
+                break
+            for i, extra in zip(limited, allocate_budget([leftover] * len(limited), leftover)):
+                shares[i] += extra
+            pending = limited
+
+        for root, generator in zip(roots, generators):
+            if self.listings is not None:
+                prefix = self.relative_path(root).replace(os.sep, '/')
+                for rel_dir, listing in generator.listings.items():
+                    if prefix:
+                        rel_dir = prefix + '/' + rel_dir if rel_dir else prefix
+                    self.listings[rel_dir] = listing
+            self.file_count += generator.file_count
+            self.dir_count += generator.dir_count
+            self.skipped_count += generator.skipped_count
+            self.collapsed_dirs += generator.collapsed_dirs
+            self.collapsed_files += generator.collapsed_files
+            self.errors.extend(generator.errors)
+            self.timed_out = self.timed_out or generator.timed_out
+            self.listing_abandoned = self.listing_abandoned or generator.listing_abandoned
+
+        sections = [self.workspace_overview(generators[1:], shares[1:]), outputs[0]]
+        for member, output in zip(members, outputs[1:]):
+            title = f"[PACKAGE] {member['path']}"
+            if member['name']:
+                title += f" ({member['name']})"
+            sections.append(title + "\n" + output)
+        tree_string = "\n\n".join(sections)
+
+        if self.stack is not None:
+            for member in members:
+                self.stack.observe(member['path'], [member['manifest']])
+        # After the members' manifests, so the snapshot has the [STACK] line shown
+        self.save_snapshot()
+        if self.annotator is not None:
+            self.annotator.save(complete=False)
+        self.remember_plan()
+        if self.stack is not None:
+            self.stack.save()
+            header = self.stack.header()
+            if header is not None:
+                tree_string = header + "\n\n" + tree_string
+
+        if self.max_tokens:
+            return tree_string
         return self.truncate_output(tree_string)
 
+    def workspace_overview(self, generators: List['TreeGenerator'], shares: List[int]) -> str:
+        """Describe each package: name, version, stack and files shown."""
+        workspace = self.workspace
+        source = f" ({workspace.config})" if workspace.config else ""
+        lines = [f"[WORKSPACE] {workspace.kind}{source}: {len(workspace.members)} packages, "
+                 f"{self.max_files:,} files split across the root and packages"]
+        if self.plan is not None:
+            lines.append(self.plan.describe())
+        for member, generator, share in zip(workspace.members, generators, shares):
+            parts = []
+            if member['name']:
+                parts.append(member['name'] + (f" {member['version']}" if member['version'] else ""))
+            stack = member['languages'] + member['frameworks']
+            if stack:
+                parts.append(", ".join(stack))
+            files = f"{generator.file_count:,} files"
+            if generator.file_count >= share:
+                files += " (limited)"
+            parts.append(files)
+            lines.append(f"- {member['path']}: " + " - ".join(parts))
+        return "\n".join(lines)
 
-def handle_timeout(generator: TreeGenerator):
-    """Timeout handler that sets flag on generator."""
-    generator.timed_out = True
+    def keyed_by_file_path(self, entries):
+        """Give streamed files their own path as key, for annotations and link targets."""
+        if self.annotator is None and not self.follow_symlinks:
+            return entries
+        return ((depth, name, is_dir, path if is_dir else path / name, is_last)
+                for depth, name, is_dir, path, is_last in entries)
 
+    def stream(self, out) -> Optional[str]:
+        """
+        Write the tree to `out` line by line while the directories are scanned.
+
+        Neither the entries nor the output are held in memory, and writing
+        stops, together with the scan, once MAX_OUTPUT_BYTES (less room for
+        the footer) would be exceeded. The output matches generate() except
+        that the last-sibling branches of directories on the path where a
+        file limit or timeout cut the scan short may be drawn as "|--", and
+        that the [STACK] line, only complete once the scan is, ends the
+        footer instead of heading the tree. With max_tokens the tree cannot
+        be pruned before it is written, so the token budget replaces the
+        byte cap as a running limit instead. JSON and NDJSON records are
+        written as they are scanned, without the output cap. Annotated
+        files are stat()ed as their lines are written.
 
-def main():
-    """Main entry point."""
+        Args:
+            out: Text stream to write to
+
+        Returns:
+            Error message if the root cannot be scanned (nothing is written),
+            None otherwise
+        """
+        error = self.prepare()
+        if error is not None:
+            return format_error(self.output_format, error)
+
+        if self.output_format != 'ascii':
+            entries = self.iter_entries()
+            try:
+                self.write_records(out, self.keyed_by_file_path(entries),
+                                   annotations=self.annotator, links=self.links)
+            finally:
+                entries.close()
+            self.save_cache()
+            self.save_snapshot()
+            return None
+
+        if self.max_tokens:
+            # Leave room for the footer, as the byte cap does
+            budget = self.max_tokens - estimate_tokens(self.stats_footer() + self.truncation_notice())
+            measure = estimate_tokens
+        else:
+            budget = MAX_OUTPUT_BYTES - 500  # Leave room for footer
+            measure = lambda text: len(text.encode('utf-8'))
+        truncated = False
+        written = False
+        entries = self.iter_entries()
+        try:
+            for line in self.iter_tree_lines(self.keyed_by_file_path(entries), annotations=self.annotator):
+                if not written:
+                    line = self.root_path.name + "/\n" + line
+                    written = True
+                budget -= measure(line) + 1
+                if budget < 0:
+                    truncated = True
+                    break
+                out.write(line + "\n")
+        finally:
+            entries.close()
+        self.save_cache()
+        self.save_snapshot()
+
+        if not written:
+            out.write(self.empty_output() + "\n")
+            return None
+
+        # Footer starts with a blank line; the last tree line already ended
+        footer = self.stats_footer()[1:]
+        if truncated:
+            footer += self.truncation_notice()
+        header = self.stack_header()
+        if header is not None:
+            footer += "\n\n" + header
+        out.write(footer + "\n")
+        return None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser; the tree daemon parses requests with it too."""
     parser = argparse.ArgumentParser(
         description='Generate ASCII tree structure for directories'
     )
@@ -383,53 +1640,136 @@ def main():
     parser.add_argument('--include-hidden', action='store_true',
                        help='Include hidden files and directories')
     parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT,
-                       help=f'Execution timeout in seconds (default: {DEFAULT_TIMEOUT})')
-
-    args = parser.parse_args()
-
-    # Create generator
-    generator = TreeGenerator(
+                       help='Scan deadline in seconds; a partial tree is printed when it is '
+                            f'reached, even if a listing hangs (default: {DEFAULT_TIMEOUT})')
+    parser.add_argument('--git-index', action='store_true',
+                       help='Inside a git work tree, list tracked directories from .git/index')
+    parser.add_argument('--cache', action='store_true',
+                       help='Reuse directory listings whose mtime is unchanged since the last run')
+    parser.add_argument('--cache-dir', default=None,
+                       help=f'Listing cache directory, implies --cache (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--strategy', choices=SCAN_STRATEGIES, default='depth',
+                       help='depth: fill --max-files depth-first; breadth: spread it '
+                            'over levels and sibling directories (default: depth)')
+    parser.add_argument('--collapse', type=int, default=0, metavar='N',
+                       help='Summarise directories with more than N entries, or with at least '
+                            'N/2 files mostly of one extension, on a single line (default: 0, off)')
+    parser.add_argument('--stack', action='store_true',
+                       help='Parse package.json, requirements.txt, pyproject.toml, go.mod and '
+                            'Cargo.toml while scanning and print a [STACK] header')
+    parser.add_argument('--max-tokens', type=int, default=0, metavar='N',
+                       help='Prune the deepest, least important entries until the tree fits '
+                            f'about N model tokens, instead of cutting it at {MAX_OUTPUT_BYTES // 1024}KB '
+                            '(default: 0, byte cap)')
+    parser.add_argument('--focus', default=None, metavar='PROMPT',
+                       help='Rank the tree by relevance to PROMPT: scan matching directories '
+                            f'deeply, others to depth {SHALLOW_DEPTH}, and prune the least relevant '
+                            'entries first under --max-tokens')
+    parser.add_argument('--workspace', action='store_true',
+                       help='For pnpm/npm/yarn, Cargo, go.work, uv or multi-package Python '
+                            'workspaces, give every package its own share of --max-files')
+    parser.add_argument('--snapshot', default=None, metavar='FILE', dest='snapshot_path',
+                       help='Record the directory listings of this scan in FILE '
+                            '(front-coded, gzip-compressed)')
+    parser.add_argument('--diff-since', default=None, metavar='FILE',
+                       help='Print only the entries added, removed or renamed since the '
+                            'snapshot in FILE; prints the full tree if FILE is missing or was '
+                            'taken with other settings. Combine with --snapshot FILE to advance it')
+    parser.add_argument('--exclude-profile', action='append', default=[], metavar='NAME',
+                       choices=sorted(PROFILES), dest='exclude_profiles',
+                       help='Also exclude the generated files of a stack: '
+                            f'{", ".join(sorted(PROFILES))} (repeatable; added to those named in '
+                            f'{CONFIG_FILE} and detected from root manifests)')
+    parser.add_argument('--auto', action='store_true',
+                       help='Sample a few directories first and choose --max-depth, --max-files, '
+                            '--strategy, --collapse and --workers to fit --target-ms (given '
+                            'values are ignored); remembered per root with --cache')
+    parser.add_argument('--target-ms', type=int, default=AUTO_TARGET_MS, metavar='MS',
+                       help=f'Latency --auto aims for (default: {AUTO_TARGET_MS})')
+    parser.add_argument('--follow-symlinks', action='store_true',
+                       help='Scan symlinked directories and show symlinks as "name -> target"; '
+                            'a directory reached again (cycles, shared packages) is not rescanned')
+    parser.add_argument('--annotate', action='store_true',
+                       help='Show the size of every file, and the line count of small text '
+                            'files (cached by inode, mtime and size)')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='ascii', dest='output_format',
+                       help='ascii: tree drawing; json: one document of entries, stats and '
+                            'errors; ndjson: one record per line (default: ascii)')
+    parser.add_argument('--stream', action='store_true',
+                       help='Write tree lines while scanning instead of after the scan finishes')
+    parser.add_argument('--profile', action='store_true',
+                       help='Write a JSON profile to stderr: time per phase, slowest '
+                            'directories, syscall counts and hits per exclusion rule')
+    parser.add_argument('--profile-out', default=None, metavar='FILE',
+                       help='Write the --profile report to FILE instead of stderr (implies --profile)')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Threads listing directories concurrently, for slow or network '
+                            'filesystems (default: 1, sequential)')
+    return parser
+
+
+def create_generator(args: argparse.Namespace, cls: type = TreeGenerator) -> TreeGenerator:
+    """Create a TreeGenerator (or subclass `cls`) from parsed command-line arguments."""
+    return cls(
         args.path,
         max_depth=args.max_depth,
         max_files=args.max_files,
         include_hidden=args.include_hidden,
-        timeout=args.timeout
+        timeout=args.timeout,
+        cache_dir=args.cache_dir or (DEFAULT_CACHE_DIR if args.cache else None),
+        use_git_index=args.git_index,
+        workers=args.workers,
+        strategy=args.strategy,
+        collapse_threshold=args.collapse,
+        detect_stack=args.stack,
+        output_format=args.output_format,
+        max_tokens=args.max_tokens,
+        focus=args.focus,
+        workspace=args.workspace,
+        snapshot_path=args.snapshot_path,
+        diff_since=args.diff_since,
+        exclude_profiles=tuple(args.exclude_profiles),
+        annotate=args.annotate,
+        follow_symlinks=args.follow_symlinks,
+        auto=args.auto,
+        target_ms=args.target_ms
     )
 
-    # Set up timeout
-    timer = None
-    if platform.system() == 'Windows':
-        # Use threading.Timer on Windows (no signal.alarm)
-        timer = threading.Timer(args.timeout, handle_timeout, args=[generator])
-        timer.daemon = True
-        timer.start()
+
+def main():
+    """Main entry point."""
+    args = build_parser().parse_args()
+    profiling = args.profile or args.profile_out
+
+    # Create generator
+    if profiling:
+        from scan_profile import ProfilingTreeGenerator, write_profile
+        generator = create_generator(args, ProfilingTreeGenerator)
     else:
-        # Use signal.alarm on Unix
-        def timeout_handler(signum, frame):
-            generator.timed_out = True
-        signal.signal(signal.SIGALRM, timeout_handler)
-        signal.alarm(args.timeout)
+        generator = create_generator(args)
 
     try:
         # Generate tree
-        result = generator.generate()
+        if args.stream:
+            result = generator.stream(sys.stdout) or ''
+        else:
+            result = generator.generate()
 
-        # Cancel timer if using threading
-        if timer:
-            timer.cancel()
-        elif platform.system() != 'Windows':
-            signal.alarm(0)
+        # Output result (a stream has already written everything but errors)
+        if result or not args.stream:
+            print(result)
 
-        # Output result
-        print(result)
+        if profiling:
+            write_profile(generator.profile_report(), args.profile_out)
 
         # Exit with appropriate code
-        if result == EMPTY_FLAG:
-            sys.exit(0)
-        elif result.startswith('[ERROR'):
-            sys.exit(1)
-        else:
-            sys.exit(0)
+        code = 1 if generator.error else 0
+        if generator.listing_abandoned:
+            # A listing thread is stuck in the filesystem; exiting normally
+            # would wait for it
+            sys.stdout.flush()
+            os._exit(code)
+        sys.exit(code)
 
     except KeyboardInterrupt:
         print("\n[INTERRUPTED: Tree generation cancelled]", file=sys.stderr)
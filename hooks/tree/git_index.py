@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Git Index Reader for get_context_tree.py
+
+Reads the binary .git/index (versions 2, 3 and 4) to enumerate tracked paths
+without walking the working tree. Index entries are sorted by path, so the
+children of any directory form one contiguous run that can be located with
+a binary search; directories are therefore listed lazily and only when the
+scanner actually visits them.
+
+Format reference: Documentation/gitformat-index.txt in the git sources.
+"""
+
+import bisect
+import os
+import struct
+from typing import List, Optional, Set, Tuple
+
+INDEX_SIGNATURE = b'DIRC'
+SUPPORTED_VERSIONS = (2, 3, 4)
+
+# Entry layout: ctime(8) mtime(8) dev ino mode uid gid size(24) sha1(20) flags(2)
+ENTRY_FIXED_SIZE = 62
+MODE_TYPE_BYTE = 26
+FLAGS_OFFSET = 60
+
+FLAG_EXTENDED = 0x4000
+FLAG_NAME_MASK = 0x0FFF
+EXT_FLAG_SKIP_WORKTREE = 0x4000
+
+MODE_TYPE_GITLINK = 0xE  # 0o160000
+MODE_TYPE_SPARSE_DIR = 0x4  # 0o040000
+
+
+class GitIndexError(Exception):
+    """Raised when an index cannot be read or uses unsupported features."""
+    pass
+
+
+def find_work_tree(path: str) -> Optional[Tuple[str, str]]:
+    """
+    Locate the git work tree containing `path`.
+
+    Args:
+        path: Absolute directory inside a potential work tree
+
+    Returns:
+        Tuple of (work tree root, git dir), or None outside a repository
+    """
+    current = os.path.abspath(path)
+    while True:
+        dot_git = os.path.join(current, '.git')
+        if os.path.isdir(dot_git):
+            return current, dot_git
+        if os.path.isfile(dot_git):
+            # Linked worktrees and submodules use a "gitdir: <path>" file
+            try:
+                with open(dot_git, 'r', encoding='utf-8') as f:
+                    line = f.readline().strip()
+            except OSError:
+                return None
+            if line.startswith('gitdir:'):
+                git_dir = line[len('gitdir:'):].strip()
+                return current, os.path.normpath(os.path.join(current, git_dir))
+            return None
+
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def _uses_sha256(git_dir: str) -> bool:
+    """Check for extensions.objectFormat = sha256, which widens index entries."""
+    try:
+        with open(os.path.join(git_dir, 'config'), 'r', encoding='utf-8',
+                  errors='replace') as f:
+            config = f.read().lower()
+    except OSError:
+        return False
+    return 'objectformat' in config and 'sha256' in config
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Decode git's offset varint (used by index v4 path compression)."""
+    c = data[pos]
+    pos += 1
+    value = c & 0x7F
+    while c & 0x80:
+        c = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (c & 0x7F)
+    return value, pos
+
+
+def parse_index(data: bytes) -> Tuple[List[str], Set[str]]:
+    """
+    Parse an index file into its tracked paths.
+
+    Skip-worktree entries (sparse checkout) are dropped since they are not
+    present on disk; conflicted paths appear once.
+
+    Args:
+        data: Raw bytes of the index file
+
+    Returns:
+        Tuple of (sorted '/'-separated paths, gitlink paths for submodules)
+
+    Raises:
+        GitIndexError: On a malformed, unsupported or split index
+    """
+    if len(data) < 12 or data[:4] != INDEX_SIGNATURE:
+        raise GitIndexError("not a git index")
+
+    version, count = struct.unpack_from('>II', data, 4)
+    if version not in SUPPORTED_VERSIONS:
+        raise GitIndexError(f"unsupported index version {version}")
+
+    unpack_u16 = struct.Struct('>H').unpack_from
+    unpack_u32 = struct.Struct('>I').unpack_from
+    names = []
+    gitlink_positions = []
+    previous = b''
+    pos = 12
+
+    try:
+        for _ in range(count):
+            flags = unpack_u16(data, pos + FLAGS_OFFSET)[0]
+            # High nibble of the mode's third byte holds the object type
+            mode_type = data[pos + MODE_TYPE_BYTE] >> 4
+            name_pos = pos + ENTRY_FIXED_SIZE
+            skip = mode_type == MODE_TYPE_SPARSE_DIR
+
+            if flags & FLAG_EXTENDED:
+                if version < 3:
+                    raise GitIndexError("extended flags in a v2 index")
+                if unpack_u16(data, name_pos)[0] & EXT_FLAG_SKIP_WORKTREE:
+                    skip = True
+                name_pos += 2
+
+            if version == 4:
+                strip, name_pos = _read_varint(data, name_pos)
+                end = data.index(b'\0', name_pos)
+                name = previous[:len(previous) - strip] + data[name_pos:end]
+                previous = name
+                pos = end + 1
+            else:
+                length = flags & FLAG_NAME_MASK
+                if length == FLAG_NAME_MASK:
+                    end = data.index(b'\0', name_pos)
+                else:
+                    end = name_pos + length
+                name = data[name_pos:end]
+                # Entries are NUL-padded to a multiple of eight bytes
+                pos += (end - pos + 8) & ~7
+
+            if skip:
+                continue
+            if names and names[-1] == name:
+                continue  # Same path at several merge stages
+            if mode_type == MODE_TYPE_GITLINK:
+                gitlink_positions.append(len(names))
+            names.append(name)
+    except (struct.error, IndexError, ValueError) as e:
+        raise GitIndexError(f"truncated index: {e}")
+
+    # Decoding once for the whole index is much cheaper than per entry
+    paths = b'\0'.join(names).decode('utf-8', 'surrogateescape').split('\0') if names else []
+    gitlinks = {paths[i] for i in gitlink_positions}
+
+    # A split index keeps most entries in a shared file we do not read
+    while pos + 8 <= len(data) - 20:
+        signature = data[pos:pos + 4]
+        size = unpack_u32(data, pos + 4)[0]
+        if signature == b'link':
+            raise GitIndexError("split index is not supported")
+        pos += 8 + size
+
+    return paths, gitlinks
+
+
+class GitIndexLister:
+    """Lists directories of a work tree from its index instead of the disk."""
+
+    def __init__(self, paths: List[str], gitlinks: Set[str], prefix: str = ''):
+        """
+        Initialize lister.
+
+        Args:
+            paths: Sorted tracked paths from parse_index()
+            gitlinks: Paths that are submodules (listed as directories)
+            prefix: Scan root relative to the work tree, '' or ending in '/'
+        """
+        self.paths = paths
+        self.gitlinks = gitlinks
+        self.prefix = prefix
+
+    @classmethod
+    def for_root(cls, root_path: str) -> Optional['GitIndexLister']:
+        """
+        Build a lister for a scan root, or None if no usable index exists.
+
+        Args:
+            root_path: Absolute directory being scanned
+
+        Returns:
+            GitIndexLister, or None when not inside a work tree, the
+            repository uses SHA-256 object names, or the index cannot be read
+        """
+        found = find_work_tree(root_path)
+        if found is None:
+            return None
+        work_tree, git_dir = found
+
+        if _uses_sha256(git_dir):
+            return None
+
+        try:
+            with open(os.path.join(git_dir, 'index'), 'rb') as f:
+                data = f.read()
+            paths, gitlinks = parse_index(data)
+        except (OSError, GitIndexError):
+            return None
+
+        prefix = os.path.relpath(os.path.abspath(root_path), work_tree)
+        prefix = '' if prefix == '.' else prefix.replace(os.sep, '/') + '/'
+        return cls(paths, gitlinks, prefix)
+
+    def list_directory(self, rel_path: str) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        List the tracked children of a directory.
+
+        Jumps over each subdirectory's run of entries with a binary search,
+        so the cost is proportional to the number of children, not to the
+        number of tracked files below the directory.
+
+        Args:
+            rel_path: Directory relative to the scan root ('' for the root),
+                using '/' as separator
+
+        Returns:
+            Tuple of (directory names, file names) in index order, or None if
+            the directory holds no tracked paths (untracked or submodule)
+        """
+        base = self.prefix + rel_path + '/' if rel_path else self.prefix
+        paths = self.paths
+        pos = bisect.bisect_left(paths, base)
+        end = len(paths)
+
+        if pos == end or not paths[pos].startswith(base):
+            return None
+
+        base_len = len(base)
+        dirs = []
+        files = []
+
+        while pos < end:
+            path = paths[pos]
+            if not path.startswith(base):
+                break
+            slash = path.find('/', base_len)
+            if slash == -1:
+                name = path[base_len:]
+                if path in self.gitlinks:
+                    dirs.append(name)
+                else:
+                    files.append(name)
+                pos += 1
+            else:
+                dirs.append(path[base_len:slash])
+                # '0' sorts right after '/', so this skips the whole subtree
+                pos = bisect.bisect_left(paths, path[:slash] + '0', pos + 1)
+
+        return dirs, files
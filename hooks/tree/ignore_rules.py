@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Gitignore Engine for get_context_tree.py
+
+Implements git's ignore semantics for the tree scanner:
+- Nested .gitignore files, .git/info/exclude
+- Negation (!pattern), directory-only rules (pattern/), anchored rules
+- Wildmatch globs: *, ?, [...] character classes and ** in all positions
+
+Each directory's rule stack (its own .gitignore on top of everything it
+inherits) is compiled once into a matcher that child directories without
+their own .gitignore share. Within the matcher, all rules of one kind are
+joined into a single regular expression whose alternatives are ordered from
+highest to lowest precedence, so the first alternative that matches is git's
+"last matching rule wins" answer and the matched group names the rule.
+
+Every rule in a directory's stack comes from that directory or one of its
+ancestors, so for the directory's own entries the rule's base prefix always
+matches. Unanchored rules (no '/') therefore only need to test the entry's
+name, which keeps them free of "(.*/)?" backtracking over the full path.
+"""
+
+import copy
+import hashlib
+import os
+import re
+from typing import List, Optional, Tuple
+
+from git_index import find_work_tree
+
+
+class IgnoreRule:
+    """A single parsed ignore pattern."""
+
+    __slots__ = ('pattern', 'negated', 'dir_only', 'anchored', 'regex', 'source')
+
+    def __init__(self, pattern: str, negated: bool, dir_only: bool, anchored: bool,
+                 regex: str, source: str):
+        self.pattern = pattern
+        self.negated = negated
+        self.dir_only = dir_only
+        self.anchored = anchored
+        # Anchored rules match the root-relative path, others the entry name
+        self.regex = regex
+        self.source = source
+
+    def __repr__(self):
+        return f"IgnoreRule({self.source}: {'!' if self.negated else ''}{self.pattern})"
+
+
+def translate_glob(pattern: str) -> str:
+    """
+    Translate a wildmatch pattern (without anchoring slashes) into a regex.
+
+    Args:
+        pattern: Glob as written in an ignore file, leading '/' removed
+
+    Returns:
+        Regex source matching a '/'-separated path, without anchors
+    """
+    out = []
+    i = 0
+    n = len(pattern)
+
+    while i < n:
+        c = pattern[i]
+
+        if c == '*':
+            if pattern.startswith('**', i):
+                at_start = i == 0 or pattern[i - 1] == '/'
+                j = i + 2
+                at_end = j == n or pattern[j] == '/'
+                if at_start and at_end:
+                    if j == n:
+                        # Trailing "/**" or a bare "**": everything below,
+                        # but not the directory itself
+                        out.append('.+')
+                        i = j
+                    else:
+                        # "**/": zero or more leading directories
+                        out.append('(?:.*/)?')
+                        i = j + 1
+                    continue
+                # "**" glued to other characters behaves like "*"
+                while i < n and pattern[i] == '*':
+                    i += 1
+                out.append('[^/]*')
+                continue
+            out.append('[^/]*')
+            i += 1
+
+        elif c == '?':
+            out.append('[^/]')
+            i += 1
+
+        elif c == '[':
+            j = i + 1
+            if j < n and pattern[j] in '!^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                if pattern[j] == '\\':
+                    j += 1
+                j += 1
+            if j >= n:
+                # Unterminated class: the bracket is literal
+                out.append(re.escape(c))
+                i += 1
+                continue
+            body = pattern[i + 1:j]
+            negate = body[:1] in ('!', '^')
+            if negate:
+                body = body[1:]
+            out.append(('[^/' if negate else '[') + _translate_class(body) + ']')
+            i = j + 1
+
+        elif c == '\\' and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+
+        else:
+            out.append(re.escape(c))
+            i += 1
+
+    return ''.join(out)
+
+
+def _translate_class(body: str) -> str:
+    """Translate the inside of a [...] class, keeping ranges intact."""
+    out = []
+    i = 0
+    while i < len(body):
+        c = body[i]
+        if c == '\\' and i + 1 < len(body):
+            out.append(re.escape(body[i + 1]))
+            i += 2
+            continue
+        out.append('\\' + c if c in '[]\\^' else c)
+        i += 1
+    return ''.join(out)
+
+
+def _strip_trailing_spaces(line: str) -> str:
+    """Remove trailing spaces unless they are escaped with a backslash."""
+    stripped = line.rstrip(' ')
+    if stripped.endswith('\\') and len(stripped) < len(line):
+        stripped += ' '
+    return stripped
+
+
+def parse_rule(line: str, base: str, source: str) -> Optional[IgnoreRule]:
+    """
+    Parse one ignore-file line into a rule.
+
+    Args:
+        line: Raw line (without newline)
+        base: Root-relative directory of the ignore file, '' or ending in '/'
+        source: Human-readable origin, e.g. "src/.gitignore:3"
+
+    Returns:
+        IgnoreRule, or None for blank lines and comments
+    """
+    line = _strip_trailing_spaces(line.rstrip('\r\n'))
+    if not line or line.startswith('#'):
+        return None
+
+    negated = False
+    if line.startswith('!'):
+        negated = True
+        line = line[1:]
+    elif line.startswith('\\'):
+        # "\#" and "\!" escape a leading special character
+        if line[1:2] in ('#', '!'):
+            line = line[1:]
+
+    dir_only = line.endswith('/') and not line.endswith('\\/')
+    if dir_only:
+        line = line.rstrip('/')
+    if not line:
+        return None
+
+    # A slash at the start or in the middle anchors the pattern to `base`
+    anchored = '/' in line
+    if line.startswith('/'):
+        line = line.lstrip('/')
+
+    regex = translate_glob(line)
+    if anchored:
+        regex = re.escape(base) + regex
+    return IgnoreRule(line, negated, dir_only, anchored, regex, source)
+
+
+def parse_ignore_file(path: str, base: str, label: str) -> List[IgnoreRule]:
+    """
+    Read an ignore file into rules.
+
+    Args:
+        path: Filesystem path of the ignore file
+        base: Root-relative directory the rules apply to, '' or ending in '/'
+        label: Name used in rule sources, e.g. "src/.gitignore"
+
+    Returns:
+        List of rules in file order (empty if the file is unreadable)
+    """
+    rules = []
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for lineno, line in enumerate(f, 1):
+                rule = parse_rule(line, base, f"{label}:{lineno}")
+                if rule is not None:
+                    rules.append(rule)
+    except OSError:
+        pass
+    return rules
+
+
+class IgnoreMatcher:
+    """Compiled, inheritable rule stack for one directory."""
+
+    def __init__(self, rules: Tuple[IgnoreRule, ...] = (), signature: str = ''):
+        """
+        Initialize matcher.
+
+        Args:
+            rules: Rules in precedence order, lowest first
+            signature: Identity of the ignore files behind the rules, used to
+                validate cached listings
+        """
+        self.rules = tuple(rules)
+        self.signature = signature
+        # Highest precedence first: the first alternative to match wins.
+        # Directory-only rules take part in the directory matchers only.
+        ranked = list(enumerate(self.rules))[::-1]
+        self._dir = self._compile(ranked)
+        self._file = self._compile([(i, rule) for i, rule in ranked if not rule.dir_only])
+
+    @staticmethod
+    def _compile(ranked: List[Tuple[int, IgnoreRule]]) -> tuple:
+        """
+        Split (stack position, rule) pairs, highest precedence first, into
+        name-matched and path-matched groups of (regex, rules, positions).
+        """
+        compiled = []
+        for anchored in (False, True):
+            group = [(i, rule) for i, rule in ranked if rule.anchored == anchored]
+            regex = None
+            if group:
+                regex = re.compile('|'.join(f"({rule.regex})\\Z" for _, rule in group),
+                                   re.DOTALL)
+            compiled.append((regex, [rule for _, rule in group], [i for i, _ in group]))
+        return tuple(compiled)
+
+    def extend(self, rules: List[IgnoreRule], file_signature: str) -> 'IgnoreMatcher':
+        """
+        Return a child matcher with `rules` stacked on top of this one.
+
+        Args:
+            rules: Rules from the child directory's ignore file
+            file_signature: Identity (path, mtime, size) of that file
+
+        Returns:
+            New matcher, or self if the file contributed no rules
+        """
+        signature = hashlib.sha1(
+            (self.signature + '|' + file_signature).encode('utf-8')
+        ).hexdigest()[:16]
+        if not rules:
+            # Same rules: share the compiled regexes, only the identity changes
+            child = copy.copy(self)
+            child.signature = signature
+            return child
+        return IgnoreMatcher(self.rules + tuple(rules), signature)
+
+    def match(self, rel_path: str, is_dir: bool) -> Optional[IgnoreRule]:
+        """
+        Find the rule that decides an entry of this matcher's directory.
+
+        Args:
+            rel_path: Root-relative path using '/' separators
+            is_dir: Whether the path is a directory
+
+        Returns:
+            Deciding rule (possibly a negation), or None if no rule matches
+        """
+        by_name, by_path = self._dir if is_dir else self._file
+        best = None
+        best_rank = -1
+
+        regex, rules, ranks = by_name
+        if regex is not None:
+            m = regex.match(rel_path, rel_path.rfind('/') + 1)
+            if m is not None:
+                best = rules[m.lastindex - 1]
+                best_rank = ranks[m.lastindex - 1]
+
+        regex, rules, ranks = by_path
+        if regex is not None:
+            m = regex.match(rel_path)
+            if m is not None and ranks[m.lastindex - 1] > best_rank:
+                best = rules[m.lastindex - 1]
+
+        return best
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """Check whether git would ignore a path (its parents already passed)."""
+        rule = self.match(rel_path, is_dir)
+        return rule is not None and not rule.negated
+
+
+def ignore_file_signature(path: str) -> str:
+    """Describe an ignore file's identity for cache validation."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return f"{path}:missing"
+    return f"{path}:{st.st_mtime_ns}:{st.st_size}"
+
+
+def load_base_matcher(root_path: str) -> Tuple[IgnoreMatcher, str]:
+    """
+    Build the matcher that applies at the scan root.
+
+    Inside a git work tree this stacks .git/info/exclude and every .gitignore
+    between the work tree top and the scan root, exactly as git would see
+    them. Paths handed to the returned matcher must then be prefixed with
+    the scan root's position in the work tree.
+
+    Args:
+        root_path: Absolute scan root
+
+    Returns:
+        Tuple of (matcher, path prefix ('' or ending in '/'))
+    """
+    matcher = IgnoreMatcher()
+    found = find_work_tree(root_path)
+    if found is None:
+        return matcher, ''
+
+    work_tree, git_dir = found
+    exclude_path = os.path.join(git_dir, 'info', 'exclude')
+    matcher = matcher.extend(parse_ignore_file(exclude_path, '', '.git/info/exclude'),
+                             ignore_file_signature(exclude_path))
+
+    prefix = os.path.relpath(os.path.abspath(root_path), work_tree)
+    if prefix == '.':
+        return matcher, ''
+    prefix = prefix.replace(os.sep, '/') + '/'
+
+    # Ancestors' .gitignore files, outermost first; the root's own file is
+    # picked up by the scanner like any other directory's
+    base = ''
+    for part in prefix.rstrip('/').split('/'):
+        path = os.path.join(work_tree, base, '.gitignore')
+        if os.path.isfile(path):
+            matcher = matcher.extend(parse_ignore_file(path, base, base + '.gitignore'),
+                                     ignore_file_signature(path))
+        base += part + '/'
+
+    return matcher, prefix
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Project Tree Lookup for the Injection Hooks
+
+context-aware-tree-injection.py and complete-process-tree-injection.py
+obtain their tree the same way: ask a resident tree daemon
+(tree_daemon.py), and when none answers, scan in the hook's own process
+(tree_api.py). get_context_tree.py's deadline (--timeout) bounds only the
+directory listings; resolving the root, reading manifests and ignore files
+and stat calls can still hang on a stale NFS or FUSE mount. The scan
+therefore runs on a daemon thread, and the hook stops waiting for it after
+SCAN_TIMEOUT_SECONDS, the bound the hooks' get_context_tree.py subprocess
+had.
+
+Both hooks put hooks/tree on sys.path once and call
+
+    tree_output = project_tree(cwd, tree_args)
+
+Failures of either route are swallowed: a hook without a tree passes
+the prompt through unchanged.
+"""
+
+import os
+import threading
+from typing import List, Optional, Sequence
+
+# Longest wait for an in-process scan before the prompt is passed through
+SCAN_TIMEOUT_SECONDS = 15
+
+
+def query_tree_daemon(cwd: str, tree_args: Sequence[str]) -> Optional[str]:
+    """
+    Ask a resident tree daemon for the project tree.
+
+    Starts a daemon for the next prompt when none answers and
+    PSEUDO_CODE_TREE_DAEMON=1 is set.
+
+    Returns:
+        Tree output, or None to fall back to a direct scan
+    """
+    try:
+        import tree_daemon
+    except Exception:
+        return None
+
+    tree_output = tree_daemon.query_daemon(cwd, list(tree_args))
+    if tree_output is None and os.environ.get(tree_daemon.DAEMON_ENV) == '1':
+        tree_daemon.spawn_daemon(cwd)
+    return tree_output
+
+
+def generate_tree_in_process(cwd: str, tree_args: Sequence[str],
+                             timeout: float = SCAN_TIMEOUT_SECONDS) -> Optional[str]:
+    """
+    Scan the project in this process (no interpreter is started).
+
+    The scan runs on a daemon thread; one still running after `timeout`
+    seconds is abandoned and does not delay interpreter exit.
+
+    Returns:
+        Tree output, or None if the tree cannot be generated in time
+    """
+    results = []  # type: List[Optional[str]]
+
+    def scan() -> None:
+        try:
+            import tree_api
+            result = tree_api.generate_tree(cwd, list(tree_args))
+            results.append(result.output if result.ok else None)
+        except Exception:
+            results.append(None)
+
+    worker = threading.Thread(target=scan, name='tree-injection-scan', daemon=True)
+    worker.start()
+    worker.join(timeout)
+    return results[0] if results else None
+
+
+def project_tree(cwd: str, tree_args: Sequence[str]) -> Optional[str]:
+    """
+    Get the project tree from a resident daemon, or else by a direct scan.
+
+    Args:
+        cwd: Project directory
+        tree_args: get_context_tree.py arguments without the root
+
+    Returns:
+        Tree output, or None if neither route produced one
+    """
+    tree_output = query_tree_daemon(cwd, tree_args)
+    if tree_output is None:
+        tree_output = generate_tree_in_process(cwd, tree_args)
+    return tree_output
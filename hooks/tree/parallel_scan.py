@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Parallel Directory Listing for get_context_tree.py
+
+On network filesystems and cold page caches the scanner spends most of its
+time waiting for readdir() and stat() to return. ListingPrefetcher keeps a
+bounded thread pool busy listing the directories the depth-first scan is
+about to visit, while the scan itself still runs on the calling thread and
+consumes listings in exactly the sequential order. Output is therefore
+identical to a sequential scan; only the waiting overlaps.
+
+Prefetch order follows the scan: when a directory's listing is consumed, its
+subdirectories are the next ones the scan will enter, so they go to the
+front of the queue. At most `workers * PREFETCH_PER_WORKER` listings are in
+flight and `workers * LOOKAHEAD_PER_WORKER` finished listings wait to be
+consumed, which bounds the work wasted when max_files or the timeout cuts
+the scan short. Finished listings do not hold a worker slot, so siblings
+prefetched early on do not starve the subtree being scanned.
+
+Workers are daemon threads, like the ListingWatchdog's: a worker stuck in
+the filesystem past the deadline must not keep the interpreter alive,
+which a ThreadPoolExecutor worker would (it is joined at exit). This
+matters most to callers that generate trees in-process (tree_api.py).
+"""
+
+import collections
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+PREFETCH_PER_WORKER = 2
+LOOKAHEAD_PER_WORKER = 32
+
+
+class DaemonThreadPool:
+    """Minimal executor whose worker threads never delay interpreter exit."""
+
+    def __init__(self, workers: int):
+        self.tasks = queue.SimpleQueue()
+        self.threads = [threading.Thread(target=self._work, name=f'tree-listing-{i}', daemon=True)
+                        for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        future = Future()  # type: Future
+        self.tasks.put((future, fn, args))
+        return future
+
+    def _work(self) -> None:
+        """Worker loop: run queued calls until shutdown() sends None."""
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                return
+            future, fn, args = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the workers once the queue drains; a stuck worker is left behind unless waited for."""
+        for _ in self.threads:
+            self.tasks.put(None)
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+
+class ListingPrefetcher:
+    """Lists directories ahead of a depth-first scan on a thread pool."""
+
+    def __init__(self, list_fn: Callable[[Any], Any], workers: int):
+        """
+        Initialize prefetcher.
+
+        Args:
+            list_fn: Lists one directory; called from worker threads, so it
+                must be safe to run concurrently
+            workers: Number of worker threads
+        """
+        self.list_fn = list_fn
+        self.workers = workers
+        self.in_flight_limit = workers * PREFETCH_PER_WORKER
+        self.lookahead_limit = workers * LOOKAHEAD_PER_WORKER
+        self.pool = DaemonThreadPool(workers)
+        self.pending = collections.deque()
+        self.futures = {}  # type: Dict[str, Any]
+
+    def prefetch(self, paths: List[Any]) -> None:
+        """
+        Queue directories the scan will visit next, in visiting order.
+
+        Args:
+            paths: Directories in the order the scan will enter them
+        """
+        self.pending.extendleft(reversed(paths))
+        self._pump()
+
+    def get(self, path: Any) -> Any:
+        """
+        Return the listing of a directory, waiting for its prefetch if needed.
+
+        A directory that was never prefetched, or is still queued behind the
+        in-flight limit, is listed on the calling thread.
+
+        Args:
+            path: Directory to list
+
+        Returns:
+            Whatever list_fn returns for `path`
+        """
+        key = str(path)
+        future = self.futures.pop(key, None)
+        if future is None:
+            # Scan order matches queue order, so a directory still waiting
+            # for a slot is at the front
+            if self.pending and str(self.pending[0]) == key:
+                self.pending.popleft()
+            result = self.list_fn(path)
+        else:
+            result = future.result()
+        self._pump()
+        return result
+
+    def _pump(self) -> None:
+        """Submit queued directories until a limit is reached."""
+        if not self.pending:
+            return
+        in_flight = sum(1 for future in self.futures.values() if not future.done())
+        while (self.pending and in_flight < self.in_flight_limit
+               and len(self.futures) < self.lookahead_limit):
+            path = self.pending.popleft()
+            key = str(path)
+            if key not in self.futures:
+                self.futures[key] = self.pool.submit(self.list_fn, path)
+                in_flight += 1
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Drop queued work.
+
+        Args:
+            wait: Wait for listings already running to finish
+        """
+        self.pending.clear()
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+        self.pool.shutdown(wait=wait)
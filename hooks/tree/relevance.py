@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Prompt Relevance Scoring for get_context_tree.py
+
+Given the user's prompt ("add password reset to the auth routes"), names in
+the tree are scored against the prompt's keywords: each name is split into
+words (snake_case, kebab-case, camelCase, extensions), every word is
+reduced to a crude stem, and stems equal to a keyword stem, or sharing a
+prefix of at least PREFIX_MATCH letters with one, score. A few
+cross-cutting terms also pull in their usual neighbours (a prompt about
+passwords makes "auth", "user" and "models" relevant).
+
+A directory's score is its own plus its parent's, so everything below a
+relevant directory is relevant too. Manifests and entry points get a small
+bonus whatever the prompt says.
+
+The scanner uses the scores to descend fully only into relevant
+directories, and the token budget to prune irrelevant entries first.
+"""
+
+import re
+from typing import Dict, List, Set
+
+from token_budget import KEY_FILES
+
+# Irrelevant directories are listed to this depth only (1 lists the root)
+SHALLOW_DEPTH = 3
+# Shortest common prefix for a partial match ("auth" ~ "authentication")
+PREFIX_MATCH = 4
+# Prompt length considered; hooks may pass the whole prompt
+MAX_PROMPT_CHARS = 4000
+
+EXACT_SCORE = 1.0
+PARTIAL_SCORE = 0.5
+RELATED_SCORE = 0.3
+KEY_FILE_BONUS = 0.2
+
+_WORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+STOPWORDS = {
+    'a', 'about', 'add', 'all', 'also', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'build',
+    'but', 'by', 'can', 'change', 'code', 'could', 'create', 'do', 'does', 'each', 'file',
+    'files', 'fix', 'for', 'from', 'generate', 'get', 'has', 'have', 'how', 'i', 'if',
+    'implement', 'in', 'initialize', 'into', 'is', 'it', 'its', 'let', 'like', 'make', 'me',
+    'my', 'need', 'new', 'no', 'not', 'of', 'on', 'or', 'our', 'please', 'project', 'refactor',
+    'setup', 'should', 'so', 'some', 'support', 'that', 'the', 'their', 'them', 'then',
+    'there', 'these', 'this', 'to', 'update', 'use', 'using', 'want', 'we', 'when', 'which',
+    'will', 'with', 'would', 'you', 'your',
+}
+
+# Prompt word -> names usually involved with it
+RELATED = {
+    'password': ('auth', 'users', 'accounts', 'models', 'mail'),
+    'login': ('auth', 'session', 'users'),
+    'logout': ('auth', 'session'),
+    'auth': ('users', 'session', 'middleware', 'models'),
+    'signup': ('auth', 'users', 'accounts'),
+    'payment': ('billing', 'checkout', 'orders', 'models'),
+    'endpoint': ('routes', 'api', 'controllers', 'handlers'),
+    'api': ('routes', 'controllers', 'handlers', 'schemas'),
+    'database': ('models', 'schema', 'migrations', 'db'),
+    'test': ('spec', 'fixtures'),
+    'style': ('css', 'theme', 'components'),
+    'page': ('components', 'views', 'routes'),
+}
+
+_SUFFIXES = ('ations', 'ation', 'ments', 'ment', 'ings', 'ing', 'ers', 'er', 'ies', 'es', 'ed', 'e', 's')
+
+
+def stem(word: str) -> str:
+    """Strip a common English suffix, keeping at least three letters."""
+    word = word.lower()
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+_RELATED_STEMS = {stem(word): {stem(name) for name in names} for word, names in RELATED.items()}
+
+
+def split_words(text: str) -> List[str]:
+    """Split a name or sentence into words (snake_case, camelCase, punctuation)."""
+    return _WORD.findall(text)
+
+
+def prompt_keywords(prompt: str) -> Set[str]:
+    """Return the stems of the meaningful words of a prompt."""
+    keywords = set()
+    for word in split_words(prompt[:MAX_PROMPT_CHARS]):
+        word = word.lower()
+        if len(word) >= 2 and word not in STOPWORDS and not word.isdigit():
+            keywords.add(stem(word))
+    return keywords
+
+
+class RelevanceScorer:
+    """Scores file and directory names against the keywords of a prompt."""
+
+    def __init__(self, prompt: str):
+        self.keywords = prompt_keywords(prompt)
+        self.related = set()  # type: Set[str]
+        for keyword in self.keywords:
+            self.related.update(_RELATED_STEMS.get(keyword, ()))
+        self.related -= self.keywords
+        self._scores = {}  # type: Dict[str, float]
+
+    def __bool__(self) -> bool:
+        return bool(self.keywords)
+
+    def word_score(self, word: str) -> float:
+        """Score one stemmed word of a name."""
+        if word in self.keywords:
+            return EXACT_SCORE
+        if len(word) >= PREFIX_MATCH:
+            for keyword in self.keywords:
+                if len(keyword) >= PREFIX_MATCH and (word.startswith(keyword) or keyword.startswith(word)):
+                    return PARTIAL_SCORE
+        if word in self.related:
+            return RELATED_SCORE
+        return 0.0
+
+    def name_score(self, name: str) -> float:
+        """
+        Score a file or directory name (memoised; names repeat across directories).
+
+        Returns:
+            Best word score of the name, plus KEY_FILE_BONUS for manifests
+            and entry points
+        """
+        score = self._scores.get(name)
+        if score is None:
+            score = max((self.word_score(stem(word)) for word in split_words(name)), default=0.0)
+            if name in KEY_FILES:
+                score += KEY_FILE_BONUS
+            self._scores[name] = score
+        return score
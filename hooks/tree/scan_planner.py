@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Adaptive Scan Limits for get_context_tree.py
+
+Fixed limits (--max-depth 10 --max-files 1000) are too tight for a
+two-million-file monorepo on a network filesystem and needlessly loose
+for a twenty-file project. With --auto the generator first lists a few
+directories, at most SAMPLE_MAX_DIRS spread over the top levels, and
+extrapolates the size of the tree level by level:
+
+    dirs(level + 1) = dirs(level) * subdirectories per sampled directory
+    files(level)    = dirs(level) * files per sampled directory
+
+Below the deepest sampled level, the branching is assumed to shrink by
+EXTRAPOLATION_DECAY per level. Sampling listings run on a ListingWatchdog
+bounded by the sampling share of target_ms and the scan's deadline; a
+listing that outlasts it ends sampling, and if the root itself did, the
+generator keeps its given limits. The estimate is rough by design, but good
+enough to choose the limits:
+
+    workers         1, unless listings are slow (>= PARALLEL_LISTING_MS)
+                    and the serial scan could not list the estimated
+                    directories within target_ms
+    max_files       the estimated number of files, or as many as the
+                    affordable directories hold, within AUTO_MIN_FILES
+                    and AUTO_MAX_FILES
+    strategy        'breadth' when the budget covers less than half of
+                    the estimated files, 'depth' otherwise
+    max_depth       deep enough to hold DEPTH_FILE_FACTOR x max_files, or
+                    AUTO_MAX_DEPTH if the whole tree fits
+    collapse        max_files / 5 entries (the hooks' 1000 / 200 ratio),
+                    within AUTO_MIN_COLLAPSE and AUTO_MAX_COLLAPSE, but only
+                    when the estimated entries exceed max_files or, at
+                    ENTRY_TOKENS each, max_tokens; a tree that fits is
+                    shown without summaries
+
+The chosen limits end the ASCII footer ("Auto limits: ...") and JSON
+envelopes carry them as "plan". With a cache directory, the plan is
+remembered per root in <digest>.plan.json for PLAN_MAX_AGE_SECONDS,
+together with the measured duration of the run that used it; a run
+slower than PLAN_SLACK x target_ms samples again on the next run.
+"""
+
+import hashlib
+import json
+import math
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from deadline import DeadlineExceeded
+
+PLAN_VERSION = 2
+# Latency the chosen limits aim for, sampling included
+AUTO_TARGET_MS = 1000
+# Directories listed for the estimate, and at most per level
+SAMPLE_MAX_DIRS = 32
+SAMPLE_PER_LEVEL = 8
+# Share of target_ms that sampling may take
+SAMPLE_SHARE = 0.1
+# Branching kept per level below the deepest sampled one
+EXTRAPOLATION_DECAY = 0.5
+# Levels extrapolated at most
+MAX_ESTIMATE_DEPTH = 32
+# Listings at least this slow (network filesystems) are worth parallelising
+PARALLEL_LISTING_MS = 1.0
+AUTO_MAX_WORKERS = 8
+AUTO_MIN_FILES = 200
+AUTO_MAX_FILES = 5000
+AUTO_MIN_DEPTH = 3
+AUTO_MAX_DEPTH = 10
+# max_depth holds this many times max_files, so breadth-first can choose
+DEPTH_FILE_FACTOR = 4
+AUTO_MIN_COLLAPSE = 50
+AUTO_MAX_COLLAPSE = 500
+# Rough tokens per tree line, to compare an estimate with max_tokens
+ENTRY_TOKENS = 8
+# Remembered plans are sampled again after a day, or after a slow run
+PLAN_MAX_AGE_SECONDS = 24 * 3600
+PLAN_SLACK = 1.5
+
+
+class RepoEstimate:
+    """Extrapolated size of a tree, from a sample of its directory listings."""
+
+    def __init__(self, files: List[float], dirs: List[float], max_fanout: int,
+                 listing_ms: float, sampled: int):
+        """
+        Args:
+            files: Estimated files per level (level 0 is the root's own files)
+            dirs: Estimated directories per level (level 0 is the root)
+            max_fanout: Most entries seen in one sampled listing
+            listing_ms: Mean time per sampled listing
+            sampled: Number of directories listed
+        """
+        self.levels = files
+        self.level_dirs = dirs
+        self.files = int(round(sum(files)))
+        self.dirs = int(round(sum(dirs)))
+        self.depth = len(dirs)
+        self.max_fanout = max_fanout
+        self.listing_ms = listing_ms
+        self.sampled = sampled
+
+    def to_dict(self) -> Dict[str, object]:
+        return {'files': self.files, 'dirs': self.dirs, 'depth': self.depth,
+                'max_fanout': self.max_fanout, 'listing_ms': round(self.listing_ms, 3),
+                'sampled': self.sampled, 'levels': [round(n, 1) for n in self.levels],
+                'level_dirs': [round(n, 1) for n in self.level_dirs]}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RepoEstimate':
+        return cls(list(data['levels']), list(data['level_dirs']), int(data['max_fanout']),
+                   float(data['listing_ms']), int(data['sampled']))
+
+
+def sample_repo(root: Path, list_fn: Callable[[Path], Tuple[List[str], List[str]]],
+                max_dirs: int = SAMPLE_MAX_DIRS, seconds: float = 0.1) -> Optional[RepoEstimate]:
+    """
+    List a sample of directories breadth-first and extrapolate the tree's size.
+
+    Each level lists up to SAMPLE_PER_LEVEL of its directories, spread
+    evenly over the level, until max_dirs are listed, `seconds` have passed
+    or no level is left. A list_fn bounded by a deadline (ListingWatchdog)
+    may raise DeadlineExceeded; sampling then stops with what it has, and
+    the abandoned listing counts as one that took all the time it was given.
+
+    Args:
+        root: Directory to estimate
+        list_fn: Returns a directory's filtered (dirs, files)
+        max_dirs: Most directories to list
+        seconds: Time after which no further directory is listed
+
+    Returns:
+        RepoEstimate, or None if not even the root could be listed in time
+    """
+    deadline = time.monotonic() + seconds
+    files = []  # type: List[float]
+    dirs = [1.0]
+    frontier = [root]
+    sampled = 0
+    listing_time = 0.0
+    max_fanout = 0
+    branching = 0.0
+    per_dir_files = 0.0
+    abandoned = 0
+
+    while frontier and not abandoned:
+        count = min(len(frontier), SAMPLE_PER_LEVEL, max_dirs - sampled)
+        if count <= 0 or time.monotonic() >= deadline:
+            break
+        picks = [frontier[i * len(frontier) // count] for i in range(count)]
+        children = []  # type: List[Path]
+        level_files = 0
+        listed = 0
+        for dir_path in picks:
+            if time.monotonic() >= deadline and listed:
+                break
+            started = time.perf_counter()
+            try:
+                names, file_names = list_fn(dir_path)
+            except DeadlineExceeded:
+                listing_time += time.perf_counter() - started
+                abandoned = 1
+                break
+            listing_time += time.perf_counter() - started
+            listed += 1
+            children.extend(dir_path / name for name in names)
+            level_files += len(file_names)
+            max_fanout = max(max_fanout, len(names) + len(file_names))
+        sampled += listed
+        if not listed:
+            if not sampled:
+                return None
+            # Extrapolate from the last complete level
+            break
+        per_dir_files = level_files / listed
+        branching = len(children) / listed
+        files.append(dirs[-1] * per_dir_files)
+        frontier = children
+        if not frontier:
+            break
+        dirs.append(dirs[-1] * branching)
+
+    if frontier:
+        # Unsampled levels: the last sampled level's shape, thinning out
+        if len(files) < len(dirs):
+            files.append(dirs[-1] * per_dir_files)
+        while len(dirs) < MAX_ESTIMATE_DEPTH:
+            branching *= EXTRAPOLATION_DECAY
+            level = dirs[-1] * branching
+            if level < 1:
+                break
+            dirs.append(level)
+            files.append(level * per_dir_files)
+
+    return RepoEstimate(files, dirs, max_fanout, listing_time * 1000 / (sampled + abandoned), sampled)
+
+
+class ScanPlan:
+    """Scan limits chosen for one root."""
+
+    def __init__(self, max_depth: int, max_files: int, strategy: str, collapse_threshold: int,
+                 workers: int, estimate: RepoEstimate, target_ms: int, remembered: bool = False):
+        self.max_depth = max_depth
+        self.max_files = max_files
+        self.strategy = strategy
+        self.collapse_threshold = collapse_threshold
+        self.workers = workers
+        self.estimate = estimate
+        self.target_ms = target_ms
+        self.remembered = remembered
+
+    def limits(self) -> Dict[str, object]:
+        return {'max_depth': self.max_depth, 'max_files': self.max_files, 'strategy': self.strategy,
+                'collapse_threshold': self.collapse_threshold, 'workers': self.workers}
+
+    def summary(self) -> Dict[str, object]:
+        """Return the plan as JSON-ready data."""
+        summary = self.limits()
+        summary.update(target_ms=self.target_ms, remembered=self.remembered,
+                       estimate=self.estimate.to_dict())
+        return summary
+
+    def describe(self) -> str:
+        """Render the plan as the 'Auto limits' line of the footer."""
+        estimate = self.estimate
+        workers = f", {self.workers} workers" if self.workers > 1 else ""
+        collapse = f", collapse {self.collapse_threshold:,}" if self.collapse_threshold else ""
+        source = "remembered" if self.remembered else f"sampled {estimate.sampled} directories"
+        return (f"Auto limits: depth {self.max_depth}, {self.max_files:,} files, "
+                f"{self.strategy}-first{collapse}{workers} "
+                f"(~{estimate.files:,} files in ~{estimate.dirs:,} directories, "
+                f"{estimate.listing_ms:.2f} ms per listing, {source}; target {self.target_ms:,} ms)")
+
+
+def choose_plan(estimate: RepoEstimate, target_ms: int = AUTO_TARGET_MS, max_tokens: int = 0) -> ScanPlan:
+    """
+    Choose depth, file budget, strategy, collapse threshold and workers for an estimate.
+
+    Args:
+        estimate: Sampled size of the tree
+        target_ms: Latency to aim for
+        max_tokens: The output's token budget (0 for none)
+    """
+    listing_ms = max(estimate.listing_ms, 0.01)
+    serial_dirs = target_ms * (1 - SAMPLE_SHARE) / listing_ms
+    workers = 1
+    if estimate.dirs > serial_dirs and listing_ms >= PARALLEL_LISTING_MS:
+        workers = min(AUTO_MAX_WORKERS, max(2, math.ceil(estimate.dirs / serial_dirs)))
+
+    files_per_dir = estimate.files / max(estimate.dirs, 1)
+    affordable = serial_dirs * workers * files_per_dir
+    max_files = min(estimate.files, affordable)
+    # Round up to hundreds, so small estimate changes keep the limits stable
+    max_files = int(min(max(math.ceil(max_files / 100) * 100, AUTO_MIN_FILES), AUTO_MAX_FILES))
+
+    strategy = 'breadth' if estimate.files > 2 * max_files else 'depth'
+
+    max_depth = AUTO_MAX_DEPTH
+    if estimate.files > max_files:
+        total = 0.0
+        for level, files in enumerate(estimate.levels):
+            total += files
+            if total >= DEPTH_FILE_FACTOR * max_files:
+                max_depth = min(max(level + 1, AUTO_MIN_DEPTH), AUTO_MAX_DEPTH)
+                break
+
+    # max_files counts files only; the token estimate covers every line
+    collapse = 0
+    entries = estimate.files + estimate.dirs
+    if estimate.files > max_files or (max_tokens and entries * ENTRY_TOKENS > max_tokens):
+        collapse = min(max(max_files // 5, AUTO_MIN_COLLAPSE), AUTO_MAX_COLLAPSE)
+    return ScanPlan(max_depth, max_files, strategy, collapse, workers, estimate, target_ms)
+
+
+def plan_file(cache_dir: str, root: str) -> str:
+    digest = hashlib.sha1(root.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{digest}.plan.json")
+
+
+def load_plan(cache_dir: str, root: str, target_ms: int, settings: str) -> Optional[ScanPlan]:
+    """
+    Return the plan remembered for a root, unless it is stale.
+
+    A plan is stale when it is older than PLAN_MAX_AGE_SECONDS, was chosen
+    for another target or other scan settings, or when the run that used it
+    took longer than PLAN_SLACK x target_ms.
+    """
+    try:
+        with open(plan_file(cache_dir, root), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if (data.get('version') != PLAN_VERSION or data.get('root') != root
+                or data.get('target_ms') != target_ms or data.get('settings') != settings
+                or time.time() - data['created'] > PLAN_MAX_AGE_SECONDS
+                or data.get('run_ms', 0) > PLAN_SLACK * target_ms):
+            return None
+        limits = data['limits']
+        return ScanPlan(int(limits['max_depth']), int(limits['max_files']), str(limits['strategy']),
+                        int(limits['collapse_threshold']), int(limits['workers']),
+                        RepoEstimate.from_dict(data['estimate']), target_ms, remembered=True)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def save_plan(cache_dir: str, root: str, plan: ScanPlan, settings: str, run_ms: float) -> None:
+    """Remember a plan and the duration of the run that used it (best effort)."""
+    path = plan_file(cache_dir, root)
+    created = time.time()
+    if plan.remembered:
+        # Keep the original age, so a remembered plan still expires
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                created = float(json.load(f)['created'])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    data = {'version': PLAN_VERSION, 'root': root, 'target_ms': plan.target_ms,
+            'settings': settings, 'created': created, 'run_ms': round(run_ms, 1),
+            'limits': plan.limits(), 'estimate': plan.estimate.to_dict()}
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_file, path)
+    except OSError:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Scan Profiling for get_context_tree.py
+
+When a hook times out, the tree it gave up on says nothing about why. With
+--profile the generator is replaced by ProfilingTreeGenerator, which times
+each phase of the scan and writes a JSON report to stderr (or to the file
+given with --profile-out):
+
+    phases_ms            Exclusive wall time per phase: setup (prepare()
+                         minus ignore loading), ignore_loading (.gitignore
+                         stacks), listing (scandir, listing cache, git
+                         index), filtering (exclusion and ignore checks),
+                         sorting, scan (the traversal itself), annotation
+                         (--annotate stat() calls and line counting),
+                         formatting, truncation (token pruning or the byte
+                         cap) and other; listings run on worker threads (deadline
+                         watchdog, --workers) are summed, so with
+                         --workers the phases can add up to more than
+                         total_ms
+    slowest_directories  The directories that took longest to list,
+                         filtering and sorting included
+    syscalls             Calls to os.scandir, os.stat, os.lstat, os.listdir
+                         and open() made while generating
+    exclusion_hits       Entries excluded per rule: 'hidden', 'exclude:
+                         <rule>' for defaults, profiles and .pseudocodeignore,
+                         '<ignore file>: <pattern>' for .gitignore rules
+    stats                The scan's stats() and cache hits
+
+Hidden entries skipped while listing from disk are dropped before
+filtering and are not counted as hits. Phases are measured with
+time.perf_counter() around method calls, which adds overhead of its own
+to filtering; compare profiles with each other rather than with
+unprofiled runs. Formatting and annotation interleaved with the scan
+(--stream) count as scan time.
+"""
+
+import builtins
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from get_context_tree import TreeGenerator
+
+# Directories listed in the report
+SLOWEST_DIRECTORIES = 10
+PHASES = ('setup', 'ignore_loading', 'listing', 'filtering', 'sorting', 'scan',
+          'annotation', 'formatting', 'truncation')
+
+
+class ScanProfiler:
+    """Accumulates exclusive phase times, syscall counts and exclusion hits."""
+
+    def __init__(self):
+        self.phases = dict.fromkeys(PHASES, 0.0)  # type: Dict[str, float]
+        self.directories = []  # type: List[Tuple[float, str, int]]
+        self.syscalls = {}  # type: Dict[str, int]
+        self.hits = {}  # type: Dict[str, int]
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._originals = []  # type: List[Tuple[object, str, object]]
+
+    def start(self, phase: Optional[str]) -> None:
+        """
+        Enter a phase; time spent in phases entered from it is not its own.
+
+        Time in a None phase is not recorded at all: it covers waiting for
+        work whose phases are recorded on another thread.
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append([phase, time.perf_counter(), 0.0])
+
+    def stop(self) -> float:
+        """
+        Leave the innermost phase.
+
+        Returns:
+            Its inclusive wall time in seconds
+        """
+        stack = self._local.stack
+        phase, started, nested = stack.pop()
+        elapsed = time.perf_counter() - started
+        if stack:
+            stack[-1][2] += elapsed
+        if phase is not None:
+            with self._lock:
+                self.phases[phase] += elapsed - nested
+        return elapsed
+
+    @contextmanager
+    def phase(self, name: Optional[str]):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    def directory(self, seconds: float, rel_path: str, entries: int) -> None:
+        with self._lock:
+            self.directories.append((seconds, rel_path, entries))
+
+    def hit(self, rule: str) -> None:
+        with self._lock:
+            self.hits[rule] = self.hits.get(rule, 0) + 1
+
+    def install_counters(self) -> None:
+        """Count calls to the filesystem functions the scan uses."""
+        def counted(name, fn):
+            def wrapper(*args, **kwargs):
+                with self._lock:
+                    self.syscalls[name] = self.syscalls.get(name, 0) + 1
+                return fn(*args, **kwargs)
+            return wrapper
+
+        for owner, name in ((os, 'scandir'), (os, 'stat'), (os, 'lstat'),
+                            (os, 'listdir'), (builtins, 'open')):
+            original = getattr(owner, name)
+            self._originals.append((owner, name, original))
+            self.syscalls[name] = 0
+            setattr(owner, name, counted(name, original))
+
+    def remove_counters(self) -> None:
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+
+    def report(self, total: float) -> Dict[str, object]:
+        """Summarise the profile of a run that took `total` seconds."""
+        phases = {name: round(seconds * 1000, 3) for name, seconds in self.phases.items()}
+        phases['other'] = round(max(total - sum(self.phases.values()), 0.0) * 1000, 3)
+        slowest = heapq.nlargest(SLOWEST_DIRECTORIES, self.directories)
+        return {
+            'total_ms': round(total * 1000, 3),
+            'phases_ms': phases,
+            'slowest_directories': [
+                {'path': rel_path or '.', 'ms': round(seconds * 1000, 3), 'entries': entries}
+                for seconds, rel_path, entries in slowest
+            ],
+            'directories_listed': len(self.directories),
+            'syscalls': dict(self.syscalls),
+            'exclusion_hits': dict(sorted(self.hits.items(), key=lambda item: (-item[1], item[0]))),
+        }
+
+
+class ProfilingTreeGenerator(TreeGenerator):
+    """TreeGenerator that records a ScanProfiler profile of its runs."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.profiler = ScanProfiler()
+        self.elapsed = 0.0
+
+    def run(self, method, *args):
+        """Call generate() or stream() with syscall counters installed, timing the whole run."""
+        self.profiler.install_counters()
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self.profiler.remove_counters()
+
+    def generate(self) -> str:
+        return self.run(super().generate)
+
+    def stream(self, out) -> Optional[str]:
+        return self.run(super().stream, out)
+
+    def prepare(self) -> Optional[str]:
+        with self.profiler.phase('setup'):
+            return super().prepare()
+
+    def load_base_ignore(self) -> None:
+        with self.profiler.phase('ignore_loading'):
+            super().load_base_ignore()
+
+    def load_ignore_matcher(self, rel_path, has_ignore_file):
+        with self.profiler.phase('ignore_loading'):
+            return super().load_ignore_matcher(rel_path, has_ignore_file)
+
+    def fetch_entries(self, dir_path):
+        # With a deadline or --workers the listing runs on another thread,
+        # which records its phases; the wait for it is nobody's time
+        with self.profiler.phase(None):
+            return super().fetch_entries(dir_path)
+
+    def list_entries(self, dir_path):
+        self.profiler.start('listing')
+        try:
+            dirs, files = super().list_entries(dir_path)
+        finally:
+            elapsed = self.profiler.stop()
+        self.profiler.directory(elapsed, self.relative_path(dir_path).replace(os.sep, '/'),
+                                len(dirs) + len(files))
+        return dirs, files
+
+    def should_exclude(self, rel_path, name, is_dir, matcher=None) -> bool:
+        self.profiler.start('filtering')
+        try:
+            excluded = super().should_exclude(rel_path, name, is_dir, matcher)
+        finally:
+            self.profiler.stop()
+        if excluded:
+            self.profiler.hit(self.excluded_by(str(rel_path), name, is_dir, matcher))
+        return excluded
+
+    def excluded_by(self, rel_path: str, name: str, is_dir: bool, matcher) -> str:
+        """Name the rule that made should_exclude() reject an entry."""
+        if not self.include_hidden and name.startswith('.') and name != '.':
+            return 'hidden'
+        rule = self.exclusions.match(name, is_dir)
+        if rule is not None:
+            return 'exclude: ' + rule
+        ignore_rule = matcher.match(self.ignore_prefix + rel_path, is_dir) if matcher is not None else None
+        if ignore_rule is None:
+            return 'unknown'
+        pattern = ('!' if ignore_rule.negated else '') + ignore_rule.pattern
+        return f"{ignore_rule.source}: {pattern}{'/' if ignore_rule.dir_only else ''}"
+
+    def sort_listing(self, rel_path, dirs, files) -> None:
+        with self.profiler.phase('sorting'):
+            super().sort_listing(rel_path, dirs, files)
+
+    def scan_store(self):
+        with self.profiler.phase('scan'):
+            return super().scan_store()
+
+    def annotate_store(self, store) -> None:
+        with self.profiler.phase('annotation'):
+            super().annotate_store(store)
+
+    def format_store(self, store) -> str:
+        with self.profiler.phase('formatting'):
+            return super().format_store(store)
+
+    def fit_tokens(self, store, header):
+        with self.profiler.phase('truncation'):
+            return super().fit_tokens(store, header)
+
+    def truncate_output(self, tree_string: str) -> str:
+        with self.profiler.phase('truncation'):
+            return super().truncate_output(tree_string)
+
+    def member_generator(self, *args, **kwargs):
+        # Workspace packages add to this generator's profile
+        generator = super().member_generator(*args, **kwargs)
+        generator.profiler = self.profiler
+        return generator
+
+    def profile_report(self) -> Dict[str, object]:
+        """Return the profile of the runs so far, with the scan's stats."""
+        report = {'root': str(self.root_path)}
+        report.update(self.profiler.report(self.elapsed))
+        stats = self.stats()
+        stats['cache_hits'] = self.cache.hits if self.cache is not None else None
+        report['stats'] = stats
+        return report
+
+
+def write_profile(report: Dict[str, object], path: Optional[str] = None) -> None:
+    """Write a profile report as JSON to `path`, or to stderr."""
+    text = json.dumps(report, indent=2)
+    if not path:
+        print(text, file=sys.stderr)
+        return
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    except OSError as e:
+        print(f"[ERROR: cannot write profile: {e}]", file=sys.stderr)
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Technology Stack Detection for get_context_tree.py
+
+While the tree is scanned, every well-known manifest found in a listing
+(package.json, requirements.txt, pyproject.toml, go.mod, Cargo.toml) is
+parsed once for its dependency names. Those are mapped to languages,
+frameworks and test runners, giving a one-line stack header instead of
+asking the model to guess the stack from file names.
+
+Parsing is deliberately shallow and stdlib-only: package.json is JSON, and
+the TOML, go.mod and requirements formats are read line by line for table
+names, keys and quoted dependency strings, which is all the detection needs.
+
+Parse results are cached next to the listing cache, keyed by each
+manifest's mtime and size, so an unchanged manifest costs one stat().
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Callable, Dict, List, Optional
+
+STACK_CACHE_VERSION = 1
+# Manifests beyond this many are not parsed (large monorepos)
+MAX_MANIFESTS = 50
+
+# Manifest file name -> ecosystem
+MANIFESTS = {
+    'package.json': 'node',
+    'requirements.txt': 'python',
+    'pyproject.toml': 'python',
+    'go.mod': 'go',
+    'Cargo.toml': 'rust',
+}
+
+LANGUAGES = {
+    'node': 'JavaScript',
+    'python': 'Python',
+    'go': 'Go',
+    'rust': 'Rust',
+}
+
+# Dependency name (normalised) -> framework, per ecosystem
+FRAMEWORKS = {
+    'node': {
+        'next': 'Next.js', 'react': 'React', 'react-native': 'React Native',
+        'vue': 'Vue', 'nuxt': 'Nuxt', '@angular/core': 'Angular', 'svelte': 'Svelte',
+        '@sveltejs/kit': 'SvelteKit', 'express': 'Express', 'fastify': 'Fastify',
+        '@nestjs/core': 'NestJS', 'electron': 'Electron', 'astro': 'Astro',
+    },
+    'python': {
+        'django': 'Django', 'flask': 'Flask', 'fastapi': 'FastAPI', 'starlette': 'Starlette',
+        'tornado': 'Tornado', 'aiohttp': 'aiohttp', 'streamlit': 'Streamlit',
+        'sqlalchemy': 'SQLAlchemy', 'celery': 'Celery',
+    },
+    'go': {
+        'github.com/gin-gonic/gin': 'Gin', 'github.com/labstack/echo/v4': 'Echo',
+        'github.com/labstack/echo': 'Echo', 'github.com/gofiber/fiber/v2': 'Fiber',
+        'github.com/go-chi/chi/v5': 'chi', 'github.com/gorilla/mux': 'gorilla/mux',
+    },
+    'rust': {
+        'actix-web': 'Actix Web', 'axum': 'Axum', 'rocket': 'Rocket', 'warp': 'warp',
+        'tokio': 'Tokio', 'tauri': 'Tauri', 'bevy': 'Bevy',
+    },
+}
+
+# Dependency name (normalised) -> test runner, per ecosystem
+TEST_RUNNERS = {
+    'node': {
+        'jest': 'Jest', 'vitest': 'Vitest', 'mocha': 'Mocha', 'ava': 'AVA',
+        '@playwright/test': 'Playwright', 'cypress': 'Cypress',
+    },
+    'python': {
+        'pytest': 'pytest', 'nose2': 'nose2', 'tox': 'tox', 'hypothesis': 'Hypothesis',
+    },
+    'go': {},
+    'rust': {},
+}
+
+# Test runners every project of an ecosystem has
+BUILTIN_TEST_RUNNERS = {
+    'go': 'go test',
+    'rust': 'cargo test',
+}
+
+_TABLE = re.compile(r'^\s*\[\[?\s*([^\]]+?)\s*\]\]?')
+_KEY = re.compile(r'^\s*([A-Za-z0-9_.\-"\']+)\s*=')
+_QUOTED = re.compile(r'["\']([^"\']+)["\']')
+_REQUIREMENT = re.compile(r'^\s*([A-Za-z0-9][A-Za-z0-9._\-]*)')
+
+
+def normalize(ecosystem: str, name: str) -> str:
+    """Normalise a dependency name the way its ecosystem compares names."""
+    name = name.strip().strip('"\'').lower()
+    if ecosystem == 'python':
+        return re.sub(r'[-_.]+', '-', name)
+    return name
+
+
+def requirement_name(spec: str) -> Optional[str]:
+    """Return the distribution name of a PEP 508 requirement string."""
+    match = _REQUIREMENT.match(spec)
+    return match.group(1) if match else None
+
+
+def parse_package_json(text: str) -> List[str]:
+    data = json.loads(text)
+    names = []
+    if isinstance(data, dict):
+        for field in ('dependencies', 'devDependencies', 'peerDependencies', 'optionalDependencies'):
+            deps = data.get(field)
+            if isinstance(deps, dict):
+                names.extend(deps)
+    return names
+
+
+def parse_requirements(text: str) -> List[str]:
+    names = []
+    for line in text.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if not line or line.startswith('-'):
+            continue
+        name = requirement_name(line)
+        if name:
+            names.append(name)
+    return names
+
+
+def parse_pyproject(text: str) -> List[str]:
+    """
+    Collect dependency names from PEP 621 and Poetry tables.
+
+    Handles `dependencies = [...]` arrays (also spread over several lines),
+    optional-dependency groups and Poetry's key-per-dependency tables.
+    [tool.pytest.*] configuration counts as a pytest dependency.
+    """
+    names = []
+    table = ''
+    in_array = False
+    for line in text.splitlines():
+        line = line.split('#', 1)[0]
+        if in_array:
+            names.extend(filter(None, (requirement_name(s) for s in _QUOTED.findall(line))))
+            if ']' in line:
+                in_array = False
+            continue
+
+        match = _TABLE.match(line)
+        if match:
+            table = match.group(1)
+            if table.startswith('tool.pytest'):
+                names.append('pytest')
+            continue
+
+        match = _KEY.match(line)
+        if not match:
+            continue
+        key = match.group(1).strip('"\'')
+        value = line.split('=', 1)[1]
+
+        if ((table == 'project' and key == 'dependencies')
+                or table == 'project.optional-dependencies'
+                or (table == 'build-system' and key == 'requires')
+                or table == 'dependency-groups'):
+            if '[' in value:
+                names.extend(filter(None, (requirement_name(s) for s in _QUOTED.findall(value))))
+                in_array = ']' not in value
+        elif table.startswith('tool.poetry') and table.endswith('dependencies'):
+            if key != 'python':
+                names.append(key)
+    return names
+
+
+def parse_go_mod(text: str) -> List[str]:
+    names = []
+    in_block = False
+    for line in text.splitlines():
+        line = line.split('//', 1)[0].strip()
+        if in_block:
+            if line.startswith(')'):
+                in_block = False
+            elif line:
+                names.append(line.split()[0])
+        elif line.startswith('require'):
+            rest = line[len('require'):].strip()
+            if rest.startswith('('):
+                in_block = True
+            elif rest:
+                names.append(rest.split()[0])
+    return names
+
+
+def parse_cargo_toml(text: str) -> List[str]:
+    names = []
+    table = ''
+    for line in text.splitlines():
+        line = line.split('#', 1)[0]
+        match = _TABLE.match(line)
+        if match:
+            table = match.group(1)
+            # [dependencies.serde] style tables name the dependency themselves
+            for prefix in ('dependencies.', 'dev-dependencies.', 'workspace.dependencies.'):
+                if table.startswith(prefix):
+                    names.append(table[len(prefix):])
+            continue
+        if table in ('dependencies', 'dev-dependencies', 'build-dependencies',
+                     'workspace.dependencies') or table.endswith('.dependencies'):
+            match = _KEY.match(line)
+            if match:
+                names.append(match.group(1).strip('"\''))
+    return names
+
+
+PARSERS = {
+    'package.json': parse_package_json,
+    'requirements.txt': parse_requirements,
+    'pyproject.toml': parse_pyproject,
+    'go.mod': parse_go_mod,
+    'Cargo.toml': parse_cargo_toml,
+}
+
+
+def parse_manifest(path: str, name: str) -> Dict[str, List[str]]:
+    """
+    Parse one manifest into the stack facts it implies.
+
+    Args:
+        path: Manifest file path
+        name: Manifest file name, a key of MANIFESTS
+
+    Returns:
+        Dict with 'languages', 'frameworks' and 'tests' lists (empty if the
+        file cannot be read or parsed)
+    """
+    ecosystem = MANIFESTS[name]
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            deps = {normalize(ecosystem, dep) for dep in PARSERS[name](f.read())}
+    except (OSError, ValueError):
+        return {'languages': [], 'frameworks': [], 'tests': []}
+
+    language = LANGUAGES[ecosystem]
+    if ecosystem == 'node' and 'typescript' in deps:
+        language = 'TypeScript'
+
+    frameworks = [label for dep, label in FRAMEWORKS[ecosystem].items() if dep in deps]
+    tests = [label for dep, label in TEST_RUNNERS[ecosystem].items() if dep in deps]
+    if ecosystem in BUILTIN_TEST_RUNNERS:
+        tests.append(BUILTIN_TEST_RUNNERS[ecosystem])
+    return {'languages': [language], 'frameworks': frameworks, 'tests': tests}
+
+
+class ManifestCache:
+    """Parse results of files under one root, keyed by each file's mtime and size."""
+
+    def __init__(self, root_path: str, cache_dir: Optional[str], kind: str):
+        """
+        Initialize cache.
+
+        Args:
+            root_path: Absolute project root
+            cache_dir: Directory for the cache file (None keeps nothing on disk)
+            kind: Cache file suffix, e.g. 'stack' for <digest>.stack.json
+        """
+        self.root_path = str(root_path)
+        self.cache_file = None  # type: Optional[str]
+        if cache_dir:
+            digest = hashlib.sha1(self.root_path.encode('utf-8')).hexdigest()[:16]
+            self.cache_file = os.path.join(cache_dir, f"{digest}.{kind}.json")
+        self.cached = {}  # type: Dict[str, list]
+        self.fresh = {}  # type: Dict[str, list]
+        self.parsed = 0
+
+    def load(self) -> None:
+        """Load cached parse results."""
+        if self.cache_file is None:
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == STACK_CACHE_VERSION and data.get('root') == self.root_path:
+            self.cached = data.get('manifests', {})
+
+    def get(self, rel_path: str, parse: Callable[[str], object]):
+        """
+        Return the parse result of a file, parsing it only if it changed.
+
+        Args:
+            rel_path: File relative to the root, '/'-separated
+            parse: Called with the absolute path on a cache miss
+
+        Returns:
+            The parse result, or None if the file cannot be stat()ed
+        """
+        path = os.path.join(self.root_path, rel_path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+
+        cached = self.cached.get(rel_path)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            result = cached[2]
+        else:
+            result = parse(path)
+            self.parsed += 1
+        self.fresh[rel_path] = [st.st_mtime_ns, st.st_size, result]
+        return result
+
+    def save(self) -> None:
+        """Write parse results back if any file was (re)parsed or disappeared."""
+        if self.cache_file is None or (not self.parsed and self.fresh.keys() == self.cached.keys()):
+            return
+        data = {'version': STACK_CACHE_VERSION, 'root': self.root_path, 'manifests': self.fresh}
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+
+
+class StackDetector:
+    """Collects manifests seen during a scan and summarises the stack."""
+
+    def __init__(self, root_path: str, cache_dir: Optional[str] = None):
+        """
+        Initialize detector.
+
+        Args:
+            root_path: Absolute project root
+            cache_dir: Directory for the parse cache (None disables it)
+        """
+        self.root_path = str(root_path)
+        self.manifests = []  # type: List[str]
+        self.facts = []  # type: List[Dict[str, List[str]]]
+        self.cache = ManifestCache(self.root_path, cache_dir, 'stack')
+
+    @property
+    def parsed(self) -> int:
+        """Number of manifests parsed (not taken from the cache) so far."""
+        return self.cache.parsed
+
+    def load(self) -> None:
+        """Load cached parse results."""
+        self.cache.load()
+
+    def observe(self, rel_dir: str, files: List[str]) -> None:
+        """
+        Parse the manifests among a directory's files.
+
+        Args:
+            rel_dir: Directory relative to the root, '/'-separated ('' for the root)
+            files: File names of the directory's listing
+        """
+        for name in files:
+            if name not in MANIFESTS or len(self.manifests) >= MAX_MANIFESTS:
+                continue
+            rel_path = rel_dir + '/' + name if rel_dir else name
+            if rel_path in self.cache.fresh:
+                continue
+            facts = self.cache.get(rel_path, lambda path: parse_manifest(path, name))
+            if facts is None:
+                continue
+            self.manifests.append(rel_path)
+            self.facts.append(facts)
+
+    def save(self) -> None:
+        """Write parse results back if any manifest was (re)parsed or disappeared."""
+        self.cache.save()
+
+    def summary(self) -> Optional[Dict[str, List[str]]]:
+        """
+        Merge the facts of every manifest, in scan order without duplicates.
+
+        Returns:
+            Dict with 'languages', 'frameworks', 'tests' and 'manifests', or
+            None if no manifest was found
+        """
+        if not self.manifests:
+            return None
+        merged = {'languages': [], 'frameworks': [], 'tests': []}  # type: Dict[str, List[str]]
+        for facts in self.facts:
+            for key, values in merged.items():
+                for value in facts.get(key, []):
+                    if value not in values:
+                        values.append(value)
+        # TypeScript projects are JavaScript projects too; name only the former
+        if 'TypeScript' in merged['languages'] and 'JavaScript' in merged['languages']:
+            merged['languages'].remove('JavaScript')
+        merged['manifests'] = list(self.manifests)
+        return merged
+
+    def header(self) -> Optional[str]:
+        """
+        Format the stack as one line, e.g.
+        "[STACK] languages: Python | frameworks: FastAPI | tests: pytest | manifests: pyproject.toml"
+        """
+        summary = self.summary()
+        if summary is None:
+            return None
+        parts = [f"{key}: {', '.join(summary[key])}"
+                 for key in ('languages', 'frameworks', 'tests', 'manifests') if summary[key]]
+        return "[STACK] " + " | ".join(parts)
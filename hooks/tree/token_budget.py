@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Token Budget for get_context_tree.py
+
+The byte cap of the ASCII output cuts the tree mid-branch and measures the
+wrong thing: the injected tree is paid for in model tokens, and branch
+prefixes such as "|   " cost tokens out of proportion to their bytes.
+
+With a token budget the scanned TreeStore is pruned before formatting:
+entries are removed deepest level first and, within a level, plain files
+before directories before key files (manifests, READMEs, entry points),
+taking the last children of the fullest directories first. So the tree
+loses detail evenly, from the bottom up, and never ends mid-line. Given
+relevance scores (see relevance.py), entries on less relevant paths go
+first, whatever their depth.
+
+Tokens are estimated offline with a regex that splits text roughly the
+way BPE tokenizers do (short letter runs, digit triples, whitespace runs,
+single punctuation marks). It errs on the high side for ASCII art.
+"""
+
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from file_annotations import format_annotation
+from tree_store import TreeStore
+
+# Letter runs, digit groups, whitespace runs and single other characters
+_TOKEN = re.compile(r"[A-Za-z]{1,6}|[0-9]{1,3}|\s+|[^\sA-Za-z0-9]")
+
+# Files kept longest at their level
+KEY_FILES = {
+    'package.json', 'requirements.txt', 'pyproject.toml', 'setup.py', 'go.mod',
+    'Cargo.toml', 'pom.xml', 'build.gradle', 'Makefile', 'Dockerfile',
+    'README.md', 'main.py', 'app.py', '__init__.py', 'index.js', 'index.ts',
+    'main.go', 'main.rs', 'lib.rs',
+}
+
+# Removal order within a level: plain files, then directories, then key files
+_FILE, _DIR, _KEY_FILE = 0, 1, 2
+
+# Most top-level directories named in the elision footer
+MAX_ELISION_NAMES = 10
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of model tokens in `text`."""
+    return len(_TOKEN.findall(text))
+
+
+# Per-level cost of the continuation prefix and of the branch, whichever
+# variant ("|   " or "    ", "|-- " or "+-- ") pruning leaves in place
+PREFIX_TOKENS = max(estimate_tokens("|   "), estimate_tokens("    "))
+BRANCH_TOKENS = max(estimate_tokens("|-- "), estimate_tokens("+-- "))
+
+
+def entry_tokens(depth: int, label: str) -> int:
+    """Upper estimate of the tokens of one tree line, newline included."""
+    return PREFIX_TOKENS * depth + BRANCH_TOKENS + estimate_tokens(label) + 1
+
+
+def entry_label(store: TreeStore, index: int) -> str:
+    """Return the text of an entry's line after its branch."""
+    name = store.name(index)
+    target = store.links.get(index)
+    if not store.is_dir(index):
+        label = f"{name} -> {target}" if target is not None else name
+        annotation = store.annotations.get(index)
+        return f"{label} ({format_annotation(annotation)})" if annotation else label
+    label = f"{name}/ -> {target}" if target is not None else name + "/"
+    summary = store.summaries.get(index)
+    return f"{label} ({summary})" if summary else label
+
+
+def fit_store(store: TreeStore, budget: int, overhead: int,
+              footer_for: Callable[[Dict[str, int]], str],
+              score: Optional[Callable[[str], float]] = None) -> Tuple[TreeStore, Dict[str, int]]:
+    """
+    Prune a scanned tree until its ASCII rendering fits a token budget.
+
+    Args:
+        store: Scanned entries
+        budget: Token budget of the whole output
+        overhead: Tokens of the root line, header and stats footer
+        footer_for: Renders the elision footer for a {top-level name: count} dict
+        score: Relevance of a name; an entry's relevance is the sum over
+            its path, and less relevant entries are pruned first (a
+            directory counts as relevant as its most relevant descendant,
+            so it never goes before its children)
+
+    Returns:
+        The store to format (the input itself if nothing was pruned) and the
+        number of elided entries per top-level directory ('' for files
+        directly under the root)
+    """
+    count = len(store)
+    depths = store.depths
+    parents = store.parents
+    costs = [0] * count
+    tops = [0] * count  # index of the top-level ancestor (or the entry itself)
+    ranks = [0] * count  # position among its siblings
+    relevance = [0.0] * count
+    children = {}  # type: Dict[int, int]
+    total = overhead
+    for i in range(count):
+        costs[i] = entry_tokens(depths[i], entry_label(store, i))
+        total += costs[i]
+        parent = parents[i]
+        tops[i] = i if parent < 0 else tops[parent]
+        if score is not None:
+            relevance[i] = (relevance[parent] if parent >= 0 else 0.0) + score(store.name(i))
+        ranks[i] = children.get(parent, 0)
+        children[parent] = ranks[i] + 1
+    if score is not None:
+        for i in range(count - 1, -1, -1):
+            parent = parents[i]
+            if parent >= 0 and relevance[i] > relevance[parent]:
+                relevance[parent] = relevance[i]
+
+    elided = {}  # type: Dict[str, int]
+    footer = estimate_tokens(footer_for(elided))
+    if total + footer <= budget:
+        return store, elided
+
+    def kind(i: int) -> int:
+        if store.is_dir(i):
+            return _DIR
+        return _KEY_FILE if store.name(i) in KEY_FILES else _FILE
+
+    order = sorted(range(count), key=lambda i: (relevance[i], -depths[i], kind(i), -ranks[i], -i))
+    removed = bytearray(count)
+    position = 0
+    while position < count:
+        while total + footer > budget and position < count:
+            i = order[position]
+            position += 1
+            removed[i] = 1
+            total -= costs[i]
+            top = tops[i]
+            label = store.name(top) + "/" if store.is_dir(top) else ''
+            elided[label] = elided.get(label, 0) + 1
+        resized = estimate_tokens(footer_for(elided))
+        if total + resized <= budget:
+            break
+        footer = resized
+
+    pruned = TreeStore()
+    for i in range(count):
+        if not removed[i]:
+            index = pruned.append(depths[i], store.name(i), store.is_dir(i))
+            if i in store.summaries:
+                pruned.summaries[index] = store.summaries[i]
+            if i in store.annotations:
+                pruned.annotations[index] = store.annotations[i]
+            if i in store.links:
+                pruned.links[index] = store.links[i]
+    return pruned, elided
+
+
+def elision_footer(elided: Dict[str, int], budget: int) -> str:
+    """
+    Describe pruned entries per top-level directory, largest first.
+
+    Returns:
+        Footer line such as "\\nElided to fit 4,000 tokens: src/ 1,204, tests/ 310",
+        or '' if nothing was elided
+    """
+    if not elided:
+        return ''
+    ranked = sorted(elided.items(), key=lambda item: (-item[1], item[0]))
+    parts = [f"{label or '(root files)'} {number:,}"
+             for label, number in ranked[:MAX_ELISION_NAMES]]  # type: List[str]
+    rest = ranked[MAX_ELISION_NAMES:]
+    if rest:
+        parts.append(f"{len(rest)} more {sum(number for _, number in rest):,}")
+    return f"\nElided to fit {budget:,} tokens: " + ", ".join(parts)
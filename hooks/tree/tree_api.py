@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+In-Process Tree Generation API
+
+The injection hooks used to start an interpreter for get_context_tree.py
+(after one or two more for `python3 --version`) on every qualifying
+prompt, paying for several Python startups before any scanning. They now
+import this module and call
+
+    result = generate_tree(cwd, ['--auto', '--cache', '--stack', ...])
+
+which parses the same arguments as the command line (without the root),
+runs the generator in the calling process and returns a TreeResult. The
+get_context_tree.py CLI stays the interface for external callers.
+
+Results are memoized per process, keyed by root and options, together
+with a fingerprint of the directories the scan listed: their mtime and
+inode, and the mtime of the .gitignore and .pseudocodeignore in them
+(the changes tree_daemon.py watches for). Files whose contents shape the
+output are fingerprinted as well, by mtime and size: the manifests read
+for the [STACK] header, and with --workspace the root's workspace
+declarations and the members' manifests. A repeated call re-stats those
+paths instead of listing anything, and reuses the result if nothing
+changed. Processes that generate one tree (the hooks) never hit the memo;
+it serves long-lived callers asking repeatedly. Directories changed while (or just before) they were scanned,
+trees cut short by the deadline, ones tied to a snapshot file
+(--snapshot, --diff-since), ones with file sizes (--annotate) and failed
+scans are never memoized. At most MEMO_SIZE results are kept.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from exclude_profiles import CONFIG_FILE
+from get_context_tree import build_parser, create_generator
+from tree_cache import RACY_WINDOW_SECONDS
+from tree_daemon import WatchingTreeGenerator
+
+# Results kept per process
+MEMO_SIZE = 16
+# Files whose edits change a tree without touching its directories' mtimes
+WATCHED_FILES = ('.gitignore', CONFIG_FILE)
+# Root files whose contents decide whether the root is a workspace
+WORKSPACE_FILES = ('pnpm-workspace.yaml', 'package.json', 'Cargo.toml', 'go.work', 'pyproject.toml')
+
+
+class TreeResult:
+    """The output of one generate_tree() call."""
+
+    def __init__(self, output: str, error: Optional[str], stats: Dict[str, object],
+                 elapsed_ms: float, memoized: bool = False, listing_abandoned: bool = False):
+        """
+        Args:
+            output: Rendered tree, as the CLI would print it
+            error: The generator's error, or None if the scan succeeded
+            stats: The scan's stats() (files, directories, limits, partial)
+            elapsed_ms: Time the scan took
+            memoized: Whether the result came from the per-process memo
+            listing_abandoned: Whether a listing thread was left stuck in the
+                filesystem at the deadline (it is a daemon thread and does
+                not delay interpreter exit)
+        """
+        self.output = output
+        self.error = error
+        self.stats = stats
+        self.elapsed_ms = elapsed_ms
+        self.memoized = memoized
+        self.listing_abandoned = listing_abandoned
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def reused(self) -> 'TreeResult':
+        return TreeResult(self.output, self.error, self.stats, self.elapsed_ms, memoized=True)
+
+
+def listing_fingerprint(dirs: Iterable[str], files: Iterable[str] = (),
+                        since: Optional[float] = None) -> Optional[str]:
+    """
+    Digest the mtime and inode of directories and the mtimes of their watched files.
+
+    Args:
+        dirs: Directories the scan listed
+        files: Files whose contents the output depends on (mtime and size)
+        since: Wall time the scan started; a change this recent may have
+            landed after its listing was read
+
+    Returns:
+        The fingerprint, or None if something changed within
+        RACY_WINDOW_SECONDS of `since` (or later)
+    """
+    racy_ns = None if since is None else int((since - RACY_WINDOW_SECONDS) * 1e9)
+    digest = hashlib.sha1()
+    for dir_path in sorted(set(dirs)):
+        mtimes = []  # type: List[int]
+        try:
+            st = os.stat(dir_path)
+            mtimes.append(st.st_mtime_ns)
+            digest.update(f"{dir_path}\0{st.st_mtime_ns}\0{st.st_ino}\0".encode('utf-8', 'surrogateescape'))
+        except OSError:
+            digest.update(f"{dir_path}\0-\0".encode('utf-8', 'surrogateescape'))
+        for name in WATCHED_FILES:
+            try:
+                mtime = os.stat(os.path.join(dir_path, name)).st_mtime_ns
+                mtimes.append(mtime)
+            except OSError:
+                mtime = -1
+            digest.update(f"{mtime}\0".encode('ascii'))
+        if racy_ns is not None and any(mtime >= racy_ns for mtime in mtimes):
+            return None
+    for path in sorted(set(files)):
+        try:
+            st = os.stat(path)
+        except OSError:
+            digest.update(f"{path}\0-\0".encode('utf-8', 'surrogateescape'))
+            continue
+        digest.update(f"{path}\0{st.st_mtime_ns}\0{st.st_size}\0".encode('utf-8', 'surrogateescape'))
+        if racy_ns is not None and st.st_mtime_ns >= racy_ns:
+            return None
+    return digest.hexdigest()[:16]
+
+
+def content_files(generator, workspace: bool) -> List[str]:
+    """Return the files whose contents a finished generator's output depends on."""
+    root = str(generator.root_path)
+    paths = []  # type: List[str]
+    if generator.stack is not None:
+        paths.extend(os.path.join(root, rel_path) for rel_path in generator.stack.manifests)
+    if workspace:
+        paths.extend(os.path.join(root, name) for name in WORKSPACE_FILES)
+        if generator.workspace is not None:
+            paths.extend(os.path.join(root, member['path'], member['manifest'])
+                         for member in generator.workspace.members)
+    return paths
+
+
+# (root, options) -> (listed directories, content files, their fingerprint, result)
+_memo = OrderedDict()  # type: OrderedDict[Tuple[str, Tuple[str, ...]], Tuple[List[str], List[str], str, TreeResult]]
+_memo_lock = threading.Lock()
+
+
+def generate_tree(root: str, options: Sequence[str] = (), memo: bool = True) -> TreeResult:
+    """
+    Generate the tree of a directory in this process.
+
+    Args:
+        root: Directory to scan
+        options: get_context_tree.py arguments without the root
+            (--stream and --profile are ignored)
+        memo: Whether to reuse and keep results in the per-process memo
+
+    Returns:
+        TreeResult
+
+    Raises:
+        ValueError: If the options are not valid get_context_tree.py arguments
+    """
+    key = (os.path.abspath(root), tuple(options))
+    if memo:
+        with _memo_lock:
+            entry = _memo.get(key)
+        if entry is not None:
+            dirs, files, fingerprint, result = entry
+            if listing_fingerprint(dirs, files) == fingerprint:
+                with _memo_lock:
+                    if key in _memo:
+                        _memo.move_to_end(key)
+                return result.reused()
+
+    try:
+        args = build_parser().parse_args([key[0]] + list(options))
+    except SystemExit:
+        # argparse has printed its usage message to stderr
+        raise ValueError(f"invalid tree options: {' '.join(options)}")
+
+    generator = create_generator(args, WatchingTreeGenerator)
+    scan_time = time.time()
+    started = time.perf_counter()
+    output = generator.generate()
+    result = TreeResult(output, generator.error, generator.stats(),
+                        (time.perf_counter() - started) * 1000,
+                        listing_abandoned=generator.listing_abandoned)
+
+    if (memo and result.ok and not generator.timed_out and not generator.listing_abandoned
+            and not (args.snapshot_path or args.diff_since or args.annotate)):
+        dirs = list(generator.listed_dirs)
+        files = content_files(generator, args.workspace)
+        fingerprint = listing_fingerprint(dirs, files, since=scan_time)
+        if fingerprint is not None:
+            with _memo_lock:
+                _memo[key] = (dirs, files, fingerprint, result)
+                _memo.move_to_end(key)
+                while len(_memo) > MEMO_SIZE:
+                    _memo.popitem(last=False)
+    return result
+
+
+def clear_memo() -> None:
+    """Forget every memoized result."""
+    with _memo_lock:
+        _memo.clear()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Persistent Directory Listing Cache for get_context_tree.py
+
+Stores the filtered, sorted listing of every scanned directory together with
+the directory's mtime and inode. On the next scan a directory is only
+re-listed when its own stat no longer matches, so an unchanged project costs
+one stat() per visited directory instead of a full scandir pass. Each listing
+also records the signature of the ignore rules it was filtered with, so an
+edited nested .gitignore re-lists the directories below it.
+
+Cache files live under ~/.claude/pseudo-code-prompting/tree-cache/, one JSON
+file per project root. The whole file is discarded when the scan settings or
+the root .gitignore change, since both decide what a listing contains.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser('~'), '.claude', 'pseudo-code-prompting', 'tree-cache'
+)
+
+# Directories modified this recently are not cached: a change landing in the
+# same mtime tick as our listing would otherwise go unnoticed (racy-git rule)
+RACY_WINDOW_SECONDS = 2.0
+
+
+def file_signature(path: str) -> Optional[List[int]]:
+    """Return [mtime_ns, size, inode] for a file, or None if it is missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+
+class TreeCache:
+    """mtime/inode-validated cache of directory listings for one project root."""
+
+    def __init__(self, root_path: str, cache_dir: str = DEFAULT_CACHE_DIR,
+                 settings: str = '',
+                 ignore_files: Tuple[str, ...] = ('.gitignore', os.path.join('.git', 'info', 'exclude'))):
+        """
+        Initialize cache for a project root.
+
+        Args:
+            root_path: Absolute project root the listings belong to
+            cache_dir: Directory holding cache files
+            settings: Opaque string describing scan settings; a mismatch
+                invalidates the cache
+            ignore_files: Root-relative ignore files whose change invalidates
+                the cache
+        """
+        self.root_path = str(root_path)
+        self.cache_dir = cache_dir
+        self.settings = settings
+        self.ignore_signature = {
+            name: file_signature(os.path.join(self.root_path, name))
+            for name in ignore_files
+        }
+        digest = hashlib.sha1(self.root_path.encode('utf-8')).hexdigest()[:16]
+        self.cache_file = os.path.join(cache_dir, f"{digest}.json")
+        self.entries = {}  # type: Dict[str, list]
+        self.visited = {}  # type: Dict[str, list]
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+
+    def load(self) -> None:
+        """Load cached listings, discarding them if they no longer apply."""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if (data.get('version') != CACHE_VERSION
+                or data.get('root') != self.root_path
+                or data.get('settings') != self.settings
+                or data.get('ignore') != self.ignore_signature):
+            self.dirty = True
+            return
+
+        self.entries = data.get('dirs', {})
+
+    def lookup(self, rel_path: str, st: os.stat_result,
+               signature_of: Callable[[bool], str]) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        Return the cached (dirs, files) listing if the directory is unchanged.
+
+        Args:
+            rel_path: Root-relative directory path ('' for the root)
+            st: Fresh stat of the directory
+            signature_of: Returns the current ignore-rule signature for the
+                directory, given whether it has its own .gitignore
+
+        Returns:
+            Cached listing, or None on a miss
+        """
+        cached = self.entries.get(rel_path)
+        if (cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_ino
+                and cached[5] == signature_of(cached[4])):
+            self.hits += 1
+            self.visited[rel_path] = cached
+            return cached[2], cached[3]
+
+        self.misses += 1
+        return None
+
+    def keep(self, rel_path: str) -> None:
+        """Count a listing served from elsewhere as visited, so a complete save keeps it."""
+        entry = self.entries.get(rel_path)
+        if entry is not None:
+            self.visited[rel_path] = entry
+
+    def store(self, rel_path: str, st: os.stat_result, dirs: List[str], files: List[str],
+              has_ignore_file: bool, signature: str) -> None:
+        """
+        Record a fresh listing unless the directory changed too recently.
+
+        Args:
+            rel_path: Root-relative directory path ('' for the root)
+            st: Stat of the directory taken before it was listed
+            dirs: Filtered directory names
+            files: Filtered file names
+            has_ignore_file: Whether the directory has its own .gitignore
+            signature: Signature of the ignore rules used for filtering
+        """
+        if time.time() - st.st_mtime < RACY_WINDOW_SECONDS:
+            self.entries.pop(rel_path, None)
+            self.dirty = True
+            return
+
+        entry = [st.st_mtime_ns, st.st_ino, dirs, files, has_ignore_file, signature]
+        self.entries[rel_path] = entry
+        self.visited[rel_path] = entry
+        self.dirty = True
+
+    def save(self, complete: bool = True) -> None:
+        """
+        Write the cache back to disk if anything changed.
+
+        Args:
+            complete: The scan visited the whole tree, so listings that were
+                not visited belong to deleted directories and can be dropped
+        """
+        if not self.dirty and (not complete or len(self.visited) == len(self.entries)):
+            return
+
+        dirs = self.visited if complete else self.entries
+        data = {
+            'version': CACHE_VERSION,
+            'root': self.root_path,
+            'settings': self.settings,
+            'ignore': self.ignore_signature,
+            'dirs': dirs,
+        }
+
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tree Fingerprints for the Context Injection Hooks
+
+Every qualifying prompt used to re-inject the whole project tree, although
+the model still has the previous copy in its context when nothing on disk
+changed. The hooks fingerprint the rendered tree and remember, per session
+and working directory, the fingerprint they last injected; an unchanged
+tree is then replaced by a one-line stub naming the fingerprint.
+
+The fingerprint covers exactly what would be injected, so a tree rendered
+differently (another --focus prompt, a changed file, a new [STACK] line)
+is injected again. Each session also keeps a snapshot of the listings it
+was shown (see tree_snapshot.py), so that later prompts can be given only
+the entries that changed.
+
+Fingerprints live in ~/.claude/pseudo-code-prompting/tree-fingerprints.json,
+keyed by a digest of session id and directory, and snapshots in the
+tree-snapshots/ directory next to it. Entries older than MAX_AGE_SECONDS
+are dropped, together with their snapshots, whenever the file is written.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+
+DEFAULT_FINGERPRINT_FILE = os.path.join(
+    os.path.expanduser('~'), '.claude', 'pseudo-code-prompting', 'tree-fingerprints.json'
+)
+
+# Sessions idle this long are forgotten
+MAX_AGE_SECONDS = 7 * 24 * 3600
+# Hex digits of the fingerprint shown to the model
+FINGERPRINT_LENGTH = 12
+
+
+def fingerprint(tree_output: str) -> str:
+    """Return a short content digest of a rendered tree, ignoring trailing whitespace."""
+    lines = [line.rstrip() for line in tree_output.strip().splitlines()]
+    digest = hashlib.sha256('\n'.join(lines).encode('utf-8')).hexdigest()
+    return digest[:FINGERPRINT_LENGTH]
+
+
+def injection_key(session_id: str, cwd: str) -> str:
+    """Return the key of a session and working directory."""
+    scope = f"{session_id}\0{os.path.abspath(cwd)}"
+    return hashlib.sha1(scope.encode('utf-8')).hexdigest()[:16]
+
+
+def snapshot_file(session_id: str, cwd: str, path: str = DEFAULT_FINGERPRINT_FILE) -> str:
+    """Return the tree snapshot file of a session and working directory."""
+    return os.path.join(os.path.dirname(path), 'tree-snapshots',
+                        injection_key(session_id, cwd) + '.snap.gz')
+
+
+def load_fingerprints(path: str) -> Dict[str, list]:
+    """Read the {key: [fingerprint, unix time]} map, or {} if missing or unreadable."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def last_injected(session_id: str, cwd: str,
+                  path: str = DEFAULT_FINGERPRINT_FILE) -> Optional[str]:
+    """
+    Return the fingerprint last injected for a session and directory.
+
+    Returns:
+        Fingerprint, or None if this session has not injected a tree for
+        the directory yet
+    """
+    entry = load_fingerprints(path).get(injection_key(session_id, cwd))
+    if isinstance(entry, list) and entry and isinstance(entry[0], str):
+        return entry[0]
+    return None
+
+
+def record_injection(session_id: str, cwd: str, tree_fingerprint: str,
+                     path: str = DEFAULT_FINGERPRINT_FILE) -> None:
+    """Remember the fingerprint injected for a session and directory (best effort)."""
+    now = time.time()
+    data = {}
+    for key, entry in load_fingerprints(path).items():
+        if (isinstance(entry, list) and len(entry) == 2
+                and isinstance(entry[1], (int, float)) and now - entry[1] < MAX_AGE_SECONDS):
+            data[key] = entry
+        else:
+            try:
+                os.remove(os.path.join(os.path.dirname(path), 'tree-snapshots', key + '.snap.gz'))
+            except OSError:
+                pass
+    data[injection_key(session_id, cwd)] = [tree_fingerprint, int(now)]
+
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_file, path)
+    except OSError:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+JSON and NDJSON Renderers for get_context_tree.py
+
+The ASCII tree is meant for a prompt; consumers that process the tree
+(caches, diffs, ranking, validation) get the same scan as structured data
+instead, so they never parse ASCII art or match strings such as
+"[ERROR:" and "<<PROJECT_EMPTY".
+
+Every entry becomes a record such as
+
+    {"type": "dir", "path": "src/api", "depth": 1}
+    {"type": "dir", "path": "db/migrations", "depth": 1, "summary": "1,842 files: *.sql x1,840"}
+    {"type": "file", "path": "src/api/index.ts", "depth": 2}
+    {"type": "file", "path": "src/api/routes.ts", "depth": 2, "size": 6213, "lines": 200}
+    {"type": "dir", "path": "shared", "depth": 0, "link": "../packages/shared"}
+
+with '/'-separated paths relative to the scan root. File records carry
+"size" and "lines" only with --annotate (see file_annotations.py), and
+"lines" only where they were counted; "link" is the target of a symlink
+followed with --follow-symlinks. The "json" format is one document:
+
+    {"root": "project", "path": "/abs/project", "entries": [...],
+     "stats": {...}, "errors": [...], "stack": {...} or null}
+
+The "ndjson" format writes one record per line: a {"type": "root"} record,
+the entries, and a closing {"type": "stats"} record carrying stats, errors
+and stack. A failed scan is {"error": "..."} or {"type": "error", ...}.
+
+Both are written while the entries are produced, so a streamed scan emits
+its first records before it finishes. Neither is cut at the ASCII output
+cap; --max-files bounds them.
+"""
+
+import json
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+OUTPUT_FORMATS = ('ascii', 'json', 'ndjson')
+
+
+def iter_records(entries: Iterable, summaries: Optional[dict] = None,
+                 annotations=None, links: Optional[dict] = None) -> Iterator[Dict]:
+    """
+    Turn scanned entries into JSON records.
+
+    Args:
+        entries: Iterable of (depth, name, is_dir, key, is_last), as
+            TreeStore.entries() or TreeGenerator.iter_entries() yield them
+        summaries: Collapsed-directory summaries by directory key
+        annotations: (size, lines) of files by key, anything with a
+            dict-like get()
+        links: Symlink targets by key
+
+    Yields:
+        One dict per entry
+    """
+    parts = []  # names on the path to the current entry
+    for depth, name, is_dir, key, _ in entries:
+        del parts[depth:]
+        parts.append(name)
+        record = {'type': 'dir' if is_dir else 'file', 'path': '/'.join(parts), 'depth': depth}
+        if links and key in links:
+            record['link'] = links[key]
+        if is_dir and summaries and key in summaries:
+            record['summary'] = summaries[key]
+        elif not is_dir and annotations is not None:
+            annotation = annotations.get(key)
+            if annotation is not None:
+                record['size'] = annotation[0]
+                if annotation[1] is not None:
+                    record['lines'] = annotation[1]
+        yield record
+
+
+def dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def write_json(out, root: Dict, records: Iterable[Dict], envelope: Callable[[], Dict]) -> None:
+    """
+    Write one JSON document, entry by entry.
+
+    Args:
+        out: Text stream to write to
+        root: Fields describing the scan root ("root", "path")
+        records: Entry records
+        envelope: Called once the records are exhausted; returns the
+            "stats", "errors" and "stack" fields
+    """
+    out.write(dumps(root)[:-1] + ',"entries":[')
+    separator = ''
+    for record in records:
+        out.write(separator + dumps(record))
+        separator = ','
+    out.write('],' + dumps(envelope())[1:] + '\n')
+
+
+def write_ndjson(out, root: Dict, records: Iterable[Dict], envelope: Callable[[], Dict]) -> None:
+    """
+    Write a root record, one line per entry, and a closing stats record.
+
+    Args: as write_json()
+    """
+    out.write(dumps(dict(type='root', **root)) + '\n')
+    for record in records:
+        out.write(dumps(record) + '\n')
+    out.write(dumps(dict(type='stats', **envelope())) + '\n')
+
+
+def format_error(output_format: str, message: str) -> str:
+    """Render a scan failure in the given output format."""
+    if output_format == 'json':
+        return dumps({'error': message})
+    if output_format == 'ndjson':
+        return dumps({'type': 'error', 'error': message})
+    return f"[ERROR: {message}]"
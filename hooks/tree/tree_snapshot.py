@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Tree Snapshots and Diffs for get_context_tree.py
+
+Once the model has seen the project tree, re-injecting all of it after a
+few files were created wastes most of the output on lines it already has.
+With --snapshot FILE the generator records the directory listings it read;
+with --diff-since FILE it compares the new listings against that snapshot
+and prints only the added, removed and renamed entries.
+
+Only directories listed by both scans are compared, so a scan that stops
+early (file limit, deadline, --focus depth) reports nothing for what it
+did not reach instead of reporting it as removed. Listings of directories
+that still exist but were not listed again are carried over into the next
+snapshot. The other way round, a directory the baseline knew only by name
+(below the depth an earlier scan reached) has its entries reported as
+listed for the first time, since they were never shown either. The
+[STACK] line printed with a tree is kept as well, and a diff repeats it
+when it changed: a manifest edited in place changes no listing.
+
+Renames are inferred from paths alone: a removed and an added directory
+with identical listings, a file whose name is unique among both the
+removed and the added files, or the only removed and only added file of a
+directory sharing an extension.
+
+Snapshots are gzip-compressed text: a JSON header line (version, root,
+settings and [STACK] line), then one record per path in sorted order,
+front-coded against the previous path:
+
+    <length of the prefix shared with the previous path><kind><rest of the path>
+
+where kind is ':' for a file, '/' for a directory and '+' for a directory
+whose listing was recorded (the root is the empty path).
+"""
+
+import gzip
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+SNAPSHOT_VERSION = 1
+# Most change lines printed by format_diff()
+MAX_DIFF_LINES = 200
+
+FILE, DIR, LISTED = ':', '/', '+'
+_RECORD = re.compile(r'^(\d+)([:/+])(.*)$')
+
+# '/'-separated directory path ('' for the root) -> (directory names, file names)
+Listings = Dict[str, Tuple[List[str], List[str]]]
+
+
+def join(rel_dir: str, name: str) -> str:
+    return f"{rel_dir}/{name}" if rel_dir else name
+
+
+class Snapshot:
+    """Directory listings of one scan, with the settings that filtered them."""
+
+    def __init__(self, root: str, settings: str, listings: Listings, stack: Optional[str] = None):
+        """
+        Args:
+            root: Absolute scan root
+            settings: Scan settings deciding what a listing contains; a
+                snapshot taken with other settings cannot be compared
+            listings: Listing of every directory the scan read
+            stack: The [STACK] line printed with the tree, if any
+        """
+        self.root = root
+        self.settings = settings
+        self.listings = listings
+        self.stack = stack
+
+    def records(self) -> List[Tuple[str, str]]:
+        """Return (path, kind) for every listed directory and listed entry, sorted by path."""
+        kinds = {}  # type: Dict[str, str]
+        for rel_dir, (dirs, files) in self.listings.items():
+            for name in dirs:
+                kinds[join(rel_dir, name)] = DIR
+            for name in files:
+                kinds[join(rel_dir, name)] = FILE
+        for rel_dir in self.listings:
+            kinds[rel_dir] = LISTED
+        return sorted(kinds.items())
+
+    def write(self, path: str) -> None:
+        """Write the snapshot, front-coded and compressed (best effort)."""
+        lines = [json.dumps({'version': SNAPSHOT_VERSION, 'root': self.root,
+                             'settings': self.settings, 'stack': self.stack})]
+        previous = ''
+        for rel_path, kind in self.records():
+            shared = len(os.path.commonprefix((previous, rel_path)))
+            lines.append(f"{shared}{kind}{rel_path[shared:]}")
+            previous = rel_path
+
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with gzip.open(tmp_file, 'wt', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp_file, path)
+        except OSError:
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+
+    @classmethod
+    def read(cls, path: str) -> Optional['Snapshot']:
+        """Read a snapshot, or return None if it is missing, corrupt or of another version."""
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                if not isinstance(header, dict) or header.get('version') != SNAPSHOT_VERSION:
+                    return None
+                listings = {}  # type: Listings
+                previous = ''
+                for line in f:
+                    match = _RECORD.match(line.rstrip('\n'))
+                    if match is None:
+                        return None
+                    rel_path = previous[:int(match.group(1))] + match.group(3)
+                    previous = rel_path
+                    kind = match.group(2)
+                    if kind == LISTED:
+                        listings.setdefault(rel_path, ([], []))
+                    if rel_path:
+                        parent, _, name = rel_path.rpartition('/')
+                        dirs, files = listings.setdefault(parent, ([], []))
+                        (files if kind == FILE else dirs).append(name)
+        except (OSError, ValueError, EOFError):
+            return None
+        stack = header.get('stack')
+        return cls(str(header.get('root')), str(header.get('settings')), listings,
+                   stack if isinstance(stack, str) else None)
+
+
+def carry_over(previous: Snapshot, listings: Listings) -> Listings:
+    """
+    Add the listings of a previous snapshot that the new scan did not read again.
+
+    A previous listing is kept when its directory still appears in the
+    listing of its (new or kept) parent.
+    """
+    merged = dict(listings)
+    for rel_dir in sorted(previous.listings, key=by_depth):
+        if rel_dir in merged or not rel_dir:
+            continue
+        parent, _, name = rel_dir.rpartition('/')
+        if parent in merged and name in merged[parent][0]:
+            merged[rel_dir] = previous.listings[rel_dir]
+    return merged
+
+
+def by_depth(rel_dir: str) -> Tuple[int, str]:
+    """Sort key putting every directory after its parent."""
+    return rel_dir.count('/') + (rel_dir != ''), rel_dir
+
+
+def subtree(listings: Listings, rel_dir: str) -> List[str]:
+    """Return the listed paths below a directory, directories with a trailing '/'."""
+    paths = []
+    dirs, files = listings.get(rel_dir, ((), ()))
+    for name in sorted(dirs):
+        child = join(rel_dir, name)
+        paths.append(child + '/')
+        paths.extend(subtree(listings, child))
+    paths.extend(join(rel_dir, name) for name in sorted(files))
+    return paths
+
+
+def unique_pairs(old: Dict[object, List[str]], new: Dict[object, List[str]]) -> List[Tuple[str, str]]:
+    """Pair the paths whose key occurs exactly once on each side."""
+    return [(paths[0], new[key][0]) for key, paths in old.items()
+            if len(paths) == 1 and len(new.get(key, ())) == 1]
+
+
+class SnapshotDiff:
+    """Changes between two snapshots, limited to directories both listed."""
+
+    def __init__(self):
+        self.added = []  # type: List[str]
+        self.removed = []  # type: List[Tuple[str, int]]
+        self.renamed = []  # type: List[Tuple[str, str]]
+        # Entries of directories only the new snapshot listed
+        self.listed = []  # type: List[str]
+        # The new [STACK] line, if it differs from the old one
+        self.stack_changed = False
+        self.stack = None  # type: Optional[str]
+        self.compared = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.renamed or self.listed or self.stack_changed)
+
+
+def diff_snapshots(old: Snapshot, new: Snapshot) -> SnapshotDiff:
+    """
+    Compare two snapshots of the same root.
+
+    Returns:
+        SnapshotDiff with added paths (directories with a trailing '/' and
+        followed by their listed contents), removed paths with the number
+        of entries recorded below them, (old, new) renames, and the entries
+        of directories the old snapshot named but did not list, and the new
+        [STACK] line if it changed (a manifest edit leaves listings alone)
+    """
+    diff = SnapshotDiff()
+    diff.stack_changed = old.stack != new.stack
+    diff.stack = new.stack
+    added_dirs, added_files, removed_dirs, removed_files = [], [], [], []
+    for rel_dir in sorted(new.listings):
+        if rel_dir not in old.listings:
+            continue
+        diff.compared += 1
+        old_dirs, old_files = old.listings[rel_dir]
+        new_dirs, new_files = new.listings[rel_dir]
+        added_dirs.extend(join(rel_dir, n) for n in sorted(set(new_dirs) - set(old_dirs)))
+        added_files.extend(join(rel_dir, n) for n in sorted(set(new_files) - set(old_files)))
+        removed_dirs.extend(join(rel_dir, n) for n in sorted(set(old_dirs) - set(new_dirs)))
+        removed_files.extend(join(rel_dir, n) for n in sorted(set(old_files) - set(new_files)))
+
+    # Directories whose listing moved unchanged
+    signatures = ({}, {})  # type: Tuple[Dict[object, List[str]], Dict[object, List[str]]]
+    for snapshot, paths, by_signature in ((old, removed_dirs, signatures[0]),
+                                          (new, added_dirs, signatures[1])):
+        for rel_dir in paths:
+            dirs, files = snapshot.listings.get(rel_dir, ((), ()))
+            if dirs or files:
+                by_signature.setdefault((tuple(sorted(dirs)), tuple(sorted(files))), []).append(rel_dir)
+    for source, target in unique_pairs(*signatures):
+        diff.renamed.append((source + '/', target + '/'))
+        removed_dirs.remove(source)
+        added_dirs.remove(target)
+
+    # Files moved under the same name, then files renamed within a directory
+    by_name = ({}, {})  # type: Tuple[Dict[object, List[str]], Dict[object, List[str]]]
+    for paths, names in ((removed_files, by_name[0]), (added_files, by_name[1])):
+        for rel_path in paths:
+            names.setdefault(rel_path.rpartition('/')[2], []).append(rel_path)
+    moves = unique_pairs(*by_name)
+    by_place = ({}, {})  # type: Tuple[Dict[object, List[str]], Dict[object, List[str]]]
+    moved = {path for pair in moves for path in pair}
+    for paths, places in ((removed_files, by_place[0]), (added_files, by_place[1])):
+        for rel_path in paths:
+            if rel_path not in moved:
+                parent, _, name = rel_path.rpartition('/')
+                places.setdefault(parent, []).append(rel_path)
+    for source, target in moves + unique_pairs(*by_place):
+        if source in moved or os.path.splitext(source)[1] == os.path.splitext(target)[1]:
+            diff.renamed.append((source, target))
+            removed_files.remove(source)
+            added_files.remove(target)
+
+    # Directories that existed before but are listed for the first time
+    first_listed = set()
+    for rel_dir in sorted(new.listings, key=by_depth):
+        parent, _, name = rel_dir.rpartition('/')
+        if rel_dir and rel_dir not in old.listings and (
+                parent in first_listed or name in old.listings.get(parent, ((), ()))[0]):
+            first_listed.add(rel_dir)
+            dirs, files = new.listings[rel_dir]
+            diff.listed.extend(join(rel_dir, n) + '/' for n in dirs)
+            diff.listed.extend(join(rel_dir, n) for n in files)
+    diff.listed.sort()
+
+    for rel_dir in added_dirs:
+        diff.added.append(rel_dir + '/')
+        diff.added.extend(subtree(new.listings, rel_dir))
+    diff.added.extend(added_files)
+    diff.added.sort()
+    diff.removed = sorted([(rel_dir + '/', len(subtree(old.listings, rel_dir))) for rel_dir in removed_dirs]
+                          + [(rel_path, 0) for rel_path in removed_files])
+    diff.renamed.sort()
+    return diff
+
+
+def format_diff(diff: SnapshotDiff) -> str:
+    """
+    Render a diff as one line per change, at most MAX_DIFF_LINES of them.
+
+    Returns:
+        "[DIFF] ..." summary line followed by "+ path", "- path",
+        "~ old -> new" and, for entries listed for the first time, "* path"
+        lines; a changed stack follows the summary as its new [STACK] line
+    """
+    compared = f"{diff.compared:,} directories compared"
+    if not diff:
+        return f"[DIFF] No changes since the snapshot ({compared})"
+
+    if diff.added or diff.removed or diff.renamed or diff.listed:
+        summary = (f"[DIFF] {len(diff.added):,} added, {len(diff.removed):,} removed, "
+                   f"{len(diff.renamed):,} renamed since the snapshot")
+        if diff.listed:
+            summary += f", {len(diff.listed):,} existing entries listed for the first time"
+    else:
+        summary = "[DIFF] Stack changed since the snapshot"
+    lines = [f"{summary} ({compared})"]
+    if diff.stack_changed:
+        lines.append(diff.stack or "[STACK] (no manifests detected)")
+    lines.extend("+ " + rel_path for rel_path in diff.added)
+    for rel_path, entries in diff.removed:
+        lines.append(f"- {rel_path} ({entries:,} entries)" if entries else "- " + rel_path)
+    lines.extend(f"~ {source} -> {target}" for source, target in diff.renamed)
+    lines.extend("* " + rel_path for rel_path in diff.listed)
+    if len(lines) > MAX_DIFF_LINES + 1:
+        hidden = len(lines) - 1 - MAX_DIFF_LINES
+        lines = lines[:MAX_DIFF_LINES + 1] + [f"... {hidden:,} more changes"]
+    return "\n".join(lines)
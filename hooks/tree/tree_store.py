@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Compact Tree Store for get_context_tree.py
+
+A scanned tree kept as a list of (depth, name, is_dir, Path) tuples costs a
+tuple and a Path object per entry. TreeStore keeps the same depth-first
+sequence in parallel arrays instead: one byte of depth, one byte of flags,
+a parent index and an index into a table of interned names. Names such as
+index.ts or __init__.py that repeat across directories are stored once.
+
+Entries are appended in depth-first order, so a new entry's parent is the
+last directory appended one level up; the store tracks that itself and
+needs no paths. Paths relative to the scan root are rebuilt on demand by
+following parent indexes, for exporters that need them.
+"""
+
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Upper bound of the one-byte depth array
+MAX_STORE_DEPTH = 255
+
+
+def last_sibling_flags(depths: Sequence[int]) -> List[bool]:
+    """
+    Compute, for every entry, whether it is the last child of its parent.
+
+    Walks the depths backwards once, remembering for each depth whether a
+    later sibling has already been seen; entering a shallower depth
+    forgets everything deeper. O(n) overall.
+
+    Args:
+        depths: Depth of every entry, in depth-first order
+
+    Returns:
+        List of booleans aligned with `depths`
+    """
+    flags = [True] * len(depths)
+    seen = []  # seen[d]: a later sibling exists at depth d
+
+    for i in range(len(depths) - 1, -1, -1):
+        depth = depths[i]
+        if len(seen) > depth + 1:
+            del seen[depth + 1:]
+        elif len(seen) <= depth:
+            seen.extend([False] * (depth + 1 - len(seen)))
+        flags[i] = not seen[depth]
+        seen[depth] = True
+
+    return flags
+
+
+class TreeStore:
+    """Depth-first tree entries in parallel arrays with interned names."""
+
+    def __init__(self):
+        self.depths = array('B')
+        self.flags = array('B')  # 1 for directories
+        self.parents = array('i')  # -1 for entries directly under the root
+        self.name_ids = array('I')
+        self.names = []  # type: List[str]
+        self.summaries = {}  # type: Dict[int, str]
+        # File index -> (size, line count or None), see file_annotations.py
+        self.annotations = {}  # type: Dict[int, Tuple[int, Optional[int]]]
+        # Entry index -> symlink target, for followed symlinks
+        self.links = {}  # type: Dict[int, str]
+        self._name_index = {}  # type: Dict[str, int]
+        self._open_dirs = []  # type: List[int]
+
+    def __len__(self) -> int:
+        return len(self.depths)
+
+    def append(self, depth: int, name: str, is_dir: bool) -> int:
+        """
+        Add the next entry in depth-first order.
+
+        Args:
+            depth: Depth below the root (0 for the root's children), at most
+                MAX_STORE_DEPTH
+            name: File or directory name
+            is_dir: Whether the entry is a directory
+
+        Returns:
+            Index of the new entry
+        """
+        name_id = self._name_index.get(name)
+        if name_id is None:
+            name_id = self._name_index[name] = len(self.names)
+            self.names.append(name)
+
+        index = len(self.depths)
+        open_dirs = self._open_dirs
+        del open_dirs[depth:]
+        self.depths.append(depth)
+        self.flags.append(1 if is_dir else 0)
+        self.parents.append(open_dirs[-1] if open_dirs else -1)
+        self.name_ids.append(name_id)
+        if is_dir:
+            open_dirs.append(index)
+        return index
+
+    def name(self, index: int) -> str:
+        """Return the name of an entry."""
+        return self.names[self.name_ids[index]]
+
+    def is_dir(self, index: int) -> bool:
+        """Return whether an entry is a directory."""
+        return self.flags[index] == 1
+
+    def rel_path(self, index: int) -> str:
+        """Return an entry's '/'-separated path relative to the scan root."""
+        parts = []
+        while index >= 0:
+            parts.append(self.names[self.name_ids[index]])
+            index = self.parents[index]
+        return '/'.join(reversed(parts))
+
+    def entries(self) -> Iterator[Tuple[int, str, bool, int, bool]]:
+        """
+        Iterate over the entries with exact last-sibling flags.
+
+        Yields:
+            Tuples (depth, name, is_dir, index, is_last)
+        """
+        names = self.names
+        for index, (depth, flag, name_id, is_last) in enumerate(
+                zip(self.depths, self.flags, self.name_ids, last_sibling_flags(self.depths))):
+            yield depth, names[name_id], flag == 1, index, is_last
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Monorepo Workspace Detection for get_context_tree.py
+
+A monorepo scanned as one tree spends the whole --max-files budget on the
+packages that sort first. When the root declares a workspace, the tree
+generator scans each member package on its own share of the budget
+instead (see TreeGenerator.generate_workspace()).
+
+Recognised workspace declarations, in this order:
+
+    pnpm-workspace.yaml     packages: [globs]
+    package.json            "workspaces": [globs] or {"packages": [globs]} (npm, yarn)
+    Cargo.toml              [workspace] members = [globs]
+    go.work                 use ./dir, use ( ... )
+    pyproject.toml          [tool.uv.workspace] members = [globs]
+
+Without any of them, two or more Python packages (pyproject.toml or
+setup.py) one or two levels below a root that has none of its own also
+count as a workspace.
+
+Member globs are matched one path segment at a time against directory
+listings from a `list_fn` (by default read_listing(); the tree generator
+passes its own, bounded by its deadline), so excluded and hidden
+directories such as node_modules/ or .git/ are never walked, even by '**'.
+
+Member names, versions and stacks come from each member's manifest and are
+cached by the manifest's mtime and size (see stack_detect.ManifestCache).
+"""
+
+import fnmatch
+import json
+import os
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from stack_detect import MANIFESTS, ManifestCache, parse_manifest
+
+# Most member packages scanned separately
+MAX_MEMBERS = 64
+# Manifests identifying a member package, in order of preference
+MEMBER_MANIFESTS = ('package.json', 'Cargo.toml', 'pyproject.toml', 'go.mod', 'setup.py')
+PYTHON_MANIFESTS = ('pyproject.toml', 'setup.py')
+
+_TABLE = re.compile(r'^\s*\[\[?\s*([^\]]+?)\s*\]\]?\s*$')
+_QUOTED = re.compile(r'["\']([^"\']+)["\']')
+_STRING_KEY = re.compile(r'^\s*(name|version)\s*=\s*["\']([^"\']+)["\']')
+_SETUP_NAME = re.compile(r'\bname\s*=\s*["\']([^"\']+)["\']')
+
+
+# Lists one directory: (directory names, file names)
+ListFn = Callable[[str], Tuple[List[str], List[str]]]
+
+
+class Workspace:
+    """Member packages declared by a workspace root."""
+
+    def __init__(self, kind: str, config: str, members: List[Dict]):
+        """
+        Args:
+            kind: 'pnpm', 'npm', 'yarn', 'cargo', 'go', 'uv' or 'python'
+            config: File declaring the workspace ('' for the Python heuristic)
+            members: One dict per member: 'path' (relative, '/'-separated),
+                'manifest', 'name', 'version', 'languages', 'frameworks'
+        """
+        self.kind = kind
+        self.config = config
+        self.members = members
+
+
+def read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def toml_array(text: str, table: str, key: str) -> List[str]:
+    """Return the strings of `key = [...]` in `[table]`, also spread over several lines."""
+    values = []
+    current = ''
+    collecting = False
+    for line in text.splitlines():
+        line = line.split('#', 1)[0]
+        if collecting:
+            values.extend(_QUOTED.findall(line.split(']', 1)[0]))
+            collecting = ']' not in line
+            continue
+        match = _TABLE.match(line)
+        if match:
+            current = match.group(1)
+            continue
+        if current == table and re.match(rf'^\s*{re.escape(key)}\s*=\s*\[', line):
+            value = line.split('[', 1)[1]
+            values.extend(_QUOTED.findall(value.split(']', 1)[0]))
+            collecting = ']' not in value
+    return values
+
+
+def pnpm_patterns(text: str) -> List[str]:
+    """Return the globs of the `packages:` list of a pnpm-workspace.yaml."""
+    patterns = []
+    in_packages = False
+    for line in text.splitlines():
+        stripped = line.split('#', 1)[0].strip()
+        if not stripped:
+            continue
+        if not line[0].isspace() and not stripped.startswith('-'):
+            in_packages = stripped.startswith('packages:')
+            continue
+        if in_packages and stripped.startswith('-'):
+            patterns.append(stripped[1:].strip().strip('"\''))
+    return patterns
+
+
+def go_work_dirs(text: str) -> List[str]:
+    """Return the directories of the `use` directives of a go.work file."""
+    dirs = []
+    in_block = False
+    for line in text.splitlines():
+        line = line.split('//', 1)[0].strip()
+        if in_block:
+            if line.startswith(')'):
+                in_block = False
+            elif line:
+                dirs.append(line.strip('"'))
+        elif line.startswith('use'):
+            rest = line[len('use'):].strip()
+            if rest.startswith('('):
+                in_block = True
+            elif rest:
+                dirs.append(rest.strip('"'))
+    return dirs
+
+
+def declared_patterns(root: str) -> Optional[Tuple[str, str, List[str]]]:
+    """
+    Find the workspace declaration of a root.
+
+    Returns:
+        (kind, config file, member globs), or None
+    """
+    text = read_text(os.path.join(root, 'pnpm-workspace.yaml'))
+    if text is not None:
+        return 'pnpm', 'pnpm-workspace.yaml', pnpm_patterns(text)
+
+    text = read_text(os.path.join(root, 'package.json'))
+    if text is not None:
+        try:
+            workspaces = json.loads(text).get('workspaces')
+        except (ValueError, AttributeError):
+            workspaces = None
+        if isinstance(workspaces, dict):
+            workspaces = workspaces.get('packages')
+        if isinstance(workspaces, list) and workspaces:
+            kind = 'yarn' if os.path.exists(os.path.join(root, 'yarn.lock')) else 'npm'
+            return kind, 'package.json', [p for p in workspaces if isinstance(p, str)]
+
+    text = read_text(os.path.join(root, 'Cargo.toml'))
+    if text is not None and re.search(r'^\s*\[workspace\]', text, re.M):
+        excluded = ['!' + p for p in toml_array(text, 'workspace', 'exclude')]
+        return 'cargo', 'Cargo.toml', toml_array(text, 'workspace', 'members') + excluded
+
+    text = read_text(os.path.join(root, 'go.work'))
+    if text is not None:
+        return 'go', 'go.work', go_work_dirs(text)
+
+    text = read_text(os.path.join(root, 'pyproject.toml'))
+    if text is not None:
+        members = toml_array(text, 'tool.uv.workspace', 'members')
+        if members:
+            excluded = ['!' + p for p in toml_array(text, 'tool.uv.workspace', 'exclude')]
+            return 'uv', 'pyproject.toml', members + excluded
+
+    return None
+
+
+def member_manifest(path: str) -> Optional[str]:
+    """Return the name of the manifest that makes a directory a package."""
+    for name in MEMBER_MANIFESTS:
+        if os.path.isfile(os.path.join(path, name)):
+            return name
+    return None
+
+
+def read_listing(path: str) -> Tuple[List[str], List[str]]:
+    """List a directory from disk; an unreadable one is empty."""
+    dirs, files = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    (dirs if entry.is_dir() else files).append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return sorted(dirs), sorted(files)
+
+
+class DirectoryWalker:
+    """Lists directories below a root once each, skipping excluded and hidden ones."""
+
+    def __init__(self, root: str, excluded_dirs, list_fn: ListFn = read_listing):
+        self.root = root
+        self.excluded_dirs = excluded_dirs
+        self.list_fn = list_fn
+        self.listings = {}  # type: Dict[str, Tuple[List[str], List[str]]]
+
+    def listing(self, rel: str) -> Tuple[List[str], List[str]]:
+        """Return the (subdirectories, files) of a '/'-separated path ('' for the root)."""
+        listing = self.listings.get(rel)
+        if listing is None:
+            path = os.path.join(self.root, *rel.split('/')) if rel else self.root
+            dirs, files = self.list_fn(path)
+            dirs = [name for name in dirs
+                    if name not in self.excluded_dirs and not name.startswith('.')]
+            listing = self.listings[rel] = (dirs, files)
+        return listing
+
+    def match(self, pattern: str) -> Set[str]:
+        """
+        Return the directories matching a glob ('**' spans any number of directories).
+
+        Args:
+            pattern: '/'-separated glob relative to the root
+
+        Returns:
+            '/'-separated paths of matching directories
+        """
+        matches = {''}
+        for part in pattern.split('/'):
+            if not part:
+                continue
+            if part == '**':
+                found = set()  # type: Set[str]
+                pending = sorted(matches)
+                while pending:
+                    rel = pending.pop()
+                    if rel not in found:
+                        found.add(rel)
+                        pending.extend(join(rel, name) for name in self.listing(rel)[0])
+                matches = found
+            else:
+                matches = {join(rel, name) for rel in sorted(matches)
+                           for name in self.listing(rel)[0] if fnmatch.fnmatchcase(name, part)}
+        matches.discard('')
+        return matches
+
+
+def join(rel: str, name: str) -> str:
+    return rel + '/' + name if rel else name
+
+
+def expand_patterns(root: str, patterns: Iterable[str], excluded_dirs,
+                    list_fn: ListFn = read_listing) -> List[str]:
+    """
+    Expand member globs into package directories.
+
+    Args:
+        root: Workspace root
+        patterns: Globs relative to the root; '!' negates
+        excluded_dirs: Directory names never entered (node_modules, ...)
+        list_fn: Lists one directory
+
+    Returns:
+        Sorted '/'-separated paths of directories holding a member manifest,
+        outermost only
+    """
+    walker = DirectoryWalker(root, excluded_dirs, list_fn)
+    included = set()
+    negated = set()
+    for pattern in patterns:
+        target = negated if pattern.startswith('!') else included
+        pattern = pattern.lstrip('!').strip().rstrip('/')
+        if pattern.startswith('./'):
+            pattern = pattern[2:]
+        if not pattern or pattern == '.' or os.path.isabs(pattern) or '..' in pattern.split('/'):
+            continue
+        target.update(walker.match(pattern))
+
+    members = []
+    for rel in sorted(included - negated):
+        if any(rel.startswith(outer + '/') for outer in members):
+            continue
+        if member_manifest(os.path.join(root, rel)):
+            members.append(rel)
+    return members[:MAX_MEMBERS]
+
+
+def python_packages(root: str, excluded_dirs, list_fn: ListFn = read_listing) -> List[str]:
+    """Return directories one or two levels down that hold a Python package manifest."""
+    walker = DirectoryWalker(root, excluded_dirs, list_fn)
+    if any(name in walker.listing('')[1] for name in PYTHON_MANIFESTS):
+        return []
+    rels = sorted(rel for pattern in ('*', '*/*') for rel in walker.match(pattern)
+                  if any(name in walker.listing(rel)[1] for name in PYTHON_MANIFESTS))
+    outermost = []
+    for rel in rels:
+        if not any(rel.startswith(outer + '/') for outer in outermost):
+            outermost.append(rel)
+    return outermost[:MAX_MEMBERS] if len(outermost) >= 2 else []
+
+
+def parse_package(path: str) -> Dict:
+    """
+    Read a member manifest's name, version and stack.
+
+    Args:
+        path: Manifest path
+
+    Returns:
+        Dict with 'name', 'version' (None if not declared), 'languages'
+        and 'frameworks'
+    """
+    manifest = os.path.basename(path)
+    meta = {'name': None, 'version': None, 'languages': [], 'frameworks': []}
+    text = read_text(path) or ''
+
+    if manifest == 'package.json':
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = {}
+        if isinstance(data, dict):
+            meta['name'] = data.get('name') if isinstance(data.get('name'), str) else None
+            meta['version'] = data.get('version') if isinstance(data.get('version'), str) else None
+    elif manifest in ('Cargo.toml', 'pyproject.toml'):
+        tables = ('package',) if manifest == 'Cargo.toml' else ('project', 'tool.poetry')
+        table = ''
+        for line in text.splitlines():
+            match = _TABLE.match(line)
+            if match:
+                table = match.group(1)
+                continue
+            match = _STRING_KEY.match(line)
+            if table in tables and match and meta[match.group(1)] is None:
+                meta[match.group(1)] = match.group(2)
+    elif manifest == 'go.mod':
+        match = re.search(r'^\s*module\s+(\S+)', text, re.M)
+        meta['name'] = match.group(1) if match else None
+    elif manifest == 'setup.py':
+        match = _SETUP_NAME.search(text)
+        meta['name'] = match.group(1) if match else None
+        meta['languages'] = ['Python']
+
+    if manifest in MANIFESTS:
+        facts = parse_manifest(path, manifest)
+        meta['languages'] = facts['languages']
+        meta['frameworks'] = facts['frameworks']
+    return meta
+
+
+def detect_workspace(root: str, excluded_dirs, cache_dir: Optional[str] = None,
+                     list_fn: ListFn = read_listing) -> Optional[Workspace]:
+    """
+    Detect the workspace a root declares and describe its members.
+
+    Args:
+        root: Absolute project root
+        excluded_dirs: Directory names never treated as members or walked
+        cache_dir: Directory for the member metadata cache (None disables it)
+        list_fn: Lists one directory while member globs are expanded;
+            whatever it raises (e.g. DeadlineExceeded) propagates
+
+    Returns:
+        Workspace with at least one member, or None
+    """
+    declared = declared_patterns(root)
+    if declared is not None:
+        kind, config, patterns = declared
+        paths = expand_patterns(root, patterns, excluded_dirs, list_fn)
+    else:
+        kind, config = 'python', ''
+        paths = python_packages(root, excluded_dirs, list_fn)
+    if not paths:
+        return None
+
+    cache = ManifestCache(root, cache_dir, 'workspace')
+    cache.load()
+    members = []
+    for rel in paths:
+        manifest = member_manifest(os.path.join(root, rel))
+        if manifest is None:
+            continue
+        meta = cache.get(rel + '/' + manifest, parse_package) or {}
+        members.append(dict(meta, path=rel, manifest=manifest))
+    cache.save()
+    return Workspace(kind, config, members)
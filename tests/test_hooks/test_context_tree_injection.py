@@ -104,3 +104,57 @@ def test_hook_handles_empty_prompt(hook_executor, temp_dir):
     result = hook_executor("hooks/tree/context-aware-tree-injection.py", hook_input, timeout=15)
 
     assert result.returncode == 0
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_hook_skips_unchanged_tree_within_session(hook_executor, temp_dir, monkeypatch):
+    """Test a repeated prompt gets a stub, and a changed tree only its changes."""
+    monkeypatch.setenv("HOME", str(temp_dir / "home"))
+    project = temp_dir / "project"
+    (project / "src").mkdir(parents=True)
+    (project / "src" / "app.py").touch()
+    hook_input = json.dumps({
+        "prompt": "implement feature",
+        "cwd": str(project),
+        "session_id": "session-1"
+    })
+
+    first = hook_executor("hooks/tree/context-aware-tree-injection.py", hook_input, timeout=15)
+    second = hook_executor("hooks/tree/context-aware-tree-injection.py", hook_input, timeout=15)
+    (project / "src" / "models.py").touch()
+    third = hook_executor("hooks/tree/context-aware-tree-injection.py", hook_input, timeout=15)
+    other = hook_executor("hooks/tree/context-aware-tree-injection.py",
+                          hook_input.replace("session-1", "session-2"), timeout=15)
+
+    assert "Project Structure:" in first.stdout and "app.py" in first.stdout
+    assert "Project structure unchanged since the last injection (fingerprint " in second.stdout
+    assert "app.py" not in second.stdout
+    assert "Project structure changes since the last injection" in third.stdout
+    assert "+ src/models.py" in third.stdout and "app.py" not in third.stdout
+    assert "Project Structure:" in other.stdout
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_hook_reports_stack_change_within_session(hook_executor, temp_dir, monkeypatch):
+    """Test a manifest edited in place is not hidden behind the unchanged stub."""
+    monkeypatch.setenv("HOME", str(temp_dir / "home"))
+    project = temp_dir / "project"
+    (project / "src").mkdir(parents=True)
+    (project / "src" / "app.py").touch()
+    (project / "requirements.txt").write_text("flask\n")
+    hook_input = json.dumps({
+        "prompt": "implement feature",
+        "cwd": str(project),
+        "session_id": "session-1"
+    })
+
+    first = hook_executor("hooks/tree/context-aware-tree-injection.py", hook_input, timeout=15)
+    (project / "requirements.txt").write_text("django\n")
+    second = hook_executor("hooks/tree/context-aware-tree-injection.py", hook_input, timeout=15)
+
+    assert "Flask" in first.stdout
+    assert "Project structure unchanged" not in second.stdout
+    assert "[DIFF] Stack changed since the snapshot" in second.stdout
+    assert "frameworks: Django" in second.stdout and "app.py" not in second.stdout
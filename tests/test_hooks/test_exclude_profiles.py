@@ -0,0 +1,80 @@
+"""
+Tests for exclude_profiles.py - exclusion profiles and .pseudocodeignore.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_rules_compile_into_sets_suffixes_and_one_regex():
+    """Test each rule kind lands in its fast path and still matches."""
+    from exclude_profiles import ExclusionRules
+
+    rules = ExclusionRules({"node_modules", "bazel-*"},
+                           {"*.pyc", "*.tfstate.backup", "*~", "Thumbs.db", "npm-debug.log*"})
+
+    assert rules.dir_names == {"node_modules"}
+    assert rules.extensions == {".pyc"}
+    assert rules.suffixes == (".tfstate.backup", "~")
+    assert rules.file_names == {"Thumbs.db"}
+    assert rules.excludes("bazel-out", True) and "bazel-bin" in rules
+    assert not rules.excludes("bazel-out", False)
+    assert rules.excludes("a.pyc", False) and rules.excludes("notes.txt~", False)
+    assert rules.excludes("prod.tfstate.backup", False)
+    assert rules.excludes("npm-debug.log.1", False)
+    assert not rules.excludes("main.py", False) and not rules.excludes("src", True)
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_config_profiles_and_detection(tmp_path):
+    """Test .pseudocodeignore rules, kept names, named and detected profiles."""
+    from exclude_profiles import load_exclusions
+
+    (tmp_path / "pyproject.toml").touch()
+    (tmp_path / ".pseudocodeignore").write_text(
+        "# generated\nprofile: terraform, cobol\ngenerated/\n*.snap\n!build/\nsrc/gen/\n"
+    )
+
+    rules, unknown = load_exclusions(str(tmp_path), ["bazel"])
+
+    assert rules.profiles == ("terraform", "bazel", "python")
+    assert unknown == ["cobol"]
+    assert rules.excludes("generated", True) and not rules.excludes("generated", False)
+    assert rules.excludes("ui.snap", False) and rules.excludes("ui.snap", True)
+    assert not rules.excludes("build", True)
+    assert rules.excludes(".terraform", True) and rules.excludes("bazel-out", True)
+    assert rules.excludes("pkg.egg-info", True)
+    assert not rules.excludes("gen", True)
+
+    (tmp_path / ".pseudocodeignore").write_text("profile: none\n")
+    rules, _ = load_exclusions(str(tmp_path))
+    assert rules.profiles == () and not rules.excludes("pkg.egg-info", True)
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_generator_applies_project_exclusions(tmp_path):
+    """Test the scan skips profile and config names and re-lists after a config edit."""
+    from get_context_tree import TreeGenerator
+
+    (tmp_path / "go.mod").touch()
+    (tmp_path / "api.test").touch()
+    (tmp_path / "bazel-out" / "k8").mkdir(parents=True)
+    (tmp_path / "generated").mkdir()
+    (tmp_path / "generated" / "schema.go").touch()
+    cache_dir = str(tmp_path / ".cache")
+
+    output = TreeGenerator(str(tmp_path), cache_dir=cache_dir, exclude_profiles=("bazel",)).generate()
+    assert "api.test" not in output and "bazel-out" not in output
+    assert "schema.go" in output
+
+    (tmp_path / ".pseudocodeignore").write_text("generated/\n")
+    output = TreeGenerator(str(tmp_path), cache_dir=cache_dir).generate()
+    assert "generated" not in output and "bazel-out/" in output
@@ -0,0 +1,122 @@
+"""
+Tests for file_annotations.py - file sizes and line counts for get_context_tree.py.
+"""
+import io
+import json
+import os
+import pytest
+import sys
+import time
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+
+def age(path, seconds=60):
+    """Move a file's mtime out of the racy window."""
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_sizes_and_line_counts(tmp_path):
+    """Test labels, unterminated last lines and files that are never counted."""
+    from file_annotations import FileAnnotator, format_annotation, MAX_COUNT_BYTES
+
+    (tmp_path / "auth.py").write_text("import os\n" * 199 + "x = 1")
+    (tmp_path / "blob.dat").write_bytes(b"\x00\x01" * 100)
+    (tmp_path / "logo.png").write_bytes(b"not really a png\n")
+    (tmp_path / "models.py").write_text("x = 1\n" * (MAX_COUNT_BYTES // 6 + 1))
+    annotator = FileAnnotator(str(tmp_path))
+
+    assert annotator.annotate(str(tmp_path / "auth.py")) == (1995, 200)
+    assert format_annotation((1995, 200)) == "1.9 KB, 200 lines"
+    assert annotator.annotate(str(tmp_path / "blob.dat")) == (200, None)
+    assert annotator.annotate(str(tmp_path / "logo.png")) == (17, None)
+    size, lines = annotator.annotate(str(tmp_path / "models.py"))
+    assert lines is None and format_annotation((size, lines)) == "256.0 KB"
+    assert annotator.annotate(str(tmp_path / "missing.py")) is None
+    # The image and the large file were never opened
+    assert annotator.files_read == 2
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_line_counts_cached_by_inode_mtime_and_size(tmp_path, monkeypatch):
+    """Test a repeated run reads no unchanged file and re-reads a changed one."""
+    import file_annotations
+
+    project = tmp_path / "project"
+    project.mkdir()
+    for name in ("a.py", "b.py"):
+        (project / name).write_text("line\n" * 10)
+        age(project / name)
+    cache_dir = str(tmp_path / "cache")
+
+    first = file_annotations.FileAnnotator(str(project), cache_dir)
+    first.load()
+    assert first.annotate(str(project / "a.py")) == (50, 10)
+    assert first.annotate(str(project / "b.py")) == (50, 10)
+    first.save()
+
+    calls = []
+    real_count = file_annotations.count_lines
+    monkeypatch.setattr(file_annotations, "count_lines",
+                        lambda path, limit: calls.append(path) or real_count(path, limit))
+    (project / "b.py").write_text("line\n" * 12)
+    age(project / "b.py")
+
+    second = file_annotations.FileAnnotator(str(project), cache_dir)
+    second.load()
+    assert second.annotate(str(project / "a.py")) == (50, 10)
+    assert second.annotate(str(project / "b.py")) == (60, 12)
+    assert calls == [str(project / "b.py")]
+    assert second.hits == 1
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_budgets_limit_stats_and_reads(tmp_path):
+    """Test spent budgets leave files bare or size-only and are noted."""
+    from file_annotations import FileAnnotator
+
+    for i in range(4):
+        (tmp_path / f"f{i}.txt").write_text("x\n" * 50)
+
+    by_reads = FileAnnotator(str(tmp_path), read_budget=250)
+    results = [by_reads.annotate(str(tmp_path / f"f{i}.txt")) for i in range(4)]
+    assert results == [(100, 50), (100, 50), (100, None), (100, None)]
+    assert by_reads.note() == "line counts stopped after 200 B read (read budget reached)"
+
+    by_stats = FileAnnotator(str(tmp_path), stat_budget=3)
+    results = [by_stats.annotate(str(tmp_path / f"f{i}.txt")) for i in range(4)]
+    assert results[3] is None
+    assert by_stats.note() == "first 3 files only (stat budget reached)"
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_generator_annotates_ascii_and_json(tmp_path):
+    """Test --annotate labels files in the tree and adds size/lines to JSON records."""
+    from get_context_tree import TreeGenerator
+
+    (tmp_path / "routes").mkdir()
+    (tmp_path / "routes" / "auth.py").write_text("pass\n" * 3)
+    (tmp_path / "README.md").write_text("# Demo\n")
+
+    output = TreeGenerator(str(tmp_path), annotate=True).generate()
+    assert "|-- routes/\n|   +-- auth.py (15 B, 3 lines)" in output
+    assert "+-- README.md (7 B, 1 line)" in output
+
+    records = json.loads(TreeGenerator(str(tmp_path), annotate=True, output_format='json').generate())
+    files = {r["path"]: r for r in records["entries"] if r["type"] == "file"}
+    assert (files["routes/auth.py"]["size"], files["routes/auth.py"]["lines"]) == (15, 3)
+
+    out = io.StringIO()
+    TreeGenerator(str(tmp_path), annotate=True).stream(out)
+    assert "|   +-- auth.py (15 B, 3 lines)" in out.getvalue()
+
+    assert "(15 B" not in TreeGenerator(str(tmp_path)).generate()
@@ -3,9 +3,15 @@ Tests for get_context_tree.py - generates project structure for context injectio
 """
 import pytest
 import json
+import os
 import subprocess
+import sys
 from pathlib import Path
 
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
 
 @pytest.mark.hook
 @pytest.mark.integration
@@ -138,3 +144,496 @@ def test_tree_generation_timeout(tmp_path):
             text=True,
             timeout=0.05  # Very short timeout to test timeout handling
         )
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_scan_uses_direntry_type_without_stat(tmp_path, monkeypatch):
+    """Test scanning relies on DirEntry types instead of per-entry stat calls."""
+    from get_context_tree import TreeGenerator
+
+    (tmp_path / "src" / "app").mkdir(parents=True)
+    (tmp_path / "src" / "app" / "main.py").touch()
+    (tmp_path / "README.md").touch()
+
+    generator = TreeGenerator(str(tmp_path))
+
+    calls = []
+    real_stat, real_lstat = os.stat, os.lstat
+    monkeypatch.setattr(os, "stat", lambda *a, **k: calls.append(a) or real_stat(*a, **k))
+    monkeypatch.setattr(os, "lstat", lambda *a, **k: calls.append(a) or real_lstat(*a, **k))
+
+    tree = generator.scan_directory(generator.root_path)
+
+    assert [(d, n, is_dir) for d, n, is_dir, _ in tree] == [
+        (0, "src", True),
+        (1, "app", True),
+        (2, "main.py", False),
+        (0, "README.md", False),
+    ]
+    assert calls == []
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="symlinks unsupported")
+def test_scan_skips_symlinks(tmp_path):
+    """Test symlinked entries are skipped to avoid cycles."""
+    from get_context_tree import TreeGenerator
+
+    (tmp_path / "real").mkdir()
+    (tmp_path / "real" / "file.txt").touch()
+    try:
+        os.symlink(str(tmp_path / "real"), str(tmp_path / "loop"))
+    except OSError:
+        pytest.skip("cannot create symlinks")
+
+    tree = TreeGenerator(str(tmp_path)).scan_directory(tmp_path)
+
+    assert "loop" not in [name for _, name, _, _ in tree]
+
+
+def make_linked_project(root):
+    """real/ with a link back to the root, a directory alias, a file link and a dangling link."""
+    (root / "real").mkdir()
+    (root / "real" / "file.txt").touch()
+    try:
+        os.symlink("..", str(root / "real" / "back"))
+        os.symlink(str(root / "real"), str(root / "alias"))
+        os.symlink(os.path.join("real", "file.txt"), str(root / "readme.txt"))
+        os.symlink("missing", str(root / "dangling"))
+    except OSError:
+        pytest.skip("cannot create symlinks")
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="symlinks unsupported")
+@pytest.mark.parametrize("strategy", ["depth", "breadth"])
+def test_follow_symlinks_stops_cycles_and_repeats(tmp_path, strategy):
+    """Test followed links are marked, cycles and repeated directories are not rescanned."""
+    from get_context_tree import TreeGenerator
+
+    make_linked_project(tmp_path)
+    generator = TreeGenerator(str(tmp_path), follow_symlinks=True, strategy=strategy)
+    output = generator.generate()
+
+    assert output.startswith(
+        f"{tmp_path.name}/\n"
+        f"|-- alias/ -> {tmp_path / 'real'}\n"
+        "|   |-- back/ -> .. (loops back to .)\n"
+        "|   +-- file.txt\n"
+        "|-- real/ (same as alias)\n"
+        f"+-- readme.txt -> {os.path.join('real', 'file.txt')}\n"
+    )
+    assert "dangling" not in output
+    # Linked files count against the same budget
+    assert generator.file_count == 2
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="symlinks unsupported")
+def test_follow_symlinks_with_cache_and_json(tmp_path):
+    """Test listings with links bypass the listing cache, and JSON records carry the target."""
+    from get_context_tree import TreeGenerator
+
+    project = tmp_path / "project"
+    project.mkdir()
+    make_linked_project(project)
+    cache_dir = str(tmp_path / "cache")
+
+    first = TreeGenerator(str(project), follow_symlinks=True, cache_dir=cache_dir).generate()
+    second = TreeGenerator(str(project), follow_symlinks=True, cache_dir=cache_dir).generate()
+    assert second == first and "readme.txt -> " in second
+
+    document = json.loads(TreeGenerator(str(project), follow_symlinks=True, output_format="json").generate())
+    links = {record["path"]: record.get("link") for record in document["entries"]}
+    assert links["alias"] == str(project / "real")
+    assert links["alias/file.txt"] is None
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_format_tree_ascii_branches(tmp_path):
+    """Test ASCII formatting draws last-sibling branches and continuations."""
+    from get_context_tree import TreeGenerator
+
+    generator = TreeGenerator(str(tmp_path))
+    tree = [
+        (0, "src", True, None),
+        (1, "api", True, None),
+        (2, "routes.py", False, None),
+        (1, "main.py", False, None),
+        (0, "tests", True, None),
+        (1, "test_api.py", False, None),
+        (0, "README.md", False, None),
+    ]
+
+    lines = generator.format_tree_ascii(tree).split("\n")
+
+    assert lines[1:] == [
+        "|-- src/",
+        "|   |-- api/",
+        "|   |   +-- routes.py",
+        "|   +-- main.py",
+        "|-- tests/",
+        "|   +-- test_api.py",
+        "+-- README.md",
+    ]
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_last_sibling_flags_flat_directory():
+    """Test last-sibling flags on a flat listing mark only the final entry."""
+    from get_context_tree import TreeGenerator
+
+    tree = [(0, f"file_{i}", False, None) for i in range(5)]
+
+    assert TreeGenerator.last_sibling_flags(tree) == [False] * 4 + [True]
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+@pytest.mark.parametrize("strategy", ["depth", "breadth"])
+@pytest.mark.parametrize("max_files", [7, 1000])
+def test_parallel_scan_matches_sequential(tmp_path, max_files, strategy):
+    """Test threaded listing yields the sequential tree, including under a file budget."""
+    from get_context_tree import TreeGenerator
+
+    for a in range(4):
+        for b in range(3):
+            sub = tmp_path / f"pkg_{a}" / f"mod_{b}"
+            sub.mkdir(parents=True)
+            for c in range(3):
+                (sub / f"file_{c}.py").touch()
+            (sub / "debug.tmp").touch()
+    (tmp_path / "pkg_1" / ".gitignore").write_text("*.tmp\n")
+    (tmp_path / "README.md").touch()
+
+    def run(workers):
+        return TreeGenerator(str(tmp_path), max_files=max_files, workers=workers,
+                             strategy=strategy).generate()
+
+    sequential = run(1)
+
+    assert run(4) == sequential
+    assert "debug.tmp" in sequential
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_allocate_budget_water_fills():
+    """Test small directories keep all files and pass unused share to large ones."""
+    from get_context_tree import allocate_budget
+
+    assert allocate_budget([50, 2, 30], 20) == [9, 2, 9]
+    assert allocate_budget([5, 5, 5], 2) == [1, 1, 0]
+    assert allocate_budget([1, 2], 100) == [1, 2]
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_breadth_strategy_does_not_starve_later_directories(tmp_path):
+    """Test one huge early directory cannot use up the whole file budget."""
+    from get_context_tree import TreeGenerator
+
+    for i in range(200):
+        (tmp_path / "api").mkdir(exist_ok=True)
+        (tmp_path / "api" / f"route_{i:03d}.py").touch()
+    (tmp_path / "web" / "pages").mkdir(parents=True)
+    (tmp_path / "web" / "pages" / "index.tsx").touch()
+    (tmp_path / "web" / "app.tsx").touch()
+    (tmp_path / "README.md").touch()
+
+    depth_first = TreeGenerator(str(tmp_path), max_files=20)
+    assert "app.tsx" not in depth_first.generate()
+    generator = TreeGenerator(str(tmp_path), max_files=20, strategy="breadth")
+    output = generator.generate()
+
+    assert depth_first.file_count == 20
+    assert generator.file_count == 20
+    for name in ("web/", "pages/", "index.tsx", "app.tsx", "README.md", "route_000.py"):
+        assert name in output
+    assert "(limited to 20 files)" in output
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_summarize_listing():
+    """Test large or single-extension listings are summarised, small mixed ones are not."""
+    from get_context_tree import summarize_listing
+
+    sql = [f"{i:04d}_migration.sql" for i in range(1840)] + ["README.md", "env.py"]
+    assert summarize_listing([], sql, 200) == "1,842 files: *.sql x1,840"
+    mixed = [f"file_{i}.{ext}" for i in range(150) for ext in ("json", "csv")]
+    assert summarize_listing(["a", "b"], mixed, 200) == "300 files, 2 dirs"
+    assert summarize_listing([], mixed[:60], 200) is None
+    assert summarize_listing([], sql, 0) is None
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+@pytest.mark.parametrize("strategy", ["depth", "breadth"])
+def test_collapse_replaces_large_directory_with_summary(tmp_path, strategy):
+    """Test a homogeneous directory becomes one summary line and uses no file budget."""
+    from get_context_tree import TreeGenerator
+
+    migrations = tmp_path / "db" / "migrations"
+    migrations.mkdir(parents=True)
+    for i in range(60):
+        (migrations / f"{i:04d}_step.sql").touch()
+    (tmp_path / "db" / "schema.py").touch()
+    (tmp_path / "README.md").touch()
+
+    generator = TreeGenerator(str(tmp_path), collapse_threshold=100, strategy=strategy)
+    output = generator.generate()
+
+    assert "migrations/ (60 files: *.sql x60)" in output
+    assert "0000_step.sql" not in output
+    assert "schema.py" in output
+    assert generator.file_count == 2
+    assert "Collapsed: 1 directories (60 files)" in output
+    assert "0000_step.sql" in TreeGenerator(str(tmp_path), strategy=strategy).generate()
+
+
+def make_stream_project(root, dirs=5, files=20):
+    """Create `dirs` directories of `files` files each, plus a top-level file."""
+    for d in range(dirs):
+        sub = root / f"pkg_{d}" / "src"
+        sub.mkdir(parents=True)
+        for f in range(files):
+            (sub / f"module_{f:02d}.py").touch()
+    (root / "setup.py").touch()
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+@pytest.mark.parametrize("strategy", ["depth", "breadth"])
+def test_stream_matches_generate(tmp_path, strategy):
+    """Test streamed output equals the batch output for a complete scan."""
+    import io
+    from get_context_tree import TreeGenerator
+
+    make_stream_project(tmp_path)
+    out = io.StringIO()
+
+    assert TreeGenerator(str(tmp_path), strategy=strategy).stream(out) is None
+    assert out.getvalue() == TreeGenerator(str(tmp_path), strategy=strategy).generate() + "\n"
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_stream_writes_before_scan_finishes(tmp_path):
+    """Test the first line is written before the scan has found every file."""
+    from get_context_tree import TreeGenerator
+
+    make_stream_project(tmp_path)
+    generator = TreeGenerator(str(tmp_path))
+    counts_at_write = []
+
+    class Recorder:
+        def write(self, text):
+            counts_at_write.append(generator.file_count)
+
+    generator.stream(Recorder())
+
+    assert counts_at_write[0] < generator.file_count == 101
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_stream_stops_scanning_at_byte_cap(tmp_path, monkeypatch):
+    """Test the scan stops once the output cap is reached, with a truncation notice."""
+    import io
+    import get_context_tree
+    from get_context_tree import TreeGenerator
+
+    make_stream_project(tmp_path)
+    monkeypatch.setattr(get_context_tree, "MAX_OUTPUT_BYTES", 1000)
+    generator = TreeGenerator(str(tmp_path))
+    out = io.StringIO()
+
+    generator.stream(out)
+    output = out.getvalue()
+
+    assert generator.file_count < 101
+    assert "[TRUNCATED: Output exceeded 1000 bytes]" in output
+    assert len(output.split("\n\nTotal:")[0].encode("utf-8")) <= 500
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+@pytest.mark.parametrize("workers", [1, 4])
+def test_deadline_abandons_hung_listing(tmp_path, monkeypatch, workers):
+    """Test a listing that never returns yields a partial tree at the deadline."""
+    import threading
+    import time
+    import get_context_tree
+    from get_context_tree import TreeGenerator
+
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "main.py").touch()
+    (tmp_path / "stale_mount").mkdir()
+    (tmp_path / "zeta").mkdir()
+    (tmp_path / "zeta" / "late.py").touch()
+
+    # Stand-in for a hung NFS/FUSE readdir
+    release = threading.Event()
+    real_scandir = os.scandir
+
+    def hanging_scandir(path):
+        if os.path.basename(str(path)) == "stale_mount":
+            release.wait(30)
+        return real_scandir(path)
+
+    monkeypatch.setattr(get_context_tree.os, "scandir", hanging_scandir)
+    generator = TreeGenerator(str(tmp_path), timeout=0.5, workers=workers)
+    try:
+        start = time.monotonic()
+        output = generator.generate()
+        elapsed = time.monotonic() - start
+    finally:
+        release.set()
+
+    assert elapsed < 5
+    assert generator.listing_abandoned
+    assert "main.py" in output
+    assert "stale_mount/" in output
+    assert "late.py" not in output
+    assert "[PARTIAL: deadline reached]" in output
+    assert "Listing abandoned at deadline" in output
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_truncated_partial_tree_keeps_deadline_marker(tmp_path, monkeypatch):
+    """Test a deadline-cut tree over MAX_OUTPUT_BYTES still ends with the partial marker."""
+    import threading
+    import get_context_tree
+    from get_context_tree import MAX_OUTPUT_BYTES, TreeGenerator
+
+    app = tmp_path / "app"
+    app.mkdir()
+    for i in range(900):
+        (app / f"module_with_a_rather_long_descriptive_name_{i:04d}.py").touch()
+    (tmp_path / "zzz_stale_mount").mkdir()
+    release = threading.Event()
+    real_scandir = os.scandir
+
+    def hanging_scandir(path):
+        if os.path.basename(str(path)) == "zzz_stale_mount":
+            release.wait(30)
+        return real_scandir(path)
+
+    monkeypatch.setattr(get_context_tree.os, "scandir", hanging_scandir)
+    try:
+        output = TreeGenerator(str(tmp_path), timeout=1).generate()
+    finally:
+        release.set()
+
+    assert "[TRUNCATED: Output exceeded" in output
+    assert len(output.encode("utf-8")) <= MAX_OUTPUT_BYTES
+    assert output.endswith("[PARTIAL: deadline reached]")
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_root_listing_at_deadline_is_not_reported_empty(tmp_path, monkeypatch):
+    """Test a root listing outlasting the deadline yields the partial marker, not the empty flag."""
+    import io
+    import threading
+    import get_context_tree
+    from get_context_tree import EMPTY_FLAG, TreeGenerator
+
+    (tmp_path / "app.py").touch()
+    release = threading.Event()
+    real_scandir = os.scandir
+
+    def hanging_scandir(path):
+        if str(path) == str(tmp_path):
+            release.wait(30)
+        return real_scandir(path)
+
+    monkeypatch.setattr(get_context_tree.os, "scandir", hanging_scandir)
+    try:
+        output = TreeGenerator(str(tmp_path), timeout=0.3).generate()
+        streamed = io.StringIO()
+        TreeGenerator(str(tmp_path), timeout=0.3).stream(streamed)
+    finally:
+        release.set()
+
+    for text in (output, streamed.getvalue()):
+        assert EMPTY_FLAG not in text
+        assert text.startswith(tmp_path.name + "/")
+        assert "[PARTIAL: deadline reached]" in text
+
+    monkeypatch.setattr(get_context_tree.os, "scandir", real_scandir)
+    (tmp_path / "app.py").unlink()
+    assert TreeGenerator(str(tmp_path)).generate() == EMPTY_FLAG
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+@pytest.mark.parametrize("strategy", ["depth", "breadth"])
+def test_json_format_lists_entries_with_envelope(tmp_path, strategy):
+    """Test --format json carries the same entries as the ASCII tree, plus stats."""
+    from get_context_tree import TreeGenerator
+
+    migrations = tmp_path / "db" / "migrations"
+    migrations.mkdir(parents=True)
+    for i in range(60):
+        (migrations / f"{i:04d}_step.sql").touch()
+    (tmp_path / "db" / "schema.py").touch()
+    (tmp_path / "README.md").touch()
+
+    generator = TreeGenerator(str(tmp_path), collapse_threshold=100, strategy=strategy,
+                              output_format="json")
+    document = json.loads(generator.generate())
+
+    assert document["root"] == tmp_path.name
+    assert document["entries"] == [
+        {"type": "dir", "path": "db", "depth": 0},
+        {"type": "dir", "path": "db/migrations", "depth": 1, "summary": "60 files: *.sql x60"},
+        {"type": "file", "path": "db/schema.py", "depth": 1},
+        {"type": "file", "path": "README.md", "depth": 0},
+    ]
+    assert document["stats"]["files"] == 2
+    assert document["stats"]["collapsed_directories"] == 1
+    assert document["stats"]["partial"] is False
+    assert document["errors"] == []
+    assert document["stack"] is None
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_ndjson_stream_matches_generate(tmp_path):
+    """Test streamed NDJSON equals the batch output and ends with the stats record."""
+    import io
+    from get_context_tree import TreeGenerator
+
+    make_stream_project(tmp_path)
+    out = io.StringIO()
+
+    assert TreeGenerator(str(tmp_path), output_format="ndjson").stream(out) is None
+    assert out.getvalue() == TreeGenerator(str(tmp_path), output_format="ndjson").generate() + "\n"
+
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert records[0] == {"type": "root", "root": tmp_path.name, "path": str(tmp_path.resolve())}
+    assert records[-1]["type"] == "stats"
+    assert records[-1]["stats"]["files"] == 101
+    assert {"type": "file", "path": "pkg_0/src/module_00.py", "depth": 2} in records
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_json_format_reports_errors(tmp_path):
+    """Test a missing root is reported as a JSON error instead of [ERROR: ...]."""
+    from get_context_tree import TreeGenerator
+
+    generator = TreeGenerator(str(tmp_path / "missing"), output_format="json")
+    document = json.loads(generator.generate())
+
+    assert document["error"].startswith("Directory does not exist")
+    assert generator.error == document["error"]
@@ -0,0 +1,89 @@
+"""
+Tests for git_index.py - tracked-path enumeration from .git/index.
+"""
+import pytest
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+
+
+def git(repo: Path, *args: str):
+    subprocess.run(["git", *args], cwd=str(repo), check=True, capture_output=True)
+
+
+@pytest.fixture
+def git_project(tmp_path):
+    """Git work tree with tracked, untracked and ignored files."""
+    repo = tmp_path / "repo"
+    (repo / "src" / "api" / "v1").mkdir(parents=True)
+    (repo / "src" / "api" / "v1" / "users.py").touch()
+    (repo / "src" / "api" / "auth.py").touch()
+    (repo / "src" / "api.txt").touch()
+    (repo / "README.md").touch()
+    (repo / ".gitignore").write_text("*.log\n")
+    git(repo, "init", "-q")
+    git(repo, "add", "-A")
+    (repo / "NOTES.md").touch()
+    (repo / "debug.log").touch()
+    return repo
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+@pytest.mark.parametrize("version", ["2", "3", "4"])
+def test_parse_index_versions(git_project, version):
+    """Test all supported index versions yield the tracked paths in order."""
+    from git_index import parse_index
+
+    git(git_project, "update-index", "--index-version", version)
+    paths, gitlinks = parse_index((git_project / ".git" / "index").read_bytes())
+
+    assert paths == [".gitignore", "README.md", "src/api.txt",
+                     "src/api/auth.py", "src/api/v1/users.py"]
+    assert gitlinks == set()
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_index_lister_lists_children_only(git_project):
+    """Test directory listings come from the contiguous run of index entries."""
+    from git_index import GitIndexLister
+
+    lister = GitIndexLister.for_root(str(git_project))
+
+    assert lister.list_directory("") == (["src"], [".gitignore", "README.md"])
+    assert lister.list_directory("src") == (["api"], ["api.txt"])
+    assert lister.list_directory("src/api") == (["v1"], ["auth.py"])
+    assert lister.list_directory("untracked") is None
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_generator_uses_index_below_walk_depth(git_project, monkeypatch):
+    """Test deep tracked directories are not listed from disk."""
+    import get_context_tree
+    from get_context_tree import TreeGenerator
+
+    listed = []
+    real_scandir = os.scandir
+
+    def recording_scandir(path):
+        listed.append(os.path.relpath(str(path), str(git_project)))
+        return real_scandir(path)
+
+    monkeypatch.setattr(get_context_tree.os, "scandir", recording_scandir)
+    output = TreeGenerator(str(git_project), use_git_index=True).generate()
+
+    # Untracked files near the root are merged in, ignored ones are not
+    assert "NOTES.md" in output
+    assert "debug.log" not in output
+    assert "users.py" in output
+    assert sorted(listed) == [".", "src"]
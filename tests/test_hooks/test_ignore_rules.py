@@ -0,0 +1,121 @@
+"""
+Tests for ignore_rules.py - gitignore engine used by get_context_tree.py.
+"""
+import pytest
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+ROOT_GITIGNORE = """\
+# comment
+*.out
+!keep.out
+/bin/
+docs/**/*.tmp
+cache/
+[abc]_gen.py
+**/secret
+"""
+
+SRC_GITIGNORE = """\
+*.txt
+!important.txt
+generated/
+/local.cfg
+"""
+
+FILES = [
+    "README.md", "app.out", "keep.out", "bin/main.py", "src/bin/main.py",
+    "docs/guide.md", "docs/c.tmp", "docs/a/b/c.tmp", "cache/blob.dat",
+    "src/cache/blob.dat", "a_gen.py", "d_gen.py", "src/secret", "deep/x/secret/key.pem",
+    "src/notes.txt", "src/important.txt", "src/generated/model.py", "src/local.cfg",
+    "src/sub/local.cfg", "src/sub/notes.txt", "scratch.md", "src/scratch.md",
+]
+
+
+@pytest.fixture
+def ignore_project(tmp_path):
+    """Work tree exercising negation, anchoring, ** and nested ignore files."""
+    repo = tmp_path / "repo"
+    for rel in FILES:
+        path = repo / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+    (repo / ".gitignore").write_text(ROOT_GITIGNORE)
+    (repo / "src" / ".gitignore").write_text(SRC_GITIGNORE)
+    (repo / ".git" / "info").mkdir(parents=True)
+    (repo / ".git" / "info" / "exclude").write_text("scratch.md\n")
+    return repo
+
+
+def visible_files(root: Path, **kwargs):
+    from get_context_tree import TreeGenerator
+
+    generator = TreeGenerator(str(root), include_hidden=True, max_files=10000, **kwargs)
+    generator.generate()
+    paths, stack = [], []
+    for depth, name, is_dir, _ in generator.scan_directory(generator.root_path):
+        del stack[depth:]
+        stack.append(name)
+        if not is_dir:
+            paths.append("/".join(stack))
+    return sorted(p for p in paths if not p.endswith(".gitignore"))
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+def test_matches_git_check_ignore(ignore_project):
+    """Test scanner visibility agrees with git check-ignore for every file."""
+    subprocess.run(["git", "init", "-q"], cwd=str(ignore_project), check=True)
+    (ignore_project / ".git" / "info" / "exclude").write_text("scratch.md\n")
+
+    result = subprocess.run(
+        ["git", "check-ignore", "--stdin"], cwd=str(ignore_project),
+        input="\n".join(FILES), capture_output=True, text=True
+    )
+    ignored = set(result.stdout.split())
+
+    assert visible_files(ignore_project) == sorted(set(FILES) - ignored)
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_last_matching_rule_wins():
+    """Test later rules and deeper files take precedence, including negation."""
+    from ignore_rules import IgnoreMatcher, parse_rule
+
+    rules = [parse_rule(line, "", f"t:{i}") for i, line in enumerate(["*.log", "!keep.log"])]
+    nested = [parse_rule("keep.log", "sub/", "sub/.gitignore:1")]
+    root = IgnoreMatcher().extend(rules, "root")
+    child = root.extend(nested, "sub")
+
+    assert root.is_ignored("debug.log", False)
+    assert not root.is_ignored("keep.log", False)
+    assert child.is_ignored("sub/keep.log", False)
+    assert not root.is_ignored("other/keep.log", False)
+    assert child.match("sub/keep.log", False).source == "sub/.gitignore:1"
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_nested_gitignore_edit_invalidates_cached_listings(ignore_project, tmp_path):
+    """Test editing a nested .gitignore re-filters the cached directory."""
+    past = time.time() - 60
+    for dirpath, _, _ in os.walk(str(ignore_project)):
+        os.utime(dirpath, (past, past))
+    cache_dir = str(tmp_path / "cache")
+
+    assert "src/notes.txt" not in visible_files(ignore_project, cache_dir=cache_dir)
+
+    (ignore_project / "src" / ".gitignore").write_text("generated/\n")
+    os.utime(str(ignore_project / "src"), (past, past))
+
+    assert "src/notes.txt" in visible_files(ignore_project, cache_dir=cache_dir)
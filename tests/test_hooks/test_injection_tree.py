@@ -0,0 +1,70 @@
+"""
+Tests for injection_tree.py - the tree lookup shared by the injection hooks.
+"""
+import pytest
+import subprocess
+import sys
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_project_tree_falls_back_to_in_process_scan(tmp_path, monkeypatch):
+    """Test a missing daemon leads to a direct scan, and a daemon's answer is used as is."""
+    import injection_tree
+    import tree_daemon
+
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text("pass\n")
+    monkeypatch.delenv(tree_daemon.DAEMON_ENV, raising=False)
+    monkeypatch.setattr(tree_daemon, 'query_daemon', lambda root, args: None)
+    output = injection_tree.project_tree(str(tmp_path), ['--max-files', '50'])
+    assert "app.py" in output
+
+    monkeypatch.setattr(tree_daemon, 'query_daemon', lambda root, args: "from daemon")
+    assert injection_tree.project_tree(str(tmp_path), ['--max-files', '50']) == "from daemon"
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_failed_scan_returns_none(tmp_path):
+    """Test invalid options give None instead of raising into the hook."""
+    from injection_tree import generate_tree_in_process
+
+    assert generate_tree_in_process(str(tmp_path), ['--no-such-option']) is None
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_stuck_scan_is_abandoned(tmp_path, monkeypatch):
+    """Test a scan hanging outside the listing watchdog gives None after the timeout."""
+    import threading
+    import time
+    import tree_api
+    from injection_tree import generate_tree_in_process
+
+    release = threading.Event()
+    monkeypatch.setattr(tree_api, 'generate_tree', lambda root, options: release.wait(30))
+    try:
+        started = time.monotonic()
+        assert generate_tree_in_process(str(tmp_path), [], timeout=0.2) is None
+        assert time.monotonic() - started < 2
+    finally:
+        release.set()
+
+    # The abandoned worker does not keep the hook process alive
+    script = f"""
+import sys, time
+sys.path.insert(0, {str(tree_dir)!r})
+import tree_api, injection_tree
+tree_api.generate_tree = lambda root, options: time.sleep(30)
+print(injection_tree.generate_tree_in_process({str(tmp_path)!r}, [], timeout=0.2))
+"""
+    started = time.monotonic()
+    done = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=20)
+    assert time.monotonic() - started < 5
+    assert done.stdout.strip() == 'None'
@@ -0,0 +1,86 @@
+"""
+Tests for relevance.py - prompt-relevance ranking for get_context_tree.py.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_prompt_keywords_drop_stopwords_and_stem():
+    """Test prompts reduce to stems of their meaningful words."""
+    from relevance import prompt_keywords, stem
+
+    assert prompt_keywords("Add password reset to the auth routes") == {"password", "reset", "auth", "rout"}
+    assert stem("migrations") == stem("migration") == "migr"
+    assert stem("users") == "user"
+    assert stem("api") == "api"
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_name_scores():
+    """Test exact, partial and related matches, and the key file bonus."""
+    from relevance import EXACT_SCORE, KEY_FILE_BONUS, PARTIAL_SCORE, RELATED_SCORE, RelevanceScorer
+
+    scorer = RelevanceScorer("add password reset to the auth routes")
+
+    assert scorer.name_score("routes") == EXACT_SCORE
+    assert scorer.name_score("resetPassword.ts") == EXACT_SCORE
+    assert scorer.name_score("authentication") == PARTIAL_SCORE
+    assert scorer.name_score("models") == RELATED_SCORE
+    assert scorer.name_score("assets") == 0.0
+    assert scorer.name_score("package.json") == KEY_FILE_BONUS
+    assert not RelevanceScorer("please add it to the project")
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_fit_store_keeps_relevant_subtrees():
+    """Test relevant entries outlive shallower irrelevant ones, and parents outlive children."""
+    from relevance import RelevanceScorer
+    from token_budget import elision_footer, fit_store
+    from tree_store import TreeStore
+
+    store = TreeStore()
+    for depth, name, is_dir in [
+        (0, "assets", True), (1, "logo.png", False), (1, "banner.png", False),
+        (0, "lib", True), (1, "api", True), (2, "auth", True), (3, "reset.py", False),
+        (0, "notes.txt", False),
+    ]:
+        store.append(depth, name, is_dir)
+
+    scorer = RelevanceScorer("password reset")
+    pruned, elided = fit_store(store, 70, 0, lambda e: elision_footer(e, 70), scorer.name_score)
+    kept = [pruned.rel_path(i) for i in range(len(pruned))]
+
+    assert kept == ["lib", "lib/api", "lib/api/auth", "lib/api/auth/reset.py"]
+    assert elided == {"assets/": 3, "": 1}
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+@pytest.mark.parametrize("strategy", ["depth", "breadth"])
+def test_focus_scans_relevant_directories_deeply(tmp_path, strategy):
+    """Test --focus descends into matching directories only."""
+    from get_context_tree import TreeGenerator
+
+    relevant = tmp_path / "src" / "api" / "routes" / "auth"
+    relevant.mkdir(parents=True)
+    (relevant / "reset.py").touch()
+    irrelevant = tmp_path / "assets" / "images" / "icons" / "small"
+    irrelevant.mkdir(parents=True)
+    (irrelevant / "icon.png").touch()
+
+    output = TreeGenerator(str(tmp_path), strategy=strategy,
+                           focus="add password reset to the auth routes").generate()
+
+    assert "reset.py" in output
+    assert "icons/" in output
+    assert "small/" not in output
+    assert "small/" in TreeGenerator(str(tmp_path), strategy=strategy).generate()
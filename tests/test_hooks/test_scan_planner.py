@@ -0,0 +1,151 @@
+"""
+Tests for scan_planner.py - adaptive scan limits for get_context_tree.py.
+"""
+import json
+import pytest
+import sys
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+
+def uniform_lister(branching, files, depth):
+    """Return a list_fn for a virtual tree with `branching` subdirectories and `files` files per directory."""
+    def list_fn(dir_path):
+        level = len(dir_path.parts) - 1
+        dirs = [f"d{i}" for i in range(branching)] if level < depth else []
+        return dirs, [f"f{i}.py" for i in range(files)]
+    return list_fn
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_sample_repo_counts_and_extrapolates():
+    """Test a fully sampled tree is counted exactly and a larger one is extrapolated."""
+    from scan_planner import sample_repo
+
+    small = sample_repo(Path("/"), uniform_lister(2, 3, 2), max_dirs=100, seconds=10)
+    assert (small.dirs, small.files, small.depth) == (7, 21, 3)
+    assert small.sampled == 7 and small.max_fanout == 5
+
+    large = sample_repo(Path("/"), uniform_lister(10, 5, 6), max_dirs=9, seconds=10)
+    assert large.sampled == 9
+    # Two levels sampled; deeper levels thin out instead of growing tenfold
+    assert large.level_dirs[:3] == [1.0, 10.0, 100.0]
+    assert large.level_dirs[3] == 500.0
+    assert large.files > 5 * 111
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_choose_plan_scales_with_tree_size_and_listing_cost():
+    """Test small trees keep every file, large ones go breadth-first, slow listings get workers."""
+    from scan_planner import AUTO_MAX_DEPTH, AUTO_MAX_FILES, AUTO_MIN_FILES, RepoEstimate, choose_plan
+
+    small = choose_plan(RepoEstimate([8, 40, 30], [1, 6, 4], 12, 0.05, 11))
+    assert (small.max_depth, small.max_files, small.strategy, small.workers) == \
+        (AUTO_MAX_DEPTH, AUTO_MIN_FILES, 'depth', 1)
+    # A tree that fits is not summarised, unless it overruns the token budget
+    assert small.collapse_threshold == 0
+    assert choose_plan(RepoEstimate([8, 40, 30], [1, 6, 4], 12, 0.05, 11),
+                       max_tokens=400).collapse_threshold == 50
+    # Files exactly filling the budget are listed whatever the directory count
+    exact = choose_plan(RepoEstimate([0, 0, 500], [1, 1, 5], 100, 0.05, 7))
+    assert exact.max_files == 500 and exact.collapse_threshold == 0
+
+    levels = [10 * 20 ** level for level in range(6)]
+    dirs = [20 ** level for level in range(6)]
+    local = choose_plan(RepoEstimate(levels, dirs, 30, 0.05, 32))
+    assert local.max_files == AUTO_MAX_FILES and local.strategy == 'breadth'
+    assert local.max_depth < AUTO_MAX_DEPTH and local.workers == 1
+    assert local.collapse_threshold == 500
+
+    network = choose_plan(RepoEstimate(levels, dirs, 30, 50.0, 32))
+    assert network.workers > 1
+    assert network.max_files < local.max_files
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_auto_limits_reported_and_remembered(tmp_path):
+    """Test --auto reports its limits, remembers them with a cache and samples again after a slow run."""
+    from get_context_tree import TreeGenerator
+    from scan_planner import plan_file
+
+    project = tmp_path / "project"
+    for package in ("api", "web"):
+        (project / package / "src").mkdir(parents=True)
+        for i in range(5):
+            (project / package / "src" / f"m{i}.py").write_text("pass\n")
+    cache_dir = str(tmp_path / "cache")
+
+    first = TreeGenerator(str(project), auto=True, cache_dir=cache_dir)
+    output = first.generate()
+    assert "Auto limits: depth 10, 200 files, depth-first (" in output
+    assert "sampled 5 directories" in output
+    assert "m4.py" in output
+    assert first.max_files == 200 and first.collapse_threshold == 0
+
+    second = TreeGenerator(str(project), auto=True, cache_dir=cache_dir, output_format='json')
+    plan = json.loads(second.generate())["plan"]
+    assert plan["remembered"] and plan["estimate"]["files"] == 10
+
+    # A run slower than the target allows is not trusted again
+    path = plan_file(cache_dir, str(project.resolve()))
+    with open(path) as f:
+        data = json.load(f)
+    data["run_ms"] = 10000
+    with open(path, "w") as f:
+        json.dump(data, f)
+    assert "sampled 5 directories" in TreeGenerator(str(project), auto=True, cache_dir=cache_dir).generate()
+
+    # Other scan settings sample again
+    assert "remembered" not in TreeGenerator(str(project), auto=True, cache_dir=cache_dir,
+                                             include_hidden=True).generate()
+    assert "Auto limits" not in TreeGenerator(str(project)).generate()
+
+    # Under the hooks' token budget, a small package of one file type stays listed
+    app = tmp_path / "small" / "app"
+    app.mkdir(parents=True)
+    for i in range(30):
+        (app / f"module{i}.py").write_text("pass\n")
+    output = TreeGenerator(str(tmp_path / "small"), auto=True, max_tokens=8000).generate()
+    assert "module29.py" in output and "(30 files" not in output
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_sampling_gives_up_on_slow_listings(tmp_path):
+    """Test a listing outlasting the sampling share stops sampling instead of blocking the scan."""
+    import time
+    from deadline import DeadlineExceeded
+    from get_context_tree import TreeGenerator
+    from scan_planner import sample_repo
+
+    def cut_at_level_two(dir_path):
+        if len(dir_path.parts) > 2:
+            raise DeadlineExceeded(dir_path)
+        return uniform_lister(3, 2, 5)(dir_path)
+
+    estimate = sample_repo(Path("/"), cut_at_level_two, seconds=10)
+    assert estimate.sampled == 4 and estimate.level_dirs[:3] == [1.0, 3.0, 9.0]
+
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text("pass\n")
+    slow = []
+
+    class SlowRoot(TreeGenerator):
+        def list_entries(self, dir_path):
+            if dir_path == self.root_path and not slow:
+                slow.append(dir_path)
+                time.sleep(0.5)
+            return super().list_entries(dir_path)
+
+    generator = SlowRoot(str(tmp_path), auto=True, target_ms=100)
+    started = time.monotonic()
+    output = generator.generate()
+    assert time.monotonic() - started < 0.4
+    assert generator.plan is None and "default limits used" in output
+    assert "app.py" in output
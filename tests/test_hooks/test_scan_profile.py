@@ -0,0 +1,77 @@
+"""
+Tests for scan_profile.py - the --profile mode of get_context_tree.py.
+"""
+import json
+import pytest
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_phases_are_exclusive():
+    """Test nested phases are not counted in their parent, and None phases not at all."""
+    from scan_profile import ScanProfiler
+
+    profiler = ScanProfiler()
+    with profiler.phase('scan'):
+        with profiler.phase(None):
+            with profiler.phase('listing'):
+                time.sleep(0.02)
+            time.sleep(0.02)
+
+    assert profiler.phases['listing'] >= 0.02
+    assert profiler.phases['scan'] < 0.01
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_profile_report(tmp_path):
+    """Test phases, directories, syscalls and per-rule exclusion hits."""
+    from scan_profile import PHASES, ProfilingTreeGenerator
+
+    (tmp_path / ".gitignore").write_text("*.tmp\n")
+    (tmp_path / "src").mkdir()
+    for name in ("a.py", "a.pyc", "b.pyc", "c.tmp"):
+        (tmp_path / "src" / name).touch()
+    (tmp_path / "node_modules").mkdir()
+
+    generator = ProfilingTreeGenerator(str(tmp_path))
+    output = generator.generate()
+    report = generator.profile_report()
+
+    assert "a.py" in output
+    assert set(report['phases_ms']) == set(PHASES) | {'other'}
+    assert all(ms >= 0 for ms in report['phases_ms'].values())
+    assert report['directories_listed'] == 2
+    assert {d['path'] for d in report['slowest_directories']} == {'.', 'src'}
+    assert report['syscalls']['scandir'] == 2
+    assert report['exclusion_hits'] == {'exclude: *.pyc': 2, '.gitignore:1: *.tmp': 1,
+                                        'exclude: node_modules/': 1}
+    assert report['stats']['files'] == 1
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_profile_out_cli(tmp_path):
+    """Test --profile-out writes the report and leaves the tree on stdout."""
+    (tmp_path / "main.py").touch()
+    profile = tmp_path / "profile.json"
+
+    result = subprocess.run(
+        [sys.executable, str(tree_dir / "get_context_tree.py"), str(tmp_path),
+         "--profile-out", str(profile)],
+        capture_output=True, text=True, timeout=30
+    )
+
+    assert result.returncode == 0
+    assert "main.py" in result.stdout and result.stderr == ""
+    report = json.loads(profile.read_text())
+    assert report['root'] == str(tmp_path.resolve())
+    assert report['stats']['files'] == 1
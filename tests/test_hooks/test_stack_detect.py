@@ -0,0 +1,142 @@
+"""
+Tests for stack_detect.py - technology-stack detection for get_context_tree.py.
+"""
+import json
+import pytest
+import sys
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_manifest_parsers_collect_dependency_names():
+    """Test each manifest format yields its dependency names."""
+    from stack_detect import (parse_cargo_toml, parse_go_mod, parse_package_json,
+                              parse_pyproject, parse_requirements)
+
+    assert set(parse_package_json(json.dumps({
+        "dependencies": {"react": "^18.0.0"},
+        "devDependencies": {"jest": "^29.0.0", "typescript": "^5.0.0"},
+    }))) == {"react", "jest", "typescript"}
+
+    assert parse_requirements(
+        "# web\nDjango>=4.2\n-r base.txt\npytest==8.0 ; python_version > '3.8'\n"
+    ) == ["Django", "pytest"]
+
+    assert parse_pyproject(
+        '[project]\nname = "app"\ndependencies = [\n  "fastapi>=0.100",\n  "uvicorn[standard]",\n]\n'
+        '[project.optional-dependencies]\ntest = ["pytest-cov"]\n'
+        '[tool.poetry.dependencies]\npython = "^3.10"\nflask = "^3"\n'
+        '[tool.pytest.ini_options]\naddopts = "-q"\n'
+    ) == ["fastapi", "uvicorn", "pytest-cov", "flask", "pytest"]
+
+    assert parse_go_mod(
+        "module example.com/app\n\ngo 1.22\n\nrequire github.com/gorilla/mux v1.8.0\n"
+        "require (\n\tgithub.com/gin-gonic/gin v1.9.1 // indirect\n)\n"
+    ) == ["github.com/gorilla/mux", "github.com/gin-gonic/gin"]
+
+    assert parse_cargo_toml(
+        '[package]\nname = "app"\n[dependencies]\naxum = "0.7"\ntokio = { version = "1" }\n'
+        '[dependencies.serde]\nversion = "1"\n[dev-dependencies]\ninsta = "1"\n'
+    ) == ["axum", "tokio", "serde", "insta"]
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_header_merges_manifests(tmp_path):
+    """Test the header names languages, frameworks and test runners once each."""
+    from stack_detect import StackDetector
+
+    (tmp_path / "package.json").write_text(json.dumps({
+        "dependencies": {"next": "14"},
+        "devDependencies": {"typescript": "5", "vitest": "1"},
+    }))
+    (tmp_path / "api").mkdir()
+    (tmp_path / "api" / "requirements.txt").write_text("fastapi\npytest\n")
+    (tmp_path / "web").mkdir()
+    (tmp_path / "web" / "package.json").write_text(json.dumps({"dependencies": {"react": "18"}}))
+
+    detector = StackDetector(str(tmp_path))
+    detector.observe("", ["README.md", "package.json"])
+    detector.observe("api", ["main.py", "requirements.txt"])
+    detector.observe("web", ["package.json"])
+
+    assert detector.header() == (
+        "[STACK] languages: TypeScript, Python | frameworks: Next.js, FastAPI, React"
+        " | tests: Vitest, pytest | manifests: package.json, api/requirements.txt, web/package.json"
+    )
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_no_manifests_no_header(tmp_path):
+    """Test a project without manifests gets no header."""
+    from stack_detect import StackDetector
+
+    detector = StackDetector(str(tmp_path))
+    detector.observe("", ["main.c", "Makefile"])
+
+    assert detector.summary() is None
+    assert detector.header() is None
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_parse_cache_keyed_by_mtime_and_size(tmp_path):
+    """Test unchanged manifests are not parsed again and changed ones are."""
+    from stack_detect import StackDetector
+
+    project = tmp_path / "project"
+    project.mkdir()
+    manifest = project / "go.mod"
+    manifest.write_text("module app\nrequire github.com/gin-gonic/gin v1.9.1\n")
+    cache_dir = str(tmp_path / "cache")
+
+    def run():
+        detector = StackDetector(str(project), cache_dir)
+        detector.load()
+        detector.observe("", ["go.mod", "main.go"])
+        detector.save()
+        return detector
+
+    first = run()
+    assert first.parsed == 1
+
+    second = run()
+    assert second.parsed == 0
+    assert second.header() == first.header()
+
+    manifest.write_text("module app\nrequire github.com/labstack/echo/v4 v4.11.0\n")
+    third = run()
+    assert third.parsed == 1
+    assert "frameworks: Echo" in third.header()
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+@pytest.mark.parametrize("strategy", ["depth", "breadth"])
+def test_generator_emits_stack_header(tmp_path, strategy):
+    """Test --stack puts the [STACK] line above the tree and at the end of a stream."""
+    import io
+    from get_context_tree import TreeGenerator
+
+    (tmp_path / "pyproject.toml").write_text('[project]\ndependencies = ["django"]\n')
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "views.py").write_text("")
+
+    generator = TreeGenerator(str(tmp_path), strategy=strategy, detect_stack=True)
+    result = generator.generate()
+
+    first_line = result.split("\n", 1)[0]
+    assert first_line == "[STACK] languages: Python | frameworks: Django | manifests: pyproject.toml"
+    assert "|-- app/" in result
+
+    out = io.StringIO()
+    TreeGenerator(str(tmp_path), strategy=strategy, detect_stack=True).stream(out)
+    assert out.getvalue().rstrip("\n").endswith(first_line)
+
+    assert "[STACK]" not in TreeGenerator(str(tmp_path), strategy=strategy).generate()
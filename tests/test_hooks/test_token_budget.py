@@ -0,0 +1,91 @@
+"""
+Tests for token_budget.py - token-budgeted tree output for get_context_tree.py.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+
+def build_store(entries):
+    from tree_store import TreeStore
+
+    store = TreeStore()
+    for depth, name, is_dir in entries:
+        store.append(depth, name, is_dir)
+    return store
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_estimate_tokens_counts_prefixes_and_names():
+    """Test the estimator splits words, digits and punctuation like a BPE tokenizer."""
+    from token_budget import estimate_tokens
+
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("|   ") == 2
+    assert estimate_tokens("index.ts") == 3
+    assert estimate_tokens("migration_20240101.sql") == 8
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_fit_store_prunes_deepest_level_first():
+    """Test pruning removes deep plain files before directories and key files."""
+    from token_budget import elision_footer, fit_store
+
+    store = build_store([
+        (0, "src", True),
+        (1, "api", True),
+        (2, "routes.py", False),
+        (2, "models.py", False),
+        (1, "__init__.py", False),
+        (1, "utils.py", False),
+        (0, "docs", True),
+        (1, "guide.md", False),
+        (0, "setup.py", False),
+    ])
+
+    def footer_for(elided):
+        return elision_footer(elided, 70)
+
+    unpruned, elided = fit_store(store, 1000, 0, footer_for)
+    assert unpruned is store and elided == {}
+
+    pruned, elided = fit_store(store, 70, 0, footer_for)
+    kept = [pruned.rel_path(i) for i in range(len(pruned))]
+    assert kept == ["src", "src/api", "src/__init__.py", "docs", "setup.py"]
+    assert elided == {"src/": 3, "docs/": 1}
+    assert footer_for(elided) == "\nElided to fit 70 tokens: src/ 3, docs/ 1"
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_generate_fits_token_budget(tmp_path):
+    """Test --max-tokens output fits its budget and ends on whole lines with a footer."""
+    from get_context_tree import TreeGenerator
+    from token_budget import estimate_tokens
+
+    for d in range(4):
+        deep = tmp_path / f"pkg_{d}" / "src" / "deep"
+        deep.mkdir(parents=True)
+        for f in range(20):
+            (tmp_path / f"pkg_{d}" / "src" / f"module_{f:02d}.py").touch()
+            (deep / f"leaf_{f:02d}.py").touch()
+
+    generator = TreeGenerator(str(tmp_path), max_tokens=300)
+    output = generator.generate()
+
+    assert estimate_tokens(output) <= 300
+    assert "leaf_00.py" not in output
+    assert "pkg_3/" in output
+    assert sum(generator.elided.values()) > 0
+    assert output.splitlines()[-1].startswith("Elided to fit 300 tokens: pkg_")
+    assert "[TRUNCATED" not in output
+
+    generator = TreeGenerator(str(tmp_path), max_tokens=100000)
+    assert "leaf_19.py" in generator.generate()
+    assert generator.elided == {}
@@ -0,0 +1,144 @@
+"""
+Tests for tree_api.py - in-process tree generation for the injection hooks.
+"""
+import os
+import pytest
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+
+def age(*paths, seconds=60):
+    """Move mtimes out of the racy window, so results can be memoized."""
+    past = time.time() - seconds
+    for path in paths:
+        os.utime(path, (past, past))
+
+
+def make_project(root):
+    (root / "src").mkdir(parents=True)
+    (root / "src" / "app.py").write_text("pass\n")
+    (root / "README.md").write_text("# Demo\n")
+    age(root / "src", root)
+    return root
+
+
+@pytest.fixture(autouse=True)
+def empty_memo():
+    import tree_api
+    tree_api.clear_memo()
+    yield
+    tree_api.clear_memo()
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_generate_tree_matches_cli(tmp_path):
+    """Test the in-process result is the tree the CLI prints."""
+    from tree_api import generate_tree
+
+    project = make_project(tmp_path / "project")
+    options = ['--max-files', '50', '--stack']
+    result = generate_tree(str(project), options)
+    cli = subprocess.run([sys.executable, str(tree_dir / 'get_context_tree.py'), str(project)] + options,
+                         capture_output=True, text=True, check=True)
+    assert result.ok and not result.memoized
+    assert result.output == cli.stdout.rstrip('\n')
+    assert result.stats['files'] == 2
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_memo_reused_until_listing_or_ignore_changes(tmp_path):
+    """Test a repeated call is memoized and new entries or .gitignore edits rescan."""
+    from tree_api import generate_tree
+
+    project = make_project(tmp_path / "project")
+    first = generate_tree(str(project), ['--cache-dir', str(tmp_path / "cache")])
+    second = generate_tree(str(project), ['--cache-dir', str(tmp_path / "cache")])
+    assert second.memoized and second.output == first.output
+    # Other options are another key
+    assert not generate_tree(str(project), ['--max-files', '1']).memoized
+
+    (project / "src" / "models.py").write_text("pass\n")
+    age(project / "src")
+    third = generate_tree(str(project), ['--cache-dir', str(tmp_path / "cache")])
+    assert not third.memoized and "models.py" in third.output
+
+    (project / ".gitignore").write_text("")
+    age(project / ".gitignore", project)
+    generate_tree(str(project))
+    (project / ".gitignore").write_text("*.md\n")
+    age(project / ".gitignore", seconds=30)
+    fourth = generate_tree(str(project))
+    assert not fourth.memoized and "README.md" not in fourth.output
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_not_memoized_when_racy_or_tied_to_a_snapshot(tmp_path):
+    """Test fresh directories, snapshots and invalid options are never memoized."""
+    from tree_api import generate_tree
+
+    fresh = tmp_path / "fresh"
+    (fresh / "src").mkdir(parents=True)
+    generate_tree(str(fresh))
+    assert not generate_tree(str(fresh)).memoized
+
+    project = make_project(tmp_path / "project")
+    snapshot = ['--snapshot', str(tmp_path / "tree.snap.gz")]
+    generate_tree(str(project), snapshot)
+    assert not generate_tree(str(project), snapshot).memoized
+    assert not generate_tree(str(project), ['--max-files', '5'], memo=False).memoized
+
+    with pytest.raises(ValueError):
+        generate_tree(str(project), ['--no-such-option'])
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_stuck_listing_does_not_delay_exit(tmp_path):
+    """Test a listing abandoned at the deadline neither blocks generate_tree() nor interpreter exit."""
+    project = make_project(tmp_path / "project")
+    (project / "stuck").mkdir()
+    script = f"""
+import os, sys, time
+sys.path.insert(0, {str(tree_dir)!r})
+real_scandir = os.scandir
+def scandir(path='.'):
+    if str(path).endswith('stuck'):
+        time.sleep(8)
+    return real_scandir(path)
+os.scandir = scandir
+import tree_api
+result = tree_api.generate_tree({str(project)!r}, ['--workers', '2', '--timeout', '1'])
+print(result.listing_abandoned, result.stats['partial'])
+"""
+    started = time.monotonic()
+    done = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=20)
+    assert time.monotonic() - started < 5
+    assert done.stdout.split() == ['True', 'True']
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_memo_notices_manifest_edits(tmp_path):
+    """Test an in-place manifest edit, which leaves directory mtimes alone, refreshes [STACK]."""
+    from tree_api import generate_tree
+
+    project = make_project(tmp_path / "project")
+    manifest = project / "requirements.txt"
+    manifest.write_text("flask\n")
+    age(manifest, project)
+    first = generate_tree(str(project), ['--stack'])
+    assert "Flask" in first.output and generate_tree(str(project), ['--stack']).memoized
+
+    manifest.write_text("django\n")
+    age(manifest, seconds=30)
+    second = generate_tree(str(project), ['--stack'])
+    assert not second.memoized and "Django" in second.output
@@ -0,0 +1,90 @@
+"""
+Tests for tree_cache.py - persistent directory listing cache for get_context_tree.py.
+"""
+import pytest
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+
+def backdate(root: Path, seconds: int = 60):
+    """Push directory mtimes outside the racy window so listings get cached."""
+    past = time.time() - seconds
+    for dirpath, _, _ in os.walk(str(root)):
+        os.utime(dirpath, (past, past))
+
+
+@pytest.fixture
+def cached_project(tmp_path):
+    """Small project plus a separate cache directory."""
+    project = tmp_path / "project"
+    (project / "src" / "api").mkdir(parents=True)
+    (project / "src" / "api" / "routes.py").touch()
+    (project / "README.md").touch()
+    backdate(project)
+    return project, tmp_path / "cache"
+
+
+def generate(project: Path, cache_dir: Path):
+    from get_context_tree import TreeGenerator
+
+    generator = TreeGenerator(str(project), cache_dir=str(cache_dir))
+    return generator, generator.generate()
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_warm_scan_reuses_listings(cached_project, monkeypatch):
+    """Test an unchanged project is served from the cache without scandir."""
+    import get_context_tree
+
+    project, cache_dir = cached_project
+    _, cold = generate(project, cache_dir)
+
+    def fail_scandir(path):
+        raise AssertionError(f"unexpected scandir({path})")
+
+    monkeypatch.setattr(get_context_tree.os, "scandir", fail_scandir)
+    generator, warm = generate(project, cache_dir)
+
+    assert warm == cold
+    assert generator.cache.misses == 0
+    assert generator.cache.hits == 3
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_changed_directory_is_relisted(cached_project):
+    """Test only the directory whose mtime changed is listed again."""
+    project, cache_dir = cached_project
+    generate(project, cache_dir)
+
+    (project / "src" / "api" / "auth.py").touch()
+    past = time.time() - 30
+    os.utime(str(project / "src" / "api"), (past, past))
+
+    generator, output = generate(project, cache_dir)
+
+    assert "auth.py" in output
+    assert generator.cache.misses == 1
+    assert generator.cache.hits == 2
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_gitignore_change_invalidates_cache(cached_project):
+    """Test editing .gitignore discards every cached listing."""
+    project, cache_dir = cached_project
+    generate(project, cache_dir)
+
+    (project / ".gitignore").write_text("README.md\n")
+
+    generator, output = generate(project, cache_dir)
+
+    assert "README.md" not in output
+    assert generator.cache.hits == 0
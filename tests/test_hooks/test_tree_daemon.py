@@ -0,0 +1,159 @@
+"""
+Tests for tree_daemon.py - resident inotify-backed tree server for get_context_tree.py.
+"""
+import pytest
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'),
+                                reason="tree daemon needs Linux inotify")
+
+TREE_ARGS = ['--max-files', '100']
+
+
+@pytest.fixture
+def project(tmp_path):
+    """Small project plus a separate daemon directory."""
+    root = tmp_path / "project"
+    (root / "src").mkdir(parents=True)
+    (root / "src" / "main.py").touch()
+    (root / "README.md").touch()
+    return root, str(tmp_path / "d")
+
+
+def start_daemon(root, daemon_dir, idle_timeout=30.0):
+    """Run a daemon on a thread and wait until it answers."""
+    from tree_daemon import TreeDaemon, query_daemon
+
+    daemon = TreeDaemon(str(root), daemon_dir, idle_timeout)
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault('code', daemon.serve()))
+    thread.start()
+    for _ in range(100):
+        if query_daemon(str(root), TREE_ARGS, daemon_dir) is not None:
+            break
+        time.sleep(0.02)
+    return daemon, thread, result
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_query_without_daemon_returns_none(project):
+    """Test callers fall back to a direct scan when no daemon runs."""
+    from tree_daemon import query_daemon
+
+    root, daemon_dir = project
+    assert query_daemon(str(root), TREE_ARGS, daemon_dir) is None
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_daemon_serves_tree_and_follows_changes(project):
+    """Test the daemon answers like a direct scan and picks up new entries."""
+    from get_context_tree import TreeGenerator
+    from tree_daemon import query_daemon, stop_daemon
+
+    root, daemon_dir = project
+    daemon, thread, result = start_daemon(root, daemon_dir)
+    try:
+        assert query_daemon(str(root), TREE_ARGS, daemon_dir) == \
+            TreeGenerator(str(root), max_files=100).generate()
+
+        (root / "src" / "routes.py").touch()
+        (root / "docs").mkdir()
+        assert wait_for(lambda: "routes.py" in query_daemon(str(root), TREE_ARGS, daemon_dir))
+        assert "docs/" in query_daemon(str(root), TREE_ARGS, daemon_dir)
+
+        (root / "docs" / "guide.md").touch()
+        assert wait_for(lambda: "guide.md" in query_daemon(str(root), TREE_ARGS, daemon_dir))
+
+        timings = []
+        for _ in range(20):
+            start = time.perf_counter()
+            query_daemon(str(root), TREE_ARGS, daemon_dir)
+            timings.append(time.perf_counter() - start)
+        assert sorted(timings)[10] < 0.005
+    finally:
+        stop_daemon(str(root), daemon_dir)
+        thread.join(5)
+
+    assert result['code'] == 0
+    assert not Path(daemon.socket_path).exists()
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_daemon_exits_when_idle(project):
+    """Test the daemon shuts down and removes its socket after the idle timeout."""
+    root, daemon_dir = project
+    daemon, thread, result = start_daemon(root, daemon_dir, idle_timeout=0.5)
+
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert result['code'] == 0
+    assert not Path(daemon.socket_path).exists()
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_second_daemon_for_same_root_refuses(project):
+    """Test the lock file keeps a second daemon from taking over the socket."""
+    from tree_daemon import TreeDaemon, stop_daemon
+
+    root, daemon_dir = project
+    daemon, thread, result = start_daemon(root, daemon_dir)
+    try:
+        assert TreeDaemon(str(root), daemon_dir).serve() == 1
+    finally:
+        stop_daemon(str(root), daemon_dir)
+        thread.join(5)
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_focused_queries_reuse_watched_listings(project, monkeypatch):
+    """Test per-request (--focus) trees list only changed directories from disk."""
+    import os
+    from get_context_tree import TreeGenerator
+    from tree_daemon import query_daemon, stop_daemon
+
+    root, daemon_dir = project
+    past = time.time() - 60
+    for path in (root / "src", root):
+        os.utime(path, (past, past))
+    listed = []
+    real_read = TreeGenerator.read_directory
+    monkeypatch.setattr(TreeGenerator, "read_directory",
+                        lambda self, dir_path: listed.append(str(dir_path)) or real_read(self, dir_path))
+    focused = TREE_ARGS + ['--focus=add a route to main']
+
+    daemon, thread, result = start_daemon(root, daemon_dir)
+    try:
+        first = query_daemon(str(root), focused, daemon_dir)
+        assert "main.py" in first
+        listed.clear()
+        assert query_daemon(str(root), focused, daemon_dir) == first
+        assert listed == []
+
+        (root / "src" / "routes.py").touch()
+        assert wait_for(lambda: "routes.py" in query_daemon(str(root), focused, daemon_dir))
+        assert str(root / "src") in listed and str(root) not in listed
+    finally:
+        stop_daemon(str(root), daemon_dir)
+        thread.join(5)
@@ -0,0 +1,59 @@
+"""
+Tests for tree_fingerprint.py - skipping re-injection of an unchanged tree.
+"""
+import json
+import pytest
+import sys
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_fingerprint_tracks_content():
+    """Test fingerprints change with the tree but not with trailing whitespace."""
+    from tree_fingerprint import FINGERPRINT_LENGTH, fingerprint
+
+    tree = "app/\n|-- src/\n+-- README.md\n"
+
+    assert fingerprint(tree) == fingerprint(tree.replace("\n", "  \n") + "\n")
+    assert fingerprint(tree) != fingerprint(tree.replace("README", "CHANGES"))
+    assert len(fingerprint(tree)) == FINGERPRINT_LENGTH
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_injections_are_scoped_to_session_and_cwd(tmp_path):
+    """Test a recorded fingerprint is only seen by the same session and directory."""
+    from tree_fingerprint import last_injected, record_injection
+
+    path = str(tmp_path / "fingerprints.json")
+    assert last_injected("s1", "/repo", path) is None
+
+    record_injection("s1", "/repo", "abc123", path)
+
+    assert last_injected("s1", "/repo", path) == "abc123"
+    assert last_injected("s2", "/repo", path) is None
+    assert last_injected("s1", "/other", path) is None
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_stale_and_corrupt_entries_are_dropped(tmp_path):
+    """Test writing prunes expired sessions and survives a corrupt file."""
+    from tree_fingerprint import MAX_AGE_SECONDS, injection_key, last_injected, record_injection
+
+    path = tmp_path / "fingerprints.json"
+    path.write_text("not json")
+    assert last_injected("s1", "/repo", str(path)) is None
+
+    path.write_text(json.dumps({injection_key("old", "/repo"): ["fff", 0], "bad": "x"}))
+    record_injection("s1", "/repo", "abc123", str(path))
+
+    data = json.loads(path.read_text())
+    assert list(data) == [injection_key("s1", "/repo")]
+    assert data[injection_key("s1", "/repo")][0] == "abc123"
+    assert MAX_AGE_SECONDS > 0
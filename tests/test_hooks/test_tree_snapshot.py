@@ -0,0 +1,190 @@
+"""
+Tests for tree_snapshot.py - snapshots and diffs for get_context_tree.py.
+"""
+import gzip
+import pytest
+import sys
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_snapshot_round_trip_is_front_coded(tmp_path):
+    """Test snapshots store sorted, prefix-compressed paths and read back unchanged."""
+    from tree_snapshot import Snapshot
+
+    listings = {
+        "": (["src"], ["README.md"]),
+        "src": (["components"], ["app.py", "apple.py"]),
+        "src/components": ([], ["Button.tsx"]),
+    }
+    path = str(tmp_path / "tree.snap.gz")
+    Snapshot("/repo", "settings", listings).write(path)
+
+    with gzip.open(path, "rt") as f:
+        records = f.read().splitlines()[1:]
+    assert records == ["0+", "0:README.md", "0+src", "3:/app.py", "7:le.py",
+                       "4+components", "14:/Button.tsx"]
+
+    snapshot = Snapshot.read(path)
+    assert (snapshot.root, snapshot.settings) == ("/repo", "settings")
+    assert {k: (sorted(d), sorted(f)) for k, (d, f) in snapshot.listings.items()} == listings
+
+    (tmp_path / "bad.snap.gz").write_bytes(b"not gzip")
+    assert Snapshot.read(str(tmp_path / "bad.snap.gz")) is None
+    assert Snapshot.read(str(tmp_path / "missing.snap.gz")) is None
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_diff_reports_additions_removals_and_renames():
+    """Test added subtrees, removed directories, moves and renames."""
+    from tree_snapshot import Snapshot, diff_snapshots, format_diff
+
+    old = Snapshot("/repo", "", {
+        "": (["lib", "old", "src"], ["README.md"]),
+        "lib": ([], ["util.js"]),
+        "old": ([], ["x.py", "y.py"]),
+        "src": ([], ["a.py", "b.py"]),
+        "gone": ([], ["z.py"]),
+    })
+    new = Snapshot("/repo", "", {
+        "": (["legacy", "lib", "src"], []),
+        "legacy": ([], ["x.py", "y.py"]),
+        "lib": ([], []),
+        "src": (["auth"], ["a.py", "c.py", "util.js"]),
+        "src/auth": ([], ["reset.py"]),
+    })
+
+    diff = diff_snapshots(old, new)
+
+    assert diff.added == ["src/auth/", "src/auth/reset.py"]
+    assert diff.removed == [("README.md", 0)]
+    assert diff.renamed == [("lib/util.js", "src/util.js"), ("old/", "legacy/"), ("src/b.py", "src/c.py")]
+    assert diff.compared == 3
+    assert format_diff(diff).splitlines()[:2] == [
+        "[DIFF] 2 added, 1 removed, 3 renamed since the snapshot (3 directories compared)",
+        "+ src/auth/",
+    ]
+    assert format_diff(diff_snapshots(new, new)).startswith("[DIFF] No changes")
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_unlisted_directories_are_carried_over():
+    """Test listings not read again survive while their directory exists."""
+    from tree_snapshot import Snapshot, carry_over
+
+    previous = Snapshot("/repo", "", {
+        "": (["a", "b"], []),
+        "a": (["deep"], []),
+        "a/deep": ([], ["f.py"]),
+        "b": ([], ["g.py"]),
+    })
+
+    merged = carry_over(previous, {"": (["a"], [])})
+
+    assert sorted(merged) == ["", "a", "a/deep"]
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_generator_diff_since_snapshot(tmp_path):
+    """Test --snapshot then --diff-since prints only the changes."""
+    from get_context_tree import TreeGenerator
+
+    project = tmp_path / "project"
+    (project / "src").mkdir(parents=True)
+    (project / "src" / "app.py").touch()
+    snapshot = str(tmp_path / "tree.snap.gz")
+
+    full = TreeGenerator(str(project), snapshot_path=snapshot).generate()
+    assert "app.py" in full
+
+    (project / "src" / "models.py").touch()
+    diff = TreeGenerator(str(project), diff_since=snapshot, snapshot_path=snapshot).generate()
+    assert diff == "[DIFF] 1 added, 0 removed, 0 renamed since the snapshot (2 directories compared)\n+ src/models.py"
+
+    unchanged = TreeGenerator(str(project), diff_since=snapshot).generate()
+    assert unchanged.startswith("[DIFF] No changes")
+
+    other_settings = TreeGenerator(str(project), diff_since=snapshot, include_hidden=True).generate()
+    assert "models.py" in other_settings and not other_settings.startswith("[DIFF]")
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_directories_listed_for_the_first_time():
+    """Test entries of a directory the baseline only named are reported, unlike added ones."""
+    from tree_snapshot import Snapshot, diff_snapshots, format_diff
+
+    old = Snapshot("/repo", "", {"": (["billing"], []), "billing": (["invoices"], [])})
+    new = Snapshot("/repo", "", {
+        "": (["billing", "new"], []),
+        "billing": (["invoices"], []),
+        "billing/invoices": (["pdf"], ["render.py"]),
+        "billing/invoices/pdf": ([], ["layout.py"]),
+        "new": ([], ["a.py"]),
+    })
+
+    diff = diff_snapshots(old, new)
+
+    assert diff.added == ["new/", "new/a.py"]
+    assert diff.listed == ["billing/invoices/pdf/", "billing/invoices/pdf/layout.py",
+                           "billing/invoices/render.py"]
+    assert format_diff(diff).splitlines()[0] == (
+        "[DIFF] 2 added, 0 removed, 0 renamed since the snapshot, "
+        "3 existing entries listed for the first time (2 directories compared)")
+    assert "* billing/invoices/render.py" in format_diff(diff)
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_diff_lists_areas_a_focused_tree_cut_short(tmp_path):
+    """Test a prompt about an area the first, focused tree kept shallow gets its entries."""
+    from get_context_tree import TreeGenerator
+
+    project = tmp_path / "project"
+    for area, name in (("auth", "login.py"), ("billing", "invoice.py")):
+        deep = project / area / "core" / "services" / "impl"
+        deep.mkdir(parents=True)
+        (deep / name).touch()
+    snapshot = str(tmp_path / "tree.snap.gz")
+
+    def tree(focus, diff=True):
+        return TreeGenerator(str(project), focus=focus, snapshot_path=snapshot,
+                             diff_since=snapshot if diff else None).generate()
+
+    first = tree("add password reset to auth", diff=False)
+    assert "login.py" in first and "invoice.py" not in first
+
+    assert tree("add two-factor auth").startswith("[DIFF] No changes")
+    billing = tree("add refunds to billing")
+    assert billing.splitlines() == [
+        "[DIFF] 0 added, 0 removed, 0 renamed since the snapshot, "
+        "2 existing entries listed for the first time (7 directories compared)",
+        "* billing/core/services/impl/",
+        "* billing/core/services/impl/invoice.py",
+    ]
+    assert tree("add refunds to billing").startswith("[DIFF] No changes")
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_stack_line_is_kept_and_diffed(tmp_path):
+    """Test the [STACK] line survives a round trip and a change to it is a diff."""
+    from tree_snapshot import Snapshot, diff_snapshots, format_diff
+
+    listings = {"": ([], ["requirements.txt"])}
+    path = str(tmp_path / "tree.snap.gz")
+    Snapshot("/repo", "", listings, "[STACK] frameworks: Flask").write(path)
+    old = Snapshot.read(path)
+    assert old.stack == "[STACK] frameworks: Flask"
+
+    assert not diff_snapshots(old, Snapshot("/repo", "", listings, "[STACK] frameworks: Flask"))
+    assert format_diff(diff_snapshots(old, Snapshot("/repo", "", listings, "[STACK] frameworks: Django"))) == (
+        "[DIFF] Stack changed since the snapshot (1 directories compared)\n[STACK] frameworks: Django")
@@ -0,0 +1,73 @@
+"""
+Tests for tree_store.py - compact array-backed tree entries for get_context_tree.py.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+
+def build_store(entries):
+    from tree_store import TreeStore
+
+    store = TreeStore()
+    for depth, name, is_dir in entries:
+        store.append(depth, name, is_dir)
+    return store
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_store_tracks_parents_and_interns_names():
+    """Test parents come from depth-first order and repeated names are stored once."""
+    store = build_store([
+        (0, "src", True),
+        (1, "api", True),
+        (2, "index.ts", False),
+        (1, "index.ts", False),
+        (0, "README.md", False),
+    ])
+
+    assert len(store) == 5
+    assert [store.rel_path(i) for i in range(5)] == [
+        "src", "src/api", "src/api/index.ts", "src/index.ts", "README.md"
+    ]
+    assert list(store.parents) == [-1, 0, 1, 0, -1]
+    assert store.names.count("index.ts") == 1
+    assert store.is_dir(1) and not store.is_dir(2)
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_store_entries_flag_last_siblings():
+    """Test entries() yields exact last-sibling flags."""
+    store = build_store([(0, "a", True), (1, "x", False), (1, "y", False), (0, "b", False)])
+
+    assert [(name, is_last) for _, name, _, _, is_last in store.entries()] == [
+        ("a", False), ("x", False), ("y", True), ("b", True)
+    ]
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_format_store_matches_tuple_formatter(tmp_path):
+    """Test the store-backed formatter draws the same tree as the tuple-based one."""
+    from get_context_tree import TreeGenerator
+
+    (tmp_path / "src" / "api").mkdir(parents=True)
+    (tmp_path / "src" / "api" / "routes.py").touch()
+    (tmp_path / "src" / "main.py").touch()
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "README.md").touch()
+
+    tree = TreeGenerator(str(tmp_path)).scan_directory(tmp_path)
+    generator = TreeGenerator(str(tmp_path))
+    store = generator.scan_store()
+
+    assert generator.format_store(store) == generator.format_tree_ascii(tree)
+    assert [store.rel_path(i) for i in range(len(store))] == [
+        path.relative_to(tmp_path).as_posix() for _, _, _, path in tree
+    ]
@@ -0,0 +1,192 @@
+"""
+Tests for workspace.py - monorepo workspace detection for get_context_tree.py.
+"""
+import json
+import pytest
+import sys
+from pathlib import Path
+
+# Add tree hooks to path for imports
+tree_dir = Path(__file__).parent.parent.parent / 'hooks' / 'tree'
+sys.path.insert(0, str(tree_dir))
+
+EXCLUDED = {'node_modules', 'target'}
+
+
+def make_package(path, manifest, text):
+    path.mkdir(parents=True, exist_ok=True)
+    (path / manifest).write_text(text)
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_pnpm_workspace_members_and_metadata(tmp_path):
+    """Test pnpm globs, negation and member metadata."""
+    from workspace import detect_workspace
+
+    (tmp_path / "pnpm-workspace.yaml").write_text(
+        "packages:\n  - 'packages/*'\n  - \"apps/web\"\n  - '!packages/legacy'\ncatalog:\n  react: 18\n"
+    )
+    make_package(tmp_path / "packages" / "ui", "package.json",
+                 json.dumps({"name": "@acme/ui", "version": "2.1.0", "dependencies": {"react": "18"}}))
+    make_package(tmp_path / "packages" / "legacy", "package.json", "{}")
+    (tmp_path / "packages" / "notes").mkdir()
+    make_package(tmp_path / "apps" / "web", "package.json", json.dumps({"name": "web"}))
+    make_package(tmp_path / "packages" / "ui" / "node_modules" / "dep", "package.json", "{}")
+
+    workspace = detect_workspace(str(tmp_path), EXCLUDED)
+
+    assert workspace.kind == "pnpm"
+    assert [m["path"] for m in workspace.members] == ["apps/web", "packages/ui"]
+    ui = workspace.members[1]
+    assert (ui["name"], ui["version"], ui["manifest"]) == ("@acme/ui", "2.1.0", "package.json")
+    assert ui["frameworks"] == ["React"]
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+@pytest.mark.parametrize("files,kind", [
+    ({"package.json": json.dumps({"workspaces": {"packages": ["libs/*"]}})}, "npm"),
+    ({"Cargo.toml": '[workspace]\nmembers = [\n  "libs/*",\n]\nexclude = ["libs/b"]\n'}, "cargo"),
+    ({"go.work": "go 1.22\n\nuse (\n\t./libs/a\n\t./libs/b\n)\n"}, "go"),
+    ({"pyproject.toml": '[tool.uv.workspace]\nmembers = ["libs/*"]\n'}, "uv"),
+    ({}, "python"),
+])
+def test_workspace_declarations(tmp_path, files, kind):
+    """Test each declaration format finds its members."""
+    from workspace import detect_workspace
+
+    for name, text in files.items():
+        (tmp_path / name).write_text(text)
+    manifest = {"npm": "package.json", "cargo": "Cargo.toml", "go": "go.mod"}.get(kind, "pyproject.toml")
+    for member in ("a", "b"):
+        make_package(tmp_path / "libs" / member, manifest, "")
+
+    workspace = detect_workspace(str(tmp_path), EXCLUDED)
+
+    assert workspace.kind == kind
+    expected = ["libs/a"] if kind == "cargo" else ["libs/a", "libs/b"]
+    assert [m["path"] for m in workspace.members] == expected
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_no_workspace(tmp_path):
+    """Test a single-package project is not a workspace."""
+    from workspace import detect_workspace
+
+    (tmp_path / "package.json").write_text(json.dumps({"name": "app"}))
+    make_package(tmp_path / "tools", "pyproject.toml", "")
+
+    assert detect_workspace(str(tmp_path), EXCLUDED) is None
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_member_metadata_is_cached(tmp_path, monkeypatch):
+    """Test unchanged member manifests are not parsed on the next run."""
+    import workspace
+
+    project = tmp_path / "project"
+    (project / "crates").mkdir(parents=True)
+    (project / "Cargo.toml").write_text('[workspace]\nmembers = ["crates/*"]\n')
+    make_package(project / "crates" / "core", "Cargo.toml",
+                 '[package]\nname = "core"\nversion = "0.1.0"\n[dependencies]\naxum = "0.7"\n')
+
+    calls = []
+    real_parse = workspace.parse_package
+    monkeypatch.setattr(workspace, "parse_package", lambda path: calls.append(path) or real_parse(path))
+    cache_dir = str(tmp_path / "cache")
+
+    first = workspace.detect_workspace(str(project), EXCLUDED, cache_dir)
+    second = workspace.detect_workspace(str(project), EXCLUDED, cache_dir)
+
+    assert len(calls) == 1
+    assert second.members == first.members
+    assert first.members[0]["name"] == "core"
+    assert first.members[0]["frameworks"] == ["Axum"]
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_generator_splits_budget_across_packages(tmp_path):
+    """Test a large first package no longer absorbs the whole file budget."""
+    from get_context_tree import TreeGenerator
+
+    (tmp_path / "package.json").write_text(json.dumps({"workspaces": ["packages/*"]}))
+    for name, count in (("aaa", 200), ("bbb", 3), ("ccc", 3)):
+        src = tmp_path / "packages" / name / "src"
+        make_package(src.parent, "package.json", json.dumps({"name": name}))
+        src.mkdir()
+        for i in range(count):
+            (src / f"file_{i:03d}.js").touch()
+
+    assert "bbb" not in TreeGenerator(str(tmp_path), max_files=50).generate()
+
+    generator = TreeGenerator(str(tmp_path), max_files=50, workspace=True)
+    output = generator.generate()
+
+    assert output.startswith("[WORKSPACE] npm (package.json): 3 packages")
+    assert "|   |-- aaa/ (package aaa)" in output
+    assert "[PACKAGE] packages/bbb (bbb)\nbbb/" in output
+    assert "[PACKAGE] packages/ccc (ccc)" in output
+    assert "- packages/aaa: aaa - JavaScript - " in output and "(limited)" in output
+    assert generator.file_count <= 50
+
+
+@pytest.mark.hook
+@pytest.mark.unit
+def test_recursive_globs_skip_excluded_and_hidden_dirs(tmp_path):
+    """Test '**' member globs never list node_modules/ or hidden directories."""
+    from workspace import detect_workspace, read_listing
+
+    (tmp_path / "package.json").write_text(json.dumps({"workspaces": ["**/pkg-*"]}))
+    make_package(tmp_path / "libs" / "deep" / "pkg-a", "package.json", "{}")
+    make_package(tmp_path / "pkg-b", "package.json", "{}")
+    make_package(tmp_path / "node_modules" / "pkg-c", "package.json", "{}")
+    make_package(tmp_path / ".git" / "pkg-d", "package.json", "{}")
+
+    listed = []
+    workspace = detect_workspace(str(tmp_path), EXCLUDED,
+                                 list_fn=lambda path: listed.append(path) or read_listing(path))
+
+    assert [m["path"] for m in workspace.members] == ["libs/deep/pkg-a", "pkg-b"]
+    assert not any("node_modules" in path or ".git" in path for path in listed)
+    assert len(listed) == len(set(listed))
+
+
+@pytest.mark.hook
+@pytest.mark.integration
+def test_member_globs_bounded_by_deadline(tmp_path, monkeypatch):
+    """Test a member glob stuck in a listing gives up at --timeout and scans the root as one tree."""
+    import os
+    import threading
+    import time
+    import get_context_tree
+    from get_context_tree import TreeGenerator
+
+    (tmp_path / "package.json").write_text(json.dumps({"workspaces": ["packages/**"]}))
+    make_package(tmp_path / "packages" / "ui", "package.json", "{}")
+    (tmp_path / "packages" / "stuck").mkdir()
+    release = threading.Event()
+    real_scandir = os.scandir
+
+    def hanging_scandir(path):
+        if os.path.basename(str(path)) == "stuck":
+            release.wait(30)
+        return real_scandir(path)
+
+    monkeypatch.setattr(get_context_tree.os, "scandir", hanging_scandir)
+    generator = TreeGenerator(str(tmp_path), workspace=True, timeout=0.5)
+    try:
+        started = time.monotonic()
+        output = generator.generate()
+        elapsed = time.monotonic() - started
+    finally:
+        release.set()
+
+    assert elapsed < 5
+    assert generator.workspace is None and generator.listing_abandoned
+    assert "[WORKSPACE]" not in output
+    assert "[PARTIAL: deadline reached]" in output
+    assert "Listing abandoned at deadline: " in output and "stuck" in output